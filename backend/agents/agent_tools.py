@@ -0,0 +1,238 @@
+import asyncio
+import json
+import threading
+import time
+from collections import namedtuple
+from backend.tools.budgets import get_budgets
+from backend.tools.currency_rates import convert_amounts
+from backend.tools.expenses import get_expense_summary
+from backend.tools.savings_simulator import load_user_spending, simulate_user_savings
+from backend.tools.stock_prices import get_stock_prices
+from backend.utils.executors import run_blocking
+from backend.utils.retrieval import search_documents
+
+# ``user_data`` tools read the caller's own rows: they are only offered when
+# the request carries a user_id, and answers built on them are not cached
+AgentTool = namedtuple("AgentTool", ["name", "description", "parameters", "handler", "timeout", "user_data"])
+
+
+async def _stock_quotes(tickers):
+    return await run_blocking("market", get_stock_prices, tickers)
+
+
+async def _convert_currency(base, target, amounts=None):
+    return await run_blocking("fx", convert_amounts, amounts or [1.0], base, target)
+
+
+async def _budgets(user_id):
+    return await run_blocking("db", get_budgets, user_id)
+
+
+async def _expense_summary(user_id, month=None):
+    return await run_blocking("db", get_expense_summary, user_id, month)
+
+
+async def _simulate_savings(user_id, goal_amount, monthly_income, months=12, current_savings=0.0,
+                            income_growth=0.0, respect_budgets=False):
+    inputs = await run_blocking("db", load_user_spending, user_id)
+    result = await run_blocking(
+        "cpu", simulate_user_savings, user_id, goal_amount, monthly_income, months,
+        current_savings, income_growth, respect_budgets=respect_budgets, inputs=inputs
+    )
+    # The model needs the odds and a few points of the trajectory, not every month
+    step = max(len(result["months"]) // 6, 1)
+    points = list(range(step - 1, len(result["months"]), step))
+    if points[-1] != len(result["months"]) - 1:
+        points.append(len(result["months"]) - 1)
+    return {
+        "goal_amount": result["goal_amount"],
+        "probability_of_goal": result["probability_of_goal"],
+        "probability_reached_anytime": result["probability_reached_anytime"],
+        "median_months_to_goal": result["median_months_to_goal"],
+        "final_balance": result["final_balance"],
+        "average_monthly_spend": result["history"]["average_monthly_spend"],
+        "history_months": len(result["history"]["months"]),
+        "trajectory": [
+            {"month": result["months"][i], **{p: result["percentiles"][p][i] for p in ("p10", "p50", "p90")}}
+            for i in points
+        ],
+    }
+
+
+async def _search_documents(query):
+    result = await run_blocking("search", search_documents, query, 4)
+    return [
+        {"source": match["source"], "page": match["page"], "text": match["text"]}
+        for match in result["matches"]
+    ]
+
+
+AGENT_TOOLS = {tool.name: tool for tool in [
+    AgentTool(
+        "get_stock_quotes",
+        "Latest price for one or more stock tickers, e.g. AAPL or BRK.B.",
+        {
+            "type": "object",
+            "properties": {"tickers": {"type": "array", "items": {"type": "string"}}},
+            "required": ["tickers"],
+            "additionalProperties": False,
+        },
+        _stock_quotes, 10.0, False
+    ),
+    AgentTool(
+        "convert_currency",
+        "Exchange rate between two ISO currency codes, optionally converting amounts.",
+        {
+            "type": "object",
+            "properties": {
+                "base": {"type": "string"},
+                "target": {"type": "string"},
+                "amounts": {"type": "array", "items": {"type": "number"}},
+            },
+            "required": ["base", "target"],
+            "additionalProperties": False,
+        },
+        _convert_currency, 6.0, False
+    ),
+    AgentTool(
+        "get_budgets",
+        "The user's budgets with amount, actual spending and remaining amount.",
+        {"type": "object", "properties": {}, "additionalProperties": False},
+        _budgets, 5.0, True
+    ),
+    AgentTool(
+        "get_expense_summary",
+        "The user's spending per category, optionally for one month (YYYY-MM).",
+        {
+            "type": "object",
+            "properties": {"month": {"type": "string"}},
+            "additionalProperties": False,
+        },
+        _expense_summary, 5.0, True
+    ),
+    AgentTool(
+        "simulate_savings_goal",
+        "Monte Carlo projection of the user's savings from their own spending history: the "
+        "probability of reaching a savings goal within a number of months, and the likely range of balances.",
+        {
+            "type": "object",
+            "properties": {
+                "goal_amount": {"type": "number"},
+                "monthly_income": {"type": "number", "description": "Take-home income per month"},
+                "months": {"type": "integer", "description": "Horizon in months, default 12"},
+                "current_savings": {"type": "number"},
+                "income_growth": {"type": "number", "description": "Annual income growth, e.g. 0.03"},
+                "respect_budgets": {"type": "boolean", "description": "Assume spending stays within current budgets"},
+            },
+            "required": ["goal_amount", "monthly_income"],
+            "additionalProperties": False,
+        },
+        _simulate_savings, 8.0, True
+    ),
+    AgentTool(
+        "search_finance_documents",
+        "Search the user's uploaded finance documents (budgets, reports) for relevant passages.",
+        {
+            "type": "object",
+            "properties": {"query": {"type": "string"}},
+            "required": ["query"],
+            "additionalProperties": False,
+        },
+        _search_documents, 3.0, False
+    ),
+]}
+
+
+def tool_definitions(user_id=None, include_documents=True):
+    """Responses API function tool definitions available for a request"""
+    return [
+        {
+            "type": "function",
+            "name": tool.name,
+            "description": tool.description,
+            "parameters": tool.parameters,
+        }
+        for tool in AGENT_TOOLS.values()
+        if (user_id is not None or not tool.user_data)
+        and (include_documents or tool.name != "search_finance_documents")
+    ]
+
+
+class ToolStats:
+    """Per-tool call counts and latencies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools = {}
+
+    def record(self, name, elapsed_ms, status):
+        with self._lock:
+            stats = self._tools.setdefault(name, {"calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if status == "error":
+                stats["errors"] += 1
+            elif status == "timeout":
+                stats["timeouts"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    **{key: value for key, value in stats.items() if key != "total_ms"},
+                    "avg_ms": round(stats["total_ms"] / stats["calls"], 2),
+                    "max_ms": round(stats["max_ms"], 2),
+                }
+                for name, stats in self._tools.items()
+            }
+
+
+tool_stats = ToolStats()
+
+
+async def call_tool(name, arguments, user_id=None):
+    """Run one tool call under its timeout; failures become ``{"error": ...}`` outputs.
+
+    Returns ``(output, timing)``. On timeout the awaiting stops, but a
+    blocking lookup already on a thread pool runs to completion there.
+    """
+    started = time.perf_counter()
+    tool = AGENT_TOOLS.get(name)
+    status = "ok"
+    try:
+        if tool is None:
+            raise ValueError(f"Unknown tool: {name}")
+        kwargs = json.loads(arguments or "{}") if isinstance(arguments, str) else dict(arguments or {})
+        if tool.user_data:
+            if user_id is None:
+                raise ValueError(f"{name} needs a user_id")
+            kwargs["user_id"] = user_id
+        output = await asyncio.wait_for(tool.handler(**kwargs), tool.timeout)
+    except asyncio.TimeoutError:
+        status = "timeout"
+        output = {"error": f"{name} timed out after {tool.timeout}s"}
+    except Exception as e:
+        status = "error"
+        output = {"error": str(e)}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    tool_stats.record(name, elapsed_ms, status)
+    return output, {"tool": name, "ms": round(elapsed_ms, 2), "status": status}
+
+
+async def run_tool_calls(calls, user_id=None):
+    """Run every function call of one model turn concurrently.
+
+    ``calls`` are Responses API ``function_call`` items. Returns the
+    ``function_call_output`` input items and a timing per call.
+    """
+    results = await asyncio.gather(*(call_tool(call.name, call.arguments, user_id) for call in calls))
+    outputs = [
+        {"type": "function_call_output", "call_id": call.call_id, "output": json.dumps(output, default=str)}
+        for call, (output, _) in zip(calls, results)
+    ]
+    return outputs, [timing for _, timing in results]
+
+
+def uses_user_data(timings):
+    return any(AGENT_TOOLS[t["tool"]].user_data for t in timings if t["tool"] in AGENT_TOOLS)
@@ -1,54 +1,237 @@
 import os
-from openai import OpenAI
-from backend.tools.stock_prices import get_stock_price
-from backend.tools.currency_rates import get_exchange_rate
+import threading
+import time
+from backend.agents.agent_tools import run_tool_calls, tool_definitions, tool_stats, uses_user_data
+from backend.agents.session_memory import load_instructions, prepare_context, remember_turn
+from backend.tools.file_search_tool import FILE_SEARCH_BACKEND
+from backend.utils.answer_cache import get_answer_cache
+from backend.utils.llm_gateway import get_gateway, extract_output_text
 from dotenv import load_dotenv
-import json
 
 # Load environment variables
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Each turn is one model call; tool results feed the next turn
+MAX_AGENT_TURNS = int(os.getenv("AGENT_MAX_TURNS", "4"))
 
-def run_agent(user_query: str):
+def build_agent_request(user_query: str, user_id: int = None, input_items=None):
+    """Build the Responses API arguments shared by the blocking and streaming agent.
+
+    ``input_items`` replaces the bare query with a session's budgeted context.
+    """
+    # Define available tools
+    tools = [
+        {
+            "type": "web_search_preview",
+            "search_context_size": "medium"
+        }
+    ]
+
+    # Only add hosted file search if it is selected and we have a valid vector store ID
+    vector_store_id = os.getenv("VECTOR_STORE_ID")
+    hosted_file_search = FILE_SEARCH_BACKEND == "openai" and vector_store_id and vector_store_id.startswith("vs_")
+    if hosted_file_search:
+        tools.append({
+            "type": "file_search",
+            "vector_store_ids": [vector_store_id],
+            "max_num_results": 5
+        })
+
+    # Local lookups answer in milliseconds, so prefer them over web search
+    tools.extend(tool_definitions(user_id, include_documents=not hosted_file_search))
+
+    return {
+        "model": "gpt-4.1",
+        "tools": tools,
+        # Static, so the instructions + tools prefix is identical on every call
+        "instructions": load_instructions(),
+        "input": input_items or user_query
+    }
+
+def agent_config(request, user_id=None):
+    """The parts of an agent request, besides the query, that shape the answer"""
+    config = {key: value for key, value in request.items() if key != "input"}
+    config["user_id"] = user_id
+    return config
+
+def follow_up_request(request, response_id, outputs, last_turn=False):
+    """Next turn: tool outputs chained onto the previous response"""
+    follow_up = dict(request, previous_response_id=response_id, input=outputs)
+    if last_turn:
+        # Out of turns: the model has to answer with what it has
+        follow_up["tool_choice"] = "none"
+    return follow_up
+
+def function_calls(response):
+    return [item for item in getattr(response, "output", None) or [] if getattr(item, "type", "") == "function_call"]
+
+
+class AgentStats:
+    """Turns, model latency and turn-cap hits across agent runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "turns": 0, "capped": 0, "model_ms": 0.0, "tool_ms": 0.0,
+                       "session_runs": 0, "context_tokens": 0, "max_context_tokens": 0}
+
+    def record(self, trace, capped, context_tokens=None):
+        with self._lock:
+            self._stats["runs"] += 1
+            if context_tokens is not None:
+                self._stats["session_runs"] += 1
+                self._stats["context_tokens"] += context_tokens
+                self._stats["max_context_tokens"] = max(self._stats["max_context_tokens"], context_tokens)
+            self._stats["turns"] += len(trace)
+            self._stats["capped"] += int(capped)
+            self._stats["model_ms"] += sum(turn["model_ms"] for turn in trace)
+            self._stats["tool_ms"] += sum(turn.get("tools_ms", 0.0) for turn in trace)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+        runs = stats["runs"] or 1
+        return {
+            "runs": stats["runs"],
+            "capped": stats["capped"],
+            "avg_turns": round(stats["turns"] / runs, 2),
+            "avg_model_ms": round(stats["model_ms"] / runs, 2),
+            "avg_tool_ms": round(stats["tool_ms"] / runs, 2),
+            "avg_context_tokens": round(stats["context_tokens"] / (stats["session_runs"] or 1), 1),
+            "max_context_tokens": stats["max_context_tokens"],
+            "tools": tool_stats.snapshot(),
+        }
+
+
+agent_stats = AgentStats()
+
+async def run_agent_turns(user_query: str, user_id: int = None, input_items=None, context_tokens=None):
+    """Call the model, run any tools it asks for, and repeat up to MAX_AGENT_TURNS.
+
+    Returns ``(text, trace)``; ``trace`` has one entry per turn with the
+    model latency and the timing of each tool call made after it.
+    """
+    gateway = get_gateway()
+    request = build_agent_request(user_query, user_id, input_items)
+    trace = []
+    turn_request = request
+    capped = False
+    while True:
+        started = time.perf_counter()
+        response = await gateway.create_response(**turn_request)
+        turn = {"turn": len(trace) + 1, "model_ms": round((time.perf_counter() - started) * 1000, 2)}
+        trace.append(turn)
+
+        calls = function_calls(response)
+        if not calls or "tool_choice" in turn_request:
+            capped = bool(calls)
+            break
+        started = time.perf_counter()
+        outputs, turn["tools"] = await run_tool_calls(calls, user_id)
+        turn["tools_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        turn_request = follow_up_request(request, response.id, outputs, last_turn=len(trace) + 1 >= MAX_AGENT_TURNS)
+
+    agent_stats.record(trace, capped, context_tokens)
+    return extract_output_text(response), trace
+
+async def run_session_agent(user_query: str, session_id: str, user_id: int = None):
+    """Answer within a persisted session: budgeted context in, turn saved afterwards"""
+    session, items, context = await prepare_context(user_query, session_id, user_id)
+    text, _ = await run_agent_turns(user_query, user_id, items, context["context_tokens"])
+    text = text or "I couldn't process your request at this time."
+    await remember_turn(session_id, session["user_id"] if session["user_id"] is not None else user_id, user_query, text)
+    return text
+
+async def run_agent(user_query: str, user_id: int = None, session_id: str = None):
     try:
-        # Define available tools
-        tools = [
-            {
-                "type": "web_search_preview",
-                "search_context_size": "medium"
-            }
-        ]
-        
-        # Only add file search if we have a valid vector store ID
-        vector_store_id = os.getenv("VECTOR_STORE_ID")
-        if vector_store_id and vector_store_id.startswith("vs_"):
-            tools.append({
-                "type": "file_search",
-                "vector_store_ids": [vector_store_id],
-                "max_num_results": 5
-            })
-
-        # Create response using the Responses API
-        response = client.responses.create(
-            model="gpt-4.1",
-            tools=tools,
-            instructions="You are a helpful finance assistant. Use web search for market data and news. For calculations and data analysis, explain the process clearly.",
-            input=user_query
-        )
-
-        # Extract the text response
-        if hasattr(response, 'output_text'):
-            return response.output_text
-        
-        # If output_text is not available, try to extract from message content
-        for output in response.output:
-            if output.type == "message":
-                for content in output.content:
-                    if content.type == "output_text":
-                        return content.text
-        
-        return "I couldn't process your request at this time."
-        
+        if session_id:
+            # Follow-ups depend on the conversation, so sessions skip the answer cache
+            return await run_session_agent(user_query, session_id, user_id)
+
+        config = agent_config(build_agent_request(user_query, user_id), user_id)
+
+        async def answer():
+            text, trace = await run_agent_turns(user_query, user_id)
+            if text:
+                # Answers read from the user's own budgets/expenses go stale
+                # as soon as they add an expense
+                used_user_data = any(uses_user_data(turn.get("tools", [])) for turn in trace)
+                return text, not used_user_data
+            return "I couldn't process your request at this time.", False
+
+        # Near-duplicate questions are answered from cache, and identical
+        # concurrent ones share a single model call
+        text, _ = await get_answer_cache().get_or_compute(user_query, config, answer)
+        return text
+
     except Exception as e:
         raise ValueError(f"Error in chat agent: {str(e)}")
+
+async def stream_agent(user_query: str, user_id: int = None, session_id: str = None):
+    """Yield token and tool-progress events as the model produces them.
+
+    Events are dicts with a ``type`` of ``token``, ``tool``, ``done`` or
+    ``error``. Closing the generator closes the upstream stream.
+    """
+    try:
+        cache = get_answer_cache()
+        session, context = None, None
+        if session_id:
+            session, items, context = await prepare_context(user_query, session_id, user_id)
+            request = build_agent_request(user_query, user_id, items)
+        else:
+            request = build_agent_request(user_query, user_id)
+        config = agent_config(request, user_id)
+        if session is None:
+            cached, how = cache.lookup(user_query, config)
+            if cached is not None:
+                yield {"type": "token", "delta": cached}
+                yield {"type": "done", "response": cached, "cached": how}
+                return
+
+        trace = []
+        turn_request = request
+        while True:
+            started = time.perf_counter()
+            # Only the final turn's text is the answer; text written before a
+            # tool call was streamed as progress, like run_agent_turns drops it
+            response_id, calls, text = None, [], []
+            async for event in get_gateway().stream_response(**turn_request):
+                event_type = getattr(event, "type", "")
+                if event_type == "response.output_text.delta":
+                    text.append(event.delta)
+                    yield {"type": "token", "delta": event.delta}
+                elif event_type == "response.created":
+                    response_id = event.response.id
+                elif event_type == "response.output_item.done" and getattr(event.item, "type", "") == "function_call":
+                    calls.append(event.item)
+                elif "_call." in event_type:
+                    # e.g. response.web_search_call.searching
+                    tool, _, status = event_type[len("response."):].rpartition(".")
+                    yield {"type": "tool", "tool": tool[:-len("_call")], "status": status}
+                elif event_type in ("response.failed", "error"):
+                    message = getattr(event, "message", None) or "The model failed to respond"
+                    yield {"type": "error", "detail": message}
+                    return
+            turn = {"turn": len(trace) + 1, "model_ms": round((time.perf_counter() - started) * 1000, 2)}
+            trace.append(turn)
+            if not calls or "tool_choice" in turn_request:
+                break
+
+            for call in calls:
+                yield {"type": "tool", "tool": call.name, "status": "running"}
+            started = time.perf_counter()
+            outputs, turn["tools"] = await run_tool_calls(calls, user_id)
+            turn["tools_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            for timing in turn["tools"]:
+                yield {"type": "tool", "tool": timing["tool"], "status": timing["status"], "ms": timing["ms"]}
+            turn_request = follow_up_request(request, response_id, outputs, last_turn=len(trace) + 1 >= MAX_AGENT_TURNS)
+
+        agent_stats.record(trace, capped=bool(calls), context_tokens=context and context["context_tokens"])
+        answer = "".join(text) or "I couldn't process your request at this time."
+        if session is not None:
+            await remember_turn(session_id, session["user_id"] if session["user_id"] is not None else user_id, user_query, answer)
+        elif text and not any(uses_user_data(turn.get("tools", [])) for turn in trace):
+            cache.store(user_query, config, answer)
+        yield {"type": "done", "response": answer}
+    except Exception as e:
+        yield {"type": "error", "detail": f"Error in chat agent: {str(e)}"}
@@ -0,0 +1,281 @@
+import asyncio
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+from backend.tools.budgets import get_budgets
+from backend.utils.database import get_db_connection
+from backend.utils.executors import run_blocking
+from backend.utils.llm_gateway import extract_output_text, get_gateway
+from backend.utils.tokens import count_tokens, split_tokens
+
+# Load environment variables
+load_dotenv()
+
+PROMPT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts", "agent_prompt.txt")
+
+# Everything sent as input (snapshot, summary, history, question) fits this
+CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT_CONTEXT_TOKENS", "3000"))
+SUMMARY_TOKEN_LIMIT = int(os.getenv("AGENT_SUMMARY_TOKENS", "400"))
+SNAPSHOT_TOKEN_LIMIT = int(os.getenv("AGENT_SNAPSHOT_TOKENS", "250"))
+# Per-message framing the API adds on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+# Older turns are folded into the summary once unsummarized history passes
+# SUMMARIZE_AT of the history budget, down to SUMMARIZE_TO of it
+SUMMARIZE_AT = 0.6
+SUMMARIZE_TO = 0.3
+SUMMARY_MODEL = os.getenv("AGENT_SUMMARY_MODEL", "gpt-4.1-mini")
+SUMMARY_INSTRUCTIONS = (
+    "Update the running summary of a conversation between a user and a personal finance "
+    "assistant. Keep facts the user shared (goals, amounts, holdings, preferences) and "
+    "conclusions reached; drop small talk. Reply with the updated summary only, at most "
+    "150 words."
+)
+
+DEFAULT_INSTRUCTIONS = (
+    "You are a helpful finance assistant. Use the function tools for stock prices, "
+    "exchange rates, the user's budgets and expenses, and their documents. For calculations "
+    "and data analysis, explain the process clearly."
+)
+
+
+@lru_cache(maxsize=None)
+def load_instructions():
+    """The static instruction prefix, byte-for-byte identical on every request so
+    provider-side prompt caching can reuse it"""
+    try:
+        with open(PROMPT_PATH, encoding="utf-8") as f:
+            text = f.read().strip()
+    except OSError:
+        text = ""
+    return text or DEFAULT_INSTRUCTIONS
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    if not text:
+        return ""
+    windows = split_tokens(text, limit)
+    return windows[0] if len(windows) == 1 else windows[0].rstrip() + " …"
+
+
+def load_session(session_id: str, user_id: int = None):
+    """Session summary plus the messages not yet folded into it (oldest first)"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT user_id, summary, summarized_through
+            FROM dbo.T_SNG_ChatSessions
+            WHERE session_id = ?
+        """, (session_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return {"session_id": session_id, "user_id": user_id, "summary": "", "summarized_through": 0, "messages": []}
+        # An anonymous caller (user_id None) may not read an owned session either
+        if row[0] is not None and row[0] != user_id:
+            raise ValueError("Session belongs to another user")
+
+        cursor.execute("""
+            SELECT message_id, role, content, tokens
+            FROM dbo.T_SNG_ChatMessages
+            WHERE session_id = ? AND message_id > ?
+            ORDER BY message_id
+        """, (session_id, row[2]))
+        messages = [
+            {"message_id": r[0], "role": r[1], "content": r[2], "tokens": r[3]}
+            for r in cursor.fetchall()
+        ]
+        return {
+            "session_id": session_id,
+            "user_id": row[0],
+            "summary": row[1] or "",
+            "summarized_through": row[2],
+            "messages": messages
+        }
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Error loading chat session: {str(e)}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+
+def append_turn(session_id: str, user_id: int, question: str, answer: str):
+    """Persist one question/answer pair, creating the session on first use"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM dbo.T_SNG_ChatSessions WHERE session_id = ?", (session_id,))
+        if cursor.fetchone() is None:
+            cursor.execute(
+                "INSERT INTO dbo.T_SNG_ChatSessions (session_id, user_id) VALUES (?, ?)",
+                (session_id, user_id)
+            )
+        cursor.executemany("""
+            INSERT INTO dbo.T_SNG_ChatMessages (session_id, role, content, tokens)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (session_id, "user", question, count_tokens(question)),
+            (session_id, "assistant", answer, count_tokens(answer)),
+        ])
+        cursor.execute(
+            "UPDATE dbo.T_SNG_ChatSessions SET updated_at = CURRENT_TIMESTAMP WHERE session_id = ?",
+            (session_id,)
+        )
+        conn.commit()
+    except Exception as e:
+        raise ValueError(f"Error saving chat session: {str(e)}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+
+def save_summary(session_id: str, summary: str, summarized_through: int):
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        # Guarded so a slower, older summarization never overwrites a newer one
+        cursor.execute("""
+            UPDATE dbo.T_SNG_ChatSessions
+            SET summary = ?, summarized_through = ?
+            WHERE session_id = ? AND summarized_through < ?
+        """, (summary, summarized_through, session_id, summarized_through))
+        conn.commit()
+    except Exception as e:
+        raise ValueError(f"Error saving chat summary: {str(e)}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+
+def budget_snapshot(user_id: int, limit: int = SNAPSHOT_TOKEN_LIMIT):
+    """One compact line per current budget, newest first, cut to ``limit`` tokens"""
+    budgets = get_budgets(user_id)["budgets"]
+    lines = [
+        f"{b['category']}: {b['actual_spent']:.0f}/{b['budgeted_amount']:.0f} spent "
+        f"({b['start_date']}..{b['end_date']})"
+        for b in budgets
+    ]
+    return truncate_tokens("\n".join(lines), limit)
+
+
+def history_budget(question: str, summary: str, snapshot: str, budget: int):
+    """Tokens left for past messages once the fixed parts are placed"""
+    fixed = count_tokens(question) + MESSAGE_OVERHEAD_TOKENS
+    if summary or snapshot:
+        fixed += count_tokens(summary) + count_tokens(snapshot) + 2 * MESSAGE_OVERHEAD_TOKENS + 16
+    return max(budget - fixed, 0)
+
+
+def build_context(question: str, session, snapshot: str = "", budget: int = None):
+    """Fit summary, budget snapshot, recent turns and the question into ``budget`` tokens.
+
+    Returns ``(input_items, stats)``. Recent messages are added newest first
+    until the budget runs out; anything older that did not fit is only
+    represented by the summary.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    summary = truncate_tokens(session["summary"], SUMMARY_TOKEN_LIMIT)
+    snapshot = truncate_tokens(snapshot, SNAPSHOT_TOKEN_LIMIT)
+    remaining = history_budget(question, summary, snapshot, budget)
+
+    history = []
+    for message in reversed(session["messages"]):
+        cost = message["tokens"] + MESSAGE_OVERHEAD_TOKENS
+        if cost > remaining:
+            break
+        history.append({"role": message["role"], "content": message["content"]})
+        remaining -= cost
+    history.reverse()
+
+    items = []
+    background = []
+    if summary:
+        background.append(f"Conversation so far (summary):\n{summary}")
+    if snapshot:
+        background.append(f"User's budgets (spent/budgeted):\n{snapshot}")
+    if background:
+        items.append({"role": "developer", "content": "\n\n".join(background)})
+    items.extend(history)
+    items.append({"role": "user", "content": question})
+
+    return items, {
+        "context_tokens": sum(count_tokens(item["content"]) + MESSAGE_OVERHEAD_TOKENS for item in items),
+        "history_messages": len(history),
+        "dropped_messages": len(session["messages"]) - len(history),
+    }
+
+
+def messages_to_summarize(session, budget: int = None):
+    """Oldest unsummarized messages to fold into the summary, or [] if history still fits comfortably"""
+    messages = session["messages"]
+    history_tokens = (budget or CONTEXT_TOKEN_BUDGET) - SUMMARY_TOKEN_LIMIT - SNAPSHOT_TOKEN_LIMIT
+    total = sum(m["tokens"] + MESSAGE_OVERHEAD_TOKENS for m in messages)
+    if total <= history_tokens * SUMMARIZE_AT:
+        return []
+    selected = []
+    for message in messages:
+        if total <= history_tokens * SUMMARIZE_TO:
+            break
+        selected.append(message)
+        total -= message["tokens"] + MESSAGE_OVERHEAD_TOKENS
+    # Keep question/answer pairs together
+    if selected and selected[-1]["role"] == "user":
+        selected.pop()
+    return selected
+
+
+def summary_request(summary: str, messages):
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    return {
+        "model": SUMMARY_MODEL,
+        "instructions": SUMMARY_INSTRUCTIONS,
+        "input": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}",
+        "max_output_tokens": SUMMARY_TOKEN_LIMIT,
+    }
+
+
+async def prepare_context(question: str, session_id: str, user_id: int = None):
+    """Load the session and build the token-budgeted input for this question"""
+    session = await run_blocking("db", load_session, session_id, user_id)
+    snapshot = ""
+    if user_id is not None:
+        try:
+            snapshot = await run_blocking("db", budget_snapshot, user_id)
+        except Exception:
+            # The snapshot is background only; answer without it
+            snapshot = ""
+    items, stats = build_context(question, session, snapshot)
+    return session, items, stats
+
+
+_summary_tasks = set()
+
+
+async def remember_turn(session_id: str, user_id: int, question: str, answer: str):
+    """Persist the turn, then fold old turns into the summary in the background"""
+    await run_blocking("db", append_turn, session_id, user_id, question, answer)
+    task = asyncio.get_running_loop().create_task(summarize_session(session_id, user_id))
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
+    return task
+
+
+async def summarize_session(session_id: str, user_id: int = None):
+    """Fold the oldest unsummarized turns into the session summary, if history has grown enough"""
+    try:
+        session = await run_blocking("db", load_session, session_id, user_id)
+        messages = messages_to_summarize(session)
+        if not messages:
+            return False
+        response = await get_gateway().create_response(**summary_request(session["summary"], messages))
+        summary = extract_output_text(response)
+        if not summary:
+            return False
+        await run_blocking(
+            "db", save_summary, session_id, truncate_tokens(summary, SUMMARY_TOKEN_LIMIT), messages[-1]["message_id"]
+        )
+        return True
+    except Exception:
+        # Unsummarized turns are retried after the next turn
+        return False
@@ -0,0 +1,75 @@
+"""Show that the vectorized budget forecast scales linearly with budget count.
+
+Synthetic columnar inputs (two budgets per user, ~20 expenses per budget
+over the 13-week window, already category/description coded as the loader
+returns them) are fed straight to forecast_budgets, so only the compute
+pass is timed. Run with:
+
+    python -m backend.benchmarks.bench_budget_forecast --sizes 25000 50000 100000 200000
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+
+from backend.tools.budget_forecast import SEASONALITY_DAYS, forecast_budgets
+
+CATEGORIES = np.array(["Food", "Rent", "Travel", "Bills", "Fun", "Health", "Transport", "Shopping"])
+N_DESCRIPTIONS = 43
+AS_OF = date(2025, 1, 15)
+
+
+def synthetic_inputs(n_budgets, expenses_per_budget, seed=0):
+    rng = np.random.default_rng(seed)
+    n_users = max(n_budgets // 2, 1)
+    user_id = np.repeat(np.arange(1, n_users + 1), 2)[:n_budgets]
+    # Two distinct categories per user
+    first = rng.integers(0, len(CATEGORIES), n_users)
+    category_index = np.stack([first, (first + 1 + rng.integers(0, len(CATEGORIES) - 1, n_users)) % len(CATEGORIES)], 1)
+    budgets = {
+        "budget_id": np.arange(1, n_budgets + 1),
+        "user_id": user_id,
+        "category": CATEGORIES[category_index.ravel()[:n_budgets]],
+        "category_code": category_index.ravel()[:n_budgets],
+        "amount": rng.uniform(100, 2000, n_budgets).round(2),
+        "start_date": np.full(n_budgets, np.datetime64("2025-01-01")),
+        "end_date": np.full(n_budgets, np.datetime64("2025-01-31")),
+    }
+
+    n_expenses = n_budgets * expenses_per_budget
+    owner = rng.integers(0, n_budgets, n_expenses)
+    offsets = rng.integers(0, SEASONALITY_DAYS, n_expenses)
+    expenses = {
+        "user_id": budgets["user_id"][owner],
+        "category_code": budgets["category_code"][owner],
+        "expense_date": np.datetime64(AS_OF) - offsets,
+        "amount": rng.gamma(2.0, 20.0, n_expenses).round(0),
+        # Code 0 is "no description"; a third of expenses have none
+        "description_code": np.maximum(rng.integers(-20, N_DESCRIPTIONS, n_expenses), 0),
+    }
+    return budgets, expenses
+
+
+def run(sizes, expenses_per_budget, repeats):
+    print(f"expenses per budget={expenses_per_budget} window={SEASONALITY_DAYS} days")
+    for n_budgets in sizes:
+        budgets, expenses = synthetic_inputs(n_budgets, expenses_per_budget)
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            result = forecast_budgets(budgets, expenses, AS_OF)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        print(f"  budgets={n_budgets:>7}  expenses={len(expenses['amount']):>8}  "
+              f"{best * 1000:8.1f} ms  {best / n_budgets * 1e6:6.2f} us/budget  "
+              f"at risk={int(result['will_exceed'].sum())}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25000, 50000, 100000, 200000])
+    parser.add_argument("--expenses-per-budget", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.expenses_per_budget, args.repeats)
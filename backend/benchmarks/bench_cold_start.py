@@ -0,0 +1,85 @@
+"""Measure cold-start cost: app import, first response, and schema setup.
+
+Each run is a fresh interpreter, as a new worker would be, so nothing is
+warm in sys.modules. Schema setup runs against a throwaway SQLite file:
+the first start applies every migration, later starts only read the
+version marker. Run with:
+
+    python -m backend.benchmarks.bench_cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ("numpy", "pandas", "yfinance", "openai", "tiktoken", "pyodbc")
+
+# Runs inside the child interpreter; prints one JSON line of timings
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+import backend.main
+imported = time.perf_counter()
+
+import asyncio, httpx
+async def first_request():
+    transport = httpx.ASGITransport(app=backend.main.create_app(init_schema=False))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return (await client.get("/")).status_code
+status = asyncio.run(first_request())
+responded = time.perf_counter()
+
+from backend.utils.database import init_db
+schema_started = time.perf_counter()
+migrated = init_db()
+schema_done = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (responded - started) * 1000,
+    "schema_ms": (schema_done - schema_started) * 1000,
+    "migrated": migrated,
+    "status": status,
+    "heavy_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+}))
+"""
+
+
+def run_child(db_path):
+    env = dict(os.environ, DB_BACKEND="sqlite", DB_SQLITE_PATH=db_path, OPENAI_API_KEY="bench")
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    code = f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{CHILD}"
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=root, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(label, values):
+    print(f"  {label:<18} median {statistics.median(values):7.1f} ms   max {max(values):7.1f} ms")
+
+
+def run(runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        cold = run_child(db_path)
+        warm = [run_child(db_path) for _ in range(runs)]
+
+    print(f"fresh interpreters={runs + 1}")
+    summarize("import app", [r["import_ms"] for r in warm])
+    summarize("first response", [r["first_response_ms"] for r in warm])
+    print(f"  schema setup       first start {cold['schema_ms']:7.1f} ms (migrated={cold['migrated']})")
+    summarize("schema check", [r["schema_ms"] for r in warm])
+    print(f"  heavy modules loaded at startup: {warm[-1]['heavy_loaded'] or 'none'}")
+    assert all(r["status"] == 200 for r in warm)
+    assert not any(r["migrated"] for r in warm), "warm starts should skip migrations"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run(args.runs)
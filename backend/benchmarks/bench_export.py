@@ -0,0 +1,94 @@
+"""Peak memory of a streamed expense export as the history grows.
+
+Each size gets its own user in one SQLite stand-in. Every (size, format)
+pair is exported by a fresh interpreter, which reports the rows and bytes
+written and how far its peak RSS rose above the RSS it had once the export
+modules were imported. With streaming, that rise should stay flat from the
+smallest history to the largest. Run with:
+
+    python -m backend.benchmarks.bench_export --sizes 1000 100000 1000000 10000000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from backend.utils.database import ConnectionPool
+from backend.utils.migrations import apply_migrations
+
+FORMATS = ("csv", "csv+gzip", "ndjson", "parquet")
+
+# Runs inside the child interpreter; prints one JSON line
+CHILD = r"""
+import json, resource, sys, time
+from backend.tools.expense_export import export_expenses
+from backend.utils import database
+from backend.utils.database import ConnectionPool
+import pyarrow.parquet
+
+path, user_id, fmt = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+database.configure_pool(ConnectionPool([path], dialect="sqlite", max_size=1))
+baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+fmt, _, gzip = fmt.partition("+")
+started = time.perf_counter()
+written = 0
+for chunk in export_expenses(user_id, fmt, gzip=bool(gzip)):
+    written += len(chunk)
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "bytes": written,
+    "rss_rise_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kb) / 1024,
+}))
+"""
+
+
+def seed(path, sizes):
+    pool = ConnectionPool([path], dialect="sqlite", max_size=1)
+    conn = pool.acquire()
+    apply_migrations(conn, "sqlite")
+    cursor = conn.cursor()
+    rng = random.Random(0)
+    start = date(2000, 1, 1)
+    for size in sizes:
+        cursor.execute("INSERT INTO dbo.T_SNG_Users (username) VALUES (?)", (f"user{size}",))
+        user_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (?, ?, ?, ?, ?)",
+            ((user_id, round(rng.uniform(1, 300), 2), rng.choice(["Food", "Rent", "Fun"]), f"purchase {n}",
+              start + timedelta(days=n % 9000)) for n in range(size))
+        )
+        conn.commit()
+        yield size, user_id
+    conn.close()
+    pool.close_all()
+
+
+def run_child(path, user_id, fmt):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, path, str(user_id), fmt], cwd=root, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        users = list(seed(path, sizes))
+        print(f"{'rows':>10} {'format':>9} {'MB out':>9} {'seconds':>8} {'RSS rise MB':>12}")
+        for size, user_id in users:
+            for fmt in FORMATS:
+                result = run_child(path, user_id, fmt)
+                print(f"{size:>10} {fmt:>9} {result['bytes'] / 2 ** 20:>9.1f} {result['seconds']:>8.2f} "
+                      f"{result['rss_rise_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+    run(args.sizes)
@@ -0,0 +1,84 @@
+"""Page latency by depth: keyset list_expenses against LIMIT/OFFSET paging.
+
+One user gets ``--rows`` expenses in a SQLite stand-in. The benchmark walks
+to pages 1, 10, 100, ... with both strategies and times the fetch of that
+page. OFFSET has to skip every earlier row; the keyset seek does not. Run with:
+
+    python -m backend.benchmarks.bench_pagination --rows 200000 --page-size 50
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from backend.tools.expenses import list_expenses
+from backend.utils import database
+from backend.utils.database import ConnectionPool
+from backend.utils.migrations import apply_migrations
+
+OFFSET_SQL = """
+    SELECT expense_id, expense_date, amount, category, description
+    FROM dbo.V_SNG_UserExpenses_L1
+    WHERE user_id = ?
+    ORDER BY expense_date DESC, expense_id DESC
+    LIMIT ? OFFSET ?
+"""
+
+
+def seed(path, rows):
+    pool = ConnectionPool([path], dialect="sqlite", max_size=2)
+    conn = pool.acquire()
+    apply_migrations(conn, "sqlite")
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO dbo.T_SNG_Users (username) VALUES ('heavy')")
+    rng = random.Random(0)
+    start = date(2015, 1, 1)
+    cursor.executemany(
+        "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (1, ?, ?, '', ?)",
+        ((round(rng.uniform(1, 300), 2), rng.choice(["Food", "Rent", "Fun"]), start + timedelta(days=rng.randrange(3650)))
+         for _ in range(rows))
+    )
+    conn.commit()
+    conn.close()
+    return pool
+
+
+def run(rows, page_size):
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    pool = seed(path, rows)
+    previous = database._pool
+    database.configure_pool(pool)
+    try:
+        depths = [d for d in (1, 10, 100, 1000, 4000) if d * page_size <= rows]
+        print(f"rows={rows} page_size={page_size}")
+        cursor, page_no = None, 0
+        for depth in depths:
+            while page_no < depth - 1:
+                cursor = list_expenses(1, limit=page_size, cursor=cursor)["next_cursor"]
+                page_no += 1
+            started = time.perf_counter()
+            keyset = list_expenses(1, limit=page_size, cursor=cursor)
+            keyset_ms = (time.perf_counter() - started) * 1000
+
+            conn = database.get_db_connection()
+            started = time.perf_counter()
+            offset_rows = conn.cursor().execute(OFFSET_SQL, (1, page_size, (depth - 1) * page_size)).fetchall()
+            offset_ms = (time.perf_counter() - started) * 1000
+            conn.close()
+            assert [r[0] for r in offset_rows] == [e["expense_id"] for e in keyset["expenses"]]
+            print(f"  page {depth:>5}: keyset {keyset_ms:7.2f} ms   offset {offset_ms:8.2f} ms")
+    finally:
+        database.configure_pool(previous)
+        pool.close_all()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+    run(args.rows, args.page_size)
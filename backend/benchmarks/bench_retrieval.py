@@ -0,0 +1,58 @@
+"""Measure top-k search latency of the local hybrid index on a synthetic corpus.
+
+Chunks are built from a small finance vocabulary so BM25 postings have a
+realistic skew, and the offline hashing embedding is used. Run with:
+
+    python -m backend.benchmarks.bench_retrieval --chunks 5000 --queries 200
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from backend.utils.retrieval import HashingEmbedding, HybridIndex
+
+VOCABULARY = (
+    "budget rent groceries transport utilities savings emergency fund salary "
+    "invoice tax refund mortgage interest loan credit card dividend stock bond "
+    "insurance premium subscription travel dining fuel electricity water phone "
+    "internet gym medical pharmacy tuition childcare gift charity bonus pension"
+).split()
+
+
+def synthetic_text(rng, words):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def run(n_chunks, n_queries, k):
+    rng = random.Random(7)
+    index = HybridIndex(tempfile.mkdtemp(), HashingEmbedding(512))
+    started = time.perf_counter()
+    index.update({
+        f"doc{doc // 50}.txt": [{"page": 1, "text": synthetic_text(rng, 200)} for _ in range(min(50, n_chunks - doc))]
+        for doc in range(0, n_chunks, 50)
+    })
+    build = time.perf_counter() - started
+
+    queries = [synthetic_text(rng, 4) for _ in range(n_queries)]
+    for mode in ("bm25", "dense", "hybrid"):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, k=k, mode=mode)
+            timings.append((time.perf_counter() - started) * 1000)
+        p50, p95 = np.percentile(timings, [50, 95])
+        print(f"  {mode:<7} p50={p50:7.3f} ms  p95={p95:7.3f} ms")
+
+    print(f"chunks={len(index.chunks)} build={build:.2f}s queries={n_queries} k={k}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    run(args.chunks, args.queries, args.k)
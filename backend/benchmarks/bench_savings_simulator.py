@@ -0,0 +1,72 @@
+"""Time the vectorized savings simulator against a per-path Python loop.
+
+The history is synthetic (24 months x 12 categories) so only the
+simulation and summary are measured, not the database. Run with:
+
+    python -m backend.benchmarks.bench_savings_simulator --paths 10000 --months 24
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from backend.tools.savings_simulator import simulate_savings, summarize_paths
+
+
+def loop_simulation(history, monthly_income, months, paths, seed):
+    """The straightforward version: one Python iteration per path and month"""
+    rng = random.Random(seed)
+    totals = history.sum(axis=1).tolist()
+    monthly_return = 1.05 ** (1 / 12) - 1
+    balances = []
+    for _ in range(paths):
+        balance, path = 0.0, []
+        for month in range(months):
+            income = monthly_income * max(1 + 0.1 * rng.gauss(0, 1), 0)
+            r = monthly_return + 0.15 / 12 ** 0.5 * rng.gauss(0, 1)
+            balance = balance * (1 + r) + income - rng.choice(totals)
+            path.append(balance)
+        balances.append(path)
+    return balances
+
+
+def run(paths, months, repeats):
+    rng = np.random.default_rng(0)
+    history = rng.gamma(2.0, 150.0, size=(24, 12))
+    monthly_income = float(history.sum(axis=1).mean()) * 1.2
+    labels = [str(i) for i in range(months)]
+
+    def vectorized():
+        balances = simulate_savings(
+            history, monthly_income, months, income_volatility=0.1,
+            annual_return=0.05, return_volatility=0.15, paths=paths
+        )
+        return summarize_paths(balances, 20000, labels)
+
+    vectorized()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = vectorized()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    loop_paths = min(paths, 1000)
+    started = time.perf_counter()
+    loop_simulation(history, monthly_income, months, loop_paths, 0)
+    loop_ms = (time.perf_counter() - started) * 1000 * paths / loop_paths
+
+    print(f"paths={paths} months={months} categories={history.shape[1]}")
+    print(f"  vectorized (simulate + summarize): median {statistics.median(timings):7.1f} ms  max {max(timings):7.1f} ms")
+    print(f"  python loop (extrapolated from {loop_paths} paths): {loop_ms:9.1f} ms")
+    print(f"  speedup: {loop_ms / statistics.median(timings):.0f}x   P(goal)={result['probability_of_goal']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    run(args.paths, args.months, args.repeats)
@@ -0,0 +1,146 @@
+"""Query plans and timings for the expense/budget hot paths before and after
+the indexing migration, on a seeded SQLite stand-in.
+
+The database is seeded at schema version 1 (the original tables and views,
+primary keys only), the hot queries are timed, then the remaining
+migrations are applied and the same queries timed again. Run with:
+
+    python -m backend.benchmarks.bench_schema_indexes --rows 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from backend.utils.database import ConnectionPool
+from backend.utils.migrations import apply_migrations
+
+CATEGORIES = ["Groceries", "Rent", "Utilities", "Transportation", "Dining", "Health",
+              "Entertainment", "Shopping", "Travel", "Insurance", "Education", "Gifts"]
+
+# (label, before-migration SQL, after-migration SQL)
+QUERIES = [
+    (
+        "month listing (V_SNG_UserExpenses_L1)",
+        "SELECT expense_id, amount, category FROM dbo.V_SNG_UserExpenses_L1 WHERE user_id = ? AND expense_month = ?",
+        "SELECT expense_id, amount, category FROM dbo.V_SNG_UserExpenses_L1 WHERE user_id = ? AND expense_month = ?",
+    ),
+    (
+        "category spend in range",
+        "SELECT SUM(amount) FROM dbo.T_SNG_Expenses WHERE user_id = ? AND category = ? AND expense_date BETWEEN ? AND ?",
+        "SELECT SUM(amount) FROM dbo.T_SNG_Expenses WHERE user_id = ? AND category = ? AND expense_date BETWEEN ? AND ?",
+    ),
+    (
+        "budget status for a user",
+        "SELECT category, budgeted_amount, actual_spent FROM dbo.V_SNG_BudgetStatus_L1 WHERE user_id = ? ORDER BY start_date DESC",
+        "SELECT category, amount, actual_spent FROM dbo.T_SNG_Budgets WHERE user_id = ? ORDER BY start_date DESC",
+    ),
+]
+
+
+def seed(conn, rows, users):
+    rng = random.Random(42)
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO dbo.T_SNG_Users (username) VALUES (?)",
+        [(f"user{i}",) for i in range(1, users + 1)]
+    )
+    start = date(2023, 1, 1)
+    batch = []
+    for _ in range(rows):
+        batch.append((
+            rng.randint(1, users),
+            round(rng.uniform(1, 300), 2),
+            rng.choice(CATEGORIES),
+            "seeded",
+            (start + timedelta(days=rng.randint(0, 3 * 365 - 1))).isoformat()
+        ))
+        if len(batch) == 50000:
+            cursor.executemany(
+                "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (?, ?, ?, ?, ?)",
+                batch
+            )
+            batch.clear()
+    if batch:
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (?, ?, ?, ?, ?)",
+            batch
+        )
+
+    budgets = []
+    for user_id in range(1, users + 1):
+        for category in CATEGORIES[:4]:
+            for month in (1, 2, 3):
+                first = date(2025, month, 1)
+                last = date(2025, month + 1, 1) - timedelta(days=1)
+                budgets.append((user_id, category, 500, first.isoformat(), last.isoformat()))
+    cursor.executemany(
+        "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
+        budgets
+    )
+    conn.commit()
+
+
+def measure(conn, phase, users, repeats):
+    rng = random.Random(7)
+    cursor = conn.cursor()
+    params = [
+        lambda: (rng.randint(1, users), "2024-%02d" % rng.randint(1, 12)),
+        lambda: (rng.randint(1, users), rng.choice(CATEGORIES), "2024-01-01", "2024-06-30"),
+        lambda: (rng.randint(1, users),),
+    ]
+    results = {}
+    for (label, before_sql, after_sql), make_params in zip(QUERIES, params):
+        sql = before_sql if phase == "before" else after_sql
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, make_params())
+        plan = "; ".join(row[3] for row in cursor.fetchall())
+        started = time.perf_counter()
+        count = 0
+        # Slow unindexed plans get fewer repeats rather than minutes of runtime
+        while count < repeats and (count == 0 or time.perf_counter() - started < 2):
+            cursor.execute(sql, make_params())
+            cursor.fetchall()
+            count += 1
+        results[label] = ((time.perf_counter() - started) / count * 1000, plan)
+    return results
+
+
+def run(rows, users, repeats):
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    pool = ConnectionPool([path], dialect="sqlite", max_size=1)
+    conn = pool.acquire()
+    try:
+        apply_migrations(conn, "sqlite", target_version=1)
+        started = time.perf_counter()
+        seed(conn, rows, users)
+        print(f"seeded {rows:,} expenses for {users:,} users in {time.perf_counter() - started:.1f}s")
+
+        before = measure(conn, "before", users, repeats)
+        started = time.perf_counter()
+        applied = apply_migrations(conn, "sqlite")
+        print(f"applied migrations {applied} in {time.perf_counter() - started:.1f}s\n")
+        after = measure(conn, "after", users, repeats)
+
+        for label, _, _ in QUERIES:
+            before_ms, before_plan = before[label]
+            after_ms, after_plan = after[label]
+            print(f"{label}")
+            print(f"  before: {before_ms:9.3f} ms/query  plan: {before_plan}")
+            print(f"  after:  {after_ms:9.3f} ms/query  plan: {after_plan}")
+            print(f"  speedup: {before_ms / after_ms:.0f}x\n")
+    finally:
+        conn.close()
+        pool.close_all()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    run(args.rows, args.users, args.repeats)
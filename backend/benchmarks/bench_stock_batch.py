@@ -0,0 +1,53 @@
+"""Compare one batch quote request against N sequential single-ticker calls.
+
+yfinance is replaced by an in-process fake that charges a fixed round-trip
+latency per upstream call, so the numbers measure call structure rather than
+Yahoo's mood. Run with:
+
+    python -m backend.benchmarks.bench_stock_batch --tickers 20 --latency 0.08
+"""
+import argparse
+import time
+from unittest import mock
+
+from backend.benchmarks.fakes import FakeYahoo
+from backend.tools import stock_prices
+
+SYMBOLS = [
+    "AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "BRK.B", "JPM", "V",
+    "JNJ", "WMT", "PG", "MA", "HD", "XOM", "CVX", "KO", "PEP", "COST",
+    "ABBV", "MRK", "AVGO", "ADBE", "CRM", "NFLX", "ORCL", "INTC", "AMD", "QCOM",
+]
+
+
+def run(n_tickers, latency):
+    tickers = SYMBOLS[:n_tickers]
+    fake = FakeYahoo(latency)
+    with mock.patch.object(stock_prices, "yf", fake):
+        stock_prices._quote_cache.clear()
+        started = time.perf_counter()
+        for ticker in tickers:
+            stock_prices.get_stock_price(ticker)
+        sequential = time.perf_counter() - started
+        sequential_calls = fake.calls
+
+        stock_prices._quote_cache.clear()
+        fake.calls = 0
+        started = time.perf_counter()
+        result = stock_prices.get_stock_prices(tickers)
+        batch = time.perf_counter() - started
+        batch_calls = fake.calls
+
+    assert result["count"] == len(tickers), result["errors"]
+    print(f"tickers={len(tickers)} upstream_latency={latency * 1000:.0f}ms")
+    print(f"  sequential singles: {sequential * 1000:8.1f} ms  upstream calls={sequential_calls}")
+    print(f"  one batch request:  {batch * 1000:8.1f} ms  upstream calls={batch_calls}")
+    print(f"  speedup: {sequential / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.08)
+    args = parser.parse_args()
+    run(min(args.tickers, len(SYMBOLS)), args.latency)
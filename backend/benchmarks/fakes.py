@@ -0,0 +1,317 @@
+"""Local stand-ins for every upstream the API talks to.
+
+Each fake charges a configurable round-trip latency per call, so benchmark
+numbers measure our call structure rather than the network:
+
+- ``FakeResponsesAPI``: the OpenAI Responses API, as an ``httpx`` transport
+  handler. Questions about stocks get one ``get_stock_quotes`` tool call
+  before the answer, so agent runs exercise the tool loop.
+- ``FakeYahoo``: the parts of ``yfinance`` the stock tools use.
+- ``FakeFxAdapter``: a ``requests`` adapter answering the exchange-rate API.
+- ``sqlite_standin``: the ``T_SNG_*`` schema and views in a SQLite file,
+  seeded with users, a year of expenses and this month's budgets.
+- ``sqlite_database``: an empty, migrated SQLite file installed as the
+  process-wide pool, for tests that seed their own rows.
+
+``offline_upstreams`` installs all of them and restores the originals on exit.
+``disconnecting_request`` plays a client that hangs up mid-response.
+"""
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from unittest import mock
+
+import httpx
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+
+from backend.tools import currency_rates, stock_prices
+from backend.utils import admission, answer_cache, database, llm_gateway
+from backend.utils.admission import AdmissionController, configure_admission
+from backend.utils.answer_cache import AnswerCache, configure_answer_cache
+from backend.utils.database import ConnectionPool
+from backend.utils.llm_gateway import LLMGateway, configure_gateway
+from backend.utils.migrations import apply_migrations
+from backend.utils.upstream import get_upstream
+
+CATEGORIES = ["Rent", "Groceries", "Dining", "Transport", "Utilities", "Fun"]
+
+
+class FakeYahoo:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def _history(self, symbols):
+        self.calls += 1
+        time.sleep(self.latency)
+        index = pd.DatetimeIndex([pd.Timestamp.now().normalize()])
+        columns = pd.MultiIndex.from_product([symbols, ["Open", "High", "Low", "Close", "Volume"]])
+        return pd.DataFrame([[100.0] * len(columns)], index=index, columns=columns)
+
+    def download(self, symbols, **kwargs):
+        return self._history(list(symbols))
+
+    def Ticker(self, symbol):
+        fake = self
+
+        class _Ticker:
+            fast_info = {"currency": "USD"}
+
+            def history(self, period):
+                return fake._history([symbol])[symbol]
+
+        return _Ticker()
+
+
+def response_body(output, response_id="resp_fake"):
+    return {
+        "id": response_id,
+        "object": "response",
+        "created_at": 0,
+        "model": "gpt-4.1",
+        "status": "completed",
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+def message_item(text):
+    return {
+        "type": "message",
+        "id": "msg_fake",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": text, "annotations": []}],
+    }
+
+
+def function_call_item(name, arguments, call_id="call_fake"):
+    return {
+        "type": "function_call",
+        "id": "fc_fake",
+        "call_id": call_id,
+        "name": name,
+        "arguments": json.dumps(arguments),
+        "status": "completed",
+    }
+
+
+class FakeResponsesAPI:
+    """``httpx.MockTransport`` handler that answers like the Responses API"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def _output(self, body):
+        items = body.get("input")
+        answered_tool = isinstance(items, list) and any(
+            isinstance(item, dict) and item.get("type") == "function_call_output" for item in items
+        )
+        tools = {tool.get("name") for tool in body.get("tools", [])}
+        if not answered_tool and "get_stock_quotes" in tools and "stock" in json.dumps(items).lower():
+            return [function_call_item("get_stock_quotes", {"tickers": ["AAPL", "MSFT"]})]
+        return [message_item("Keep an emergency fund of three to six months of expenses.")]
+
+    def _stream(self, output):
+        text = output[0]["content"][0]["text"]
+        events = [
+            {"type": "response.output_text.delta", "delta": word + " ", "item_id": "msg_fake",
+             "output_index": 0, "content_index": 0}
+            for word in text.split()
+        ]
+        events.append({"type": "response.completed", "response": response_body(output)})
+        return "".join(
+            f"event: {event['type']}\ndata: {json.dumps({**event, 'sequence_number': i})}\n\n"
+            for i, event in enumerate(events)
+        )
+
+    async def __call__(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        body = json.loads(request.content)
+        output = self._output(body)
+        if body.get("stream"):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=self._stream(output))
+        return httpx.Response(200, json=response_body(output, f"resp_fake_{self.calls}"))
+
+
+class FakeFxAdapter(BaseAdapter):
+    """Serves a fixed USD rate table for any exchange-rate API URL"""
+
+    RATES = {"USD": 1.0, "EUR": 0.92, "GBP": 0.79, "JPY": 151.0, "LKR": 300.0, "INR": 83.0, "CAD": 1.36}
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps({"success": True, "base": "USD", "timestamp": time.time(),
+                                        "rates": self.RATES}).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def sqlite_standin(path, users=50, expenses_per_month=30, months=12, seed=0):
+    """Create the schema in a SQLite file, seed it and return a pool for it"""
+    rng = random.Random(seed)
+    today = date.today()
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    pool = ConnectionPool([path], dialect="sqlite", max_size=int(os.getenv("DB_POOL_SIZE", "10")))
+    conn = pool.acquire()
+    try:
+        apply_migrations(conn, "sqlite")
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO dbo.T_SNG_Users (username) VALUES (?)",
+                           [(f"user{i}",) for i in range(1, users + 1)])
+        expenses = [
+            (user_id, round(rng.uniform(5, 200), 2), rng.choice(CATEGORIES), "",
+             today - timedelta(days=rng.randrange(months * 30)))
+            for user_id in range(1, users + 1)
+            for _ in range(expenses_per_month * months)
+        ]
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) "
+            "VALUES (?, ?, ?, ?, ?)", expenses
+        )
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
+            [(user_id, category, 500, month_start, month_end)
+             for user_id in range(1, users + 1) for category in CATEGORIES]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return pool
+
+
+@contextmanager
+def sqlite_database(max_size=2, migrate=True):
+    """Install a temporary SQLite file as the process-wide pool.
+
+    Yields the pool. The schema is migrated first unless ``migrate`` is
+    false; the previous pool is put back and the file removed on exit.
+    """
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    pool = ConnectionPool([path], dialect="sqlite", max_size=max_size)
+    if migrate:
+        conn = pool.acquire()
+        try:
+            apply_migrations(conn, "sqlite")
+        finally:
+            conn.close()
+    previous_pool = database._pool
+    database.configure_pool(pool)
+    try:
+        yield pool
+    finally:
+        database.configure_pool(previous_pool)
+        pool.close_all()
+        os.remove(path)
+
+
+@contextmanager
+def offline_upstreams(llm_latency=0.0, yahoo_latency=0.0, fx_latency=0.0, users=50, db_path=None):
+    """Point the database, OpenAI, yfinance and FX clients at local fakes.
+
+    Yields a dict of the fakes. Agent answers go to a fresh answer cache, and
+    admission control keeps its queue but drops the rate limits, since every
+    load request comes from the same client. A temporary SQLite file is used
+    (and removed afterwards) unless ``db_path`` is given.
+    """
+    owns_file = db_path is None
+    if owns_file:
+        handle, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+    pool = sqlite_standin(db_path, users=users)
+    api, yahoo, fx = FakeResponsesAPI(llm_latency), FakeYahoo(yahoo_latency), FakeFxAdapter(fx_latency)
+
+    previous_pool = database._pool
+    database.configure_pool(pool)
+    previous_gateway = llm_gateway._gateway
+    previous_answers = answer_cache._answer_cache
+    configure_answer_cache(AnswerCache())
+    previous_admission = admission._admission
+    configure_admission(AdmissionController(user_rate=None, global_rate=None))
+    configure_gateway(LLMGateway(api_key="offline", transport=httpx.MockTransport(api)))
+    session = get_upstream("fx").session
+    previous_adapters = dict(session.adapters)
+    session.mount("https://", fx)
+    session.mount("http://", fx)
+    currency_rates._table = None
+    stock_prices._quote_cache.clear()
+    try:
+        with mock.patch.object(stock_prices, "yf", yahoo):
+            yield {"pool": pool, "openai": api, "yahoo": yahoo, "fx": fx}
+    finally:
+        session.adapters.clear()
+        session.adapters.update(previous_adapters)
+        currency_rates._table = None
+        stock_prices._quote_cache.clear()
+        configure_gateway(previous_gateway)
+        configure_answer_cache(previous_answers)
+        configure_admission(previous_admission)
+        database.configure_pool(previous_pool)
+        pool.close_all()
+        if owns_file:
+            os.remove(db_path)
+
+
+async def disconnecting_request(app, method, path, body=b"", after_chunks=1):
+    """Send one request straight to the ASGI ``app`` and hang up mid-response.
+
+    The client disconnects once ``after_chunks`` non-empty body chunks have
+    arrived. Returns ``(status, chunks)`` for what was received before that.
+    """
+    path, _, query = path.partition("?")
+    received, status = [], None
+    hung_up = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await hung_up.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body") and not hung_up.is_set():
+            received.append(message["body"])
+            if len(received) >= after_chunks:
+                hung_up.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    return status, received
@@ -0,0 +1,185 @@
+"""Drive concurrent load at the API in-process, with every upstream faked.
+
+The app runs behind ``httpx.ASGITransport`` and ``fakes.offline_upstreams``
+replaces SQL Server, OpenAI, yfinance and the exchange-rate API, so a run
+needs no network and no credentials. Each scenario sends ``--requests``
+requests from ``--concurrency`` workers and reports p50/p95/p99 latency and
+throughput. ``--save-baseline`` stores the results; later runs compare
+against the baseline and exit non-zero when a scenario regressed. Run with:
+
+    python -m backend.benchmarks.load_suite --requests 300 --concurrency 16 --llm-latency 0.3
+    python -m backend.benchmarks.load_suite --save-baseline
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import date
+
+import httpx
+import numpy as np
+
+from backend.benchmarks.fakes import CATEGORIES, offline_upstreams
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "load_baseline.json")
+# A scenario regresses when its p95 grows or its throughput drops by more
+# than this fraction; p95 changes under REGRESSION_FLOOR_MS are noise
+REGRESSION_TOLERANCE = 0.2
+REGRESSION_FLOOR_MS = 2.0
+
+TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "BRK.B", "JPM", "V"]
+QUESTIONS = [
+    "How much should I keep in an emergency fund?",
+    "Should I pay off debt or invest first?",
+    "What is the stock price of Apple and Microsoft today?",
+    "How do I build a monthly budget?",
+    "Is it worth refinancing a car loan?",
+]
+
+# ``request(i, users)`` returns ``(method, path, json_body)`` for the i-th request
+Scenario = namedtuple("Scenario", ["name", "request"])
+
+SCENARIOS = [
+    Scenario("stock_price", lambda i, users: ("GET", f"/api/stock-price/{TICKERS[i % len(TICKERS)]}", None)),
+    Scenario("stock_prices", lambda i, users: ("GET", f"/api/stock-prices?tickers={','.join(TICKERS)}", None)),
+    Scenario("exchange_rate", lambda i, users: ("GET", "/api/exchange-rate?base=USD&target=EUR", None)),
+    Scenario("convert", lambda i, users: ("POST", "/api/convert", {
+        "base": "USD", "target": "GBP", "amounts": [10.0 * (i % 7 + 1)] * 20
+    })),
+    Scenario("get_budgets", lambda i, users: ("GET", f"/api/get-budgets/{i % users + 1}", None)),
+    Scenario("set_budget", lambda i, users: ("POST", "/api/set-budget", {
+        "user_id": i % users + 1, "category": CATEGORIES[i % len(CATEGORIES)], "amount": 400 + i % 50,
+        "start_date": date.today().replace(day=1).isoformat(), "end_date": date.today().isoformat()
+    })),
+    Scenario("expense_summary", lambda i, users: ("GET", f"/api/expenses/summary/{i % users + 1}", None)),
+    Scenario("budget_forecast", lambda i, users: ("GET", f"/api/budgets/forecast/{i % users + 1}", None)),
+    Scenario("simulate_savings", lambda i, users: ("POST", "/api/simulate/savings", {
+        "user_id": i % users + 1, "goal_amount": 20000, "monthly_income": 4000, "months": 24,
+        "income_volatility": 0.1, "paths": 2000, "seed": i
+    })),
+    Scenario("agent", lambda i, users: ("POST", "/api/agent", {
+        "query": f"{QUESTIONS[i % len(QUESTIONS)]} (case {i})", "user_id": i % users + 1
+    })),
+]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies_ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run_scenario(client, scenario, requests, concurrency, users):
+    """Send ``requests`` requests from ``concurrency`` workers; returns the summary"""
+    latencies, errors = [], []
+    counter = itertools.count()
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            method, path, body = scenario.request(i, users)
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors.append(f"{response.status_code} {response.text[:200]}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = summarize(latencies, len(errors), time.perf_counter() - started)
+    if errors:
+        summary["first_error"] = errors[0]
+    return summary
+
+
+async def run_suite(scenarios, requests, concurrency, users, warmup=5):
+    from backend.main import create_app
+
+    transport = httpx.ASGITransport(app=create_app(init_schema=False))
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for scenario in scenarios:
+            if warmup:
+                await run_scenario(client, scenario, warmup, 1, users)
+            results[scenario.name] = await run_scenario(client, scenario, requests, concurrency, users)
+    return results
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE, floor_ms=REGRESSION_FLOOR_MS):
+    """Return one message per scenario that is slower than its baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        p95_limit = max(base["p95_ms"] * (1 + tolerance), base["p95_ms"] + floor_ms)
+        if result["p95_ms"] > p95_limit:
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms > {base['p95_ms']} ms baseline")
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {result['throughput_rps']} rps < {base['throughput_rps']} rps baseline"
+            )
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(f"{name}: {result['errors']} errors (baseline {base.get('errors', 0)})")
+    return regressions
+
+
+def run(args):
+    scenarios = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    with offline_upstreams(args.llm_latency, args.yahoo_latency, args.fx_latency, users=args.users):
+        results = asyncio.run(run_suite(scenarios, args.requests, args.concurrency, args.users))
+
+    print(f"requests={args.requests} concurrency={args.concurrency} latency: llm={args.llm_latency}s "
+          f"yahoo={args.yahoo_latency}s fx={args.fx_latency}s")
+    print(f"  {'scenario':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'errors':>8}")
+    for name, result in results.items():
+        print(f"  {name:<18}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{result['throughput_rps']:>9.1f}{result['errors']:>8}")
+        if "first_error" in result:
+            print(f"    first error: {result['first_error']}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2, default=str)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against; run with --save-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print(f"no regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--yahoo-latency", type=float, default=0.08)
+    parser.add_argument("--fx-latency", type=float, default=0.05)
+    parser.add_argument("--only", nargs="+", choices=[s.name for s in SCENARIOS])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    sys.exit(run(parser.parse_args()))
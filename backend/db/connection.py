@@ -1,15 +1,6 @@
-import pyodbc
-import os
-from dotenv import load_dotenv
+from backend.utils.database import get_db_connection
 
-load_dotenv()
 
 def get_db():
-    conn = pyodbc.connect(
-        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-        f'SERVER={os.getenv("DB_SERVER")};'
-        f'DATABASE={os.getenv("DB_NAME")};'
-        f'UID={os.getenv("DB_USER")};'
-        f'PWD={os.getenv("DB_PASSWORD")}'
-    )
-    return conn
+    # Shares the process-wide pool with backend.utils.database
+    return get_db_connection()
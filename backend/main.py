@@ -1,48 +1,97 @@
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from backend.routes.chatbot_routes import router as chatbot_router
+from backend.utils.admission import AdmissionRejected
 from backend.utils.database import init_db
+from backend.utils.executors import run_blocking
+from backend.utils.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
 
-app = FastAPI(
-    title="Finance Chatbot API",
-    description="A personal finance chatbot with various financial tools and capabilities",
-    version="1.0.0"
-)
-
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
-    init_db()
-
-# Allow frontend (localhost:5173 from Vite and others)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Register chatbot routes
-app.include_router(chatbot_router, prefix="/api", tags=["chatbot"])
-
-@app.get("/")
-def root():
-    return JSONResponse({
-        "message": "Finance Bot Backend is running.",
-        "status": "active",
-        "endpoints": {
-            "docs": "/docs",
-            "redoc": "/redoc",
-            "api": {
-                "stock_price": "/api/stock-price/{ticker}",
-                "exchange_rate": "/api/exchange-rate",
-                "agent": "/api/agent",
-                "file_search": "/api/file-search",
-                "web_search": "/api/web-search",
-                "set_budget": "/api/set-budget",
-                "get_budgets": "/api/get-budgets/{user_id}"
+# Allow frontend (localhost:5173 from Vite, 3000 from the React dev server)
+DEFAULT_CORS_ORIGINS = ["http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:5173"]
+
+
+def create_app(init_schema: bool = None) -> FastAPI:
+    """Build the API application.
+
+    Nothing here opens a connection or builds an API client: the database
+    pool, OpenAI clients and yfinance/pandas are all created on first use.
+    ``init_schema`` (default: env ``DB_INIT_ON_STARTUP``, on) runs the schema
+    check at startup; it is a single SELECT once the version marker matches.
+    """
+    if init_schema is None:
+        init_schema = os.getenv("DB_INIT_ON_STARTUP", "1").lower() not in ("0", "false", "no")
+
+    app = FastAPI(
+        title="Finance Chatbot API",
+        description="A personal finance chatbot with various financial tools and capabilities",
+        version="1.0.0"
+    )
+
+    if init_schema:
+        # Initialize database on startup, off the event loop
+        @app.on_event("startup")
+        async def startup_event():
+            await run_blocking("db", init_db)
+
+    cors_origins = os.getenv("CORS_ORIGINS")
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=cors_origins.split(",") if cors_origins else DEFAULT_CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Outermost, so the recorded latency covers every other middleware
+    app.add_middleware(MetricsMiddleware)
+
+    @app.exception_handler(AdmissionRejected)
+    async def admission_rejected(request, exc):
+        return JSONResponse({"detail": str(exc)}, status_code=exc.status_code, headers=exc.headers)
+
+    # Register chatbot routes
+    app.include_router(chatbot_router, prefix="/api", tags=["chatbot"])
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+    @app.get("/")
+    def root():
+        return JSONResponse({
+            "message": "Finance Bot Backend is running.",
+            "status": "active",
+            "endpoints": {
+                "docs": "/docs",
+                "metrics": "/metrics",
+                "redoc": "/redoc",
+                "api": {
+                    "stock_price": "/api/stock-price/{ticker}",
+                    "stock_prices": "/api/stock-prices?tickers=AAPL,MSFT",
+                    "exchange_rate": "/api/exchange-rate",
+                    "convert": "/api/convert",
+                    "agent": "/api/agent",
+                    "agent_stream": "/api/agent/stream",
+                    "file_search": "/api/file-search",
+                    "web_search": "/api/web-search",
+                    "set_budget": "/api/set-budget",
+                    "budgets_batch": "/api/budgets/batch",
+                    "get_budgets": "/api/get-budgets/{user_id}",
+                    "list_budgets": "/api/budgets/list/{user_id}",
+                    "budget_forecast": "/api/budgets/forecast/{user_id}",
+                    "import_expenses": "/api/expenses/import",
+                    "expense_summary": "/api/expenses/summary/{user_id}",
+                    "list_expenses": "/api/expenses/list/{user_id}",
+                    "export_expenses": "/api/expenses/export/{user_id}?format=csv|ndjson|parquet",
+                    "simulate_savings": "/api/simulate/savings"
+                }
             }
-        }
-    })
+        })
+
+    return app
+
+
+# Module-level app for `uvicorn backend.main:app`; use
+# `uvicorn --factory backend.main:create_app` to build one per worker instead
+app = create_app()
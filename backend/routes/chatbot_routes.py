@@ -1,17 +1,42 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Optional
-from backend.tools.stock_prices import get_stock_price
-from backend.tools.currency_rates import get_exchange_rate
-from backend.agents.finance_agent import run_agent
+from typing import List, Optional
+from datetime import date
+import asyncio
+import json
+import anyio
+from backend.tools.stock_prices import get_stock_price, get_stock_prices, quote_cache_stats
+from backend.tools.currency_rates import get_exchange_rate, convert_amounts, fx_stats
+from backend.agents.finance_agent import agent_stats, run_agent, stream_agent
 from backend.tools.file_search_tool import search_finance_files
 from backend.tools.web_search_tool import search_financial_news
-from backend.tools.budgets import set_budget, get_budgets
+from backend.tools.budgets import set_budget, get_budgets, list_budgets, upsert_budgets
+from backend.tools.budget_forecast import forecast_user_budgets, load_forecast_inputs
+from backend.tools.expenses import get_expense_summary, import_expenses_csv, list_expenses
+from backend.tools.expense_export import EXPORT_MEDIA_TYPES, accepts_gzip, claim_export_slot, export_expenses
+from backend.tools.savings_simulator import load_user_spending, simulate_user_savings
+from backend.utils.admission import get_admission
+from backend.utils.answer_cache import get_answer_cache
+from backend.utils.database import get_pool
+from backend.utils.executors import run_blocking, executor_stats
+from backend.utils.llm_gateway import get_gateway
+from backend.utils.upstream import upstream_stats
 
 router = APIRouter()
 
 class ChatQuery(BaseModel):
     query: str
+    # Enables the budget and expense tools for this user
+    user_id: Optional[int] = None
+    # Follow-up questions in the same session see a summary of earlier turns
+    session_id: Optional[str] = None
+
+class ConversionRequest(BaseModel):
+    base: str
+    target: str
+    amounts: List[float]
 
 class BudgetCreate(BaseModel):
     user_id: int
@@ -20,50 +45,141 @@ class BudgetCreate(BaseModel):
     start_date: str
     end_date: str
 
+def client_key(request: Request) -> str:
+    """Rate-limit key: the client address.
+
+    Not the ``user_id`` in the body, which is unauthenticated: a client
+    could rotate it to dodge its limit or send someone else's to drain theirs.
+    """
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
 @router.get("/stock-price/{ticker}")
-async def get_stock(ticker: str):
-    try:
-        result = get_stock_price(ticker)
-        return {"status": "success", "data": result}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def get_stock(ticker: str, request: Request):
+    async with get_admission().slot(client_key(request), "quote"):
+        try:
+            result = await run_blocking("market", get_stock_price, ticker)
+            return {"status": "success", "data": result}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stock-prices")
+async def get_stocks(tickers: str, request: Request):
+    symbols = [t for t in tickers.split(",") if t.strip()]
+    if not symbols:
+        raise HTTPException(status_code=400, detail="At least one ticker is required")
+    async with get_admission().slot(client_key(request), "quote"):
+        result = await run_blocking("market", get_stock_prices, symbols)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return {"status": "success", "data": result}
 
 @router.get("/exchange-rate")
-async def get_rate(base: str, target: str):
-    try:
-        result = get_exchange_rate(base, target)
-        return {"status": "success", "data": result}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def get_rate(base: str, target: str, request: Request):
+    async with get_admission().slot(client_key(request), "quote"):
+        try:
+            result = await run_blocking("fx", get_exchange_rate, base, target)
+            return {"status": "success", "data": result}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/convert")
+async def convert(request: ConversionRequest, http_request: Request):
+    async with get_admission().slot(client_key(http_request), "quote"):
+        try:
+            result = await run_blocking("fx", convert_amounts, request.amounts, request.base, request.target)
+            return {"status": "success", "data": result}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/agent")
-async def chat_with_agent(query: ChatQuery):
-    try:
-        response = run_agent(query.query)
-        return {"status": "success", "response": response}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def chat_with_agent(query: ChatQuery, request: Request):
+    async with get_admission().slot(client_key(request), "agent"):
+        try:
+            response = await run_agent(query.query, query.user_id, query.session_id)
+            result = {"status": "success", "response": response}
+            if query.session_id:
+                result["session_id"] = query.session_id
+            return result
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/agent/stream")
+async def stream_chat_with_agent(query: ChatQuery, request: Request):
+    # Admitted before the response starts, so a rejection is still a plain 429
+    ticket = await get_admission().acquire(client_key(request), "agent")
+
+    async def event_stream():
+        events = stream_agent(query.query, query.user_id, query.session_id)
+        try:
+            async for event in events:
+                if await request.is_disconnected():
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            try:
+                # Closing the agent stream closes the upstream model stream too.
+                # Shielded: after a disconnect every await here would be cancelled again
+                with anyio.CancelScope(shield=True):
+                    await events.aclose()
+            finally:
+                ticket.release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also covers a client that leaves before the stream is started
+        background=BackgroundTask(ticket.release)
+    )
 
 @router.get("/file-search")
-async def file_search(query: str):
-    try:
-        result = search_finance_files(query)
-        return {"status": "success", "response": result}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def file_search(query: str, request: Request):
+    async with get_admission().slot(client_key(request), "search"):
+        try:
+            result = await search_finance_files(query)
+            return {"status": "success", "response": result}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/web-search")
-async def web_search(query: str):
-    try:
-        result = search_financial_news(query)
-        return {"status": "success", "response": result}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def web_search(query: str, request: Request):
+    async with get_admission().slot(client_key(request), "search"):
+        try:
+            result = await search_financial_news(query)
+            return {"status": "success", "response": result}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+class BudgetItem(BaseModel):
+    category: str
+    amount: float
+    start_date: str
+    end_date: str
+
+class BudgetBatch(BaseModel):
+    user_id: int
+    budgets: List[BudgetItem]
+
+class SavingsSimulation(BaseModel):
+    user_id: int
+    goal_amount: float
+    monthly_income: float
+    months: int = 12
+    current_savings: float = 0.0
+    income_growth: float = 0.0
+    income_volatility: float = 0.0
+    annual_return: float = 0.0
+    return_volatility: float = 0.0
+    respect_budgets: bool = False
+    paths: Optional[int] = None
+    seed: Optional[int] = None
 
 @router.post("/set-budget")
 async def set_budget_route(budget: BudgetCreate):
     try:
-        result = set_budget(
+        result = await run_blocking(
+            "db",
+            set_budget,
             budget.user_id,
             budget.category,
             budget.amount,
@@ -74,10 +190,142 @@ async def set_budget_route(budget: BudgetCreate):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/budgets/batch")
+async def upsert_budgets_route(batch: BudgetBatch):
+    try:
+        result = await run_blocking(
+            "db",
+            upsert_budgets,
+            batch.user_id,
+            [budget.dict() for budget in batch.budgets]
+        )
+        return {"status": "success", "data": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/get-budgets/{user_id}")
 async def get_budgets_route(user_id: int):
     try:
-        result = get_budgets(user_id)
+        result = await run_blocking("db", get_budgets, user_id)
         return {"status": "success", "data": result}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/budgets/list/{user_id}")
+async def list_budgets_route(user_id: int, category: Optional[str] = None, month: Optional[str] = None,
+                             limit: Optional[int] = None, cursor: Optional[str] = None):
+    try:
+        result = await run_blocking("db", list_budgets, user_id, category, month, limit, cursor)
+        return {"status": "success", "data": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/budgets/forecast/{user_id}")
+async def forecast_budgets_route(user_id: int, as_of: Optional[date] = None):
+    try:
+        as_of = as_of or date.today()
+        # The queries run on the db pool, the vectorized forecast on the cpu pool
+        inputs = await run_blocking("db", load_forecast_inputs, as_of, user_id, user_id)
+        result = await run_blocking("cpu", forecast_user_budgets, user_id, as_of, inputs)
+        return {"status": "success", "data": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/expenses/import")
+async def import_expenses_route(user_id: int = Form(...), file: UploadFile = File(...)):
+    try:
+        # The spooled upload is read chunk by chunk on the db pool thread
+        result = await run_blocking("db", import_expenses_csv, user_id, file.file)
+        return {"status": "success", "data": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await file.close()
+
+@router.get("/expenses/summary/{user_id}")
+async def expense_summary_route(user_id: int, month: Optional[str] = None):
+    try:
+        result = await run_blocking("db", get_expense_summary, user_id, month)
+        return {"status": "success", "data": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/expenses/list/{user_id}")
+async def list_expenses_route(user_id: int, category: Optional[str] = None, month: Optional[str] = None,
+                              limit: Optional[int] = None, cursor: Optional[str] = None):
+    try:
+        result = await run_blocking("db", list_expenses, user_id, category, month, limit, cursor)
+        return {"status": "success", "data": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/expenses/export/{user_id}")
+async def export_expenses_route(request: Request, user_id: int, format: str = "csv",
+                                start_date: Optional[date] = None, end_date: Optional[date] = None):
+    gzip = format != "parquet" and accepts_gzip(request.headers.get("accept-encoding"))
+    try:
+        chunks = export_expenses(user_id, format, start_date, end_date, gzip=gzip)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The export holds a db connection until the download ends
+    slot = claim_export_slot()
+
+    async def body():
+        # Every batch is fetched and encoded on the db pool, one chunk at a time
+        pending = None
+        try:
+            while True:
+                # Shielded so a disconnect cannot detach the call mid-batch
+                pending = asyncio.ensure_future(run_blocking("db", next, chunks, None))
+                chunk = await asyncio.shield(pending)
+                if chunk is None:
+                    break
+                if chunk:
+                    yield chunk
+        finally:
+            # Shielded: after a disconnect every await here would be cancelled again
+            with anyio.CancelScope(shield=True):
+                if pending is not None and not pending.done():
+                    # The client left mid-batch; the generator can only be closed
+                    # once that batch is done, or the close would fail and leave
+                    # the connection to the garbage collector
+                    await asyncio.wait((pending,))
+                try:
+                    await run_blocking("db", chunks.close)
+                finally:
+                    slot.release()
+
+    headers = {"Content-Disposition": f'attachment; filename="expenses-{user_id}.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+        # Also covers a client that leaves before the stream is started
+        background=BackgroundTask(slot.release)
+    )
+
+@router.post("/simulate/savings")
+async def simulate_savings_route(simulation: SavingsSimulation):
+    try:
+        inputs = await run_blocking("db", load_user_spending, simulation.user_id)
+        result = await run_blocking("cpu", simulate_user_savings, **simulation.dict(), inputs=inputs)
+        return {"status": "success", "data": result}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stats")
+async def get_stats():
+    return {"status": "success", "data": {
+        "db_pool": get_pool().stats(),
+        "executors": executor_stats(),
+        "llm_gateway": get_gateway().stats(),
+        "quote_cache": quote_cache_stats(),
+        "fx": fx_stats(),
+        "upstreams": upstream_stats(),
+        "agent_cache": get_answer_cache().stats(),
+        "admission": get_admission().stats(),
+        "agent": agent_stats.snapshot()
+    }}
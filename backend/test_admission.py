@@ -0,0 +1,187 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from backend.main import create_app
+from backend.routes import chatbot_routes
+from backend.utils import admission
+from backend.utils.admission import AdmissionController, AdmissionRejected, TokenBucket, configure_admission
+from backend.utils.metrics import render_metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_take_refill_and_retry_after(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, burst=4, clock=clock)
+        self.assertEqual(bucket.take(3), 0.0)
+        self.assertAlmostEqual(bucket.take(3), 1.0)
+        clock.now = 1.0
+        self.assertEqual(bucket.take(3), 0.0)
+        clock.now = 100.0
+        self.assertEqual(bucket.tokens, 4)
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_user_and_global_buckets_reject_with_retry_after(self):
+        clock = FakeClock()
+        controller = AdmissionController(user_rate=1.0, user_burst=5, global_rate=1.0, global_burst=8, clock=clock)
+
+        async def run():
+            for _ in range(5):
+                (await controller.acquire("ip:a", "quote")).release()
+            with self.assertRaises(AdmissionRejected) as caught:
+                await controller.acquire("ip:a", "quote")
+            self.assertEqual((caught.exception.reason, caught.exception.status_code), ("user_rate", 429))
+            self.assertEqual(caught.exception.headers, {"Retry-After": "1"})
+
+            # Another caller still has its own bucket, until the global one runs dry
+            (await controller.acquire("ip:b", "search")).release()
+            with self.assertRaises(AdmissionRejected) as caught:
+                await controller.acquire("ip:c", "quote")
+            self.assertEqual(caught.exception.reason, "global_rate")
+            # Refunded: the global rejection did not spend ip:c's tokens
+            self.assertEqual(controller._users["ip:c"].tokens, 5)
+
+        asyncio.run(run())
+        stats = controller.stats()
+        self.assertEqual((stats["admitted"], stats["rejected_user_rate"], stats["rejected_global_rate"]), (6, 1, 1))
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_cheap_lane_is_served_before_queued_agent_calls(self):
+        controller = AdmissionController(max_concurrency=1, reserved_slots=0, user_rate=None, global_rate=None)
+        order = []
+
+        async def request(lane, name):
+            async with controller.slot(f"ip:{name}", lane):
+                order.append(name)
+
+        async def run():
+            holder = await controller.acquire("ip:holder", "agent")
+            waiters = [asyncio.create_task(request("agent", "agent-1")), asyncio.create_task(request("agent", "agent-2"))]
+            await asyncio.sleep(0)
+            waiters.append(asyncio.create_task(request("quote", "quote")))
+            await asyncio.sleep(0)
+            self.assertEqual(controller.stats()["queue_depth"], {"quote": 1, "search": 0, "agent": 2})
+            holder.release()
+            await asyncio.gather(*waiters)
+
+        asyncio.run(run())
+        self.assertEqual(order, ["quote", "agent-1", "agent-2"])
+        self.assertEqual(controller.stats()["in_flight"], 0)
+
+    def test_full_queue_rejects_or_sheds_lower_priority_waiters(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1, reserved_slots=0, user_rate=None, global_rate=None)
+
+        async def run():
+            holder = await controller.acquire("ip:holder", "quote")
+            agent = asyncio.create_task(controller.acquire("ip:a", "agent"))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected) as caught:
+                await controller.acquire("ip:b", "agent")
+            self.assertEqual(caught.exception.reason, "queue_full")
+
+            # A quote outranks the queued agent call and takes its place
+            quote = asyncio.create_task(controller.acquire("ip:c", "quote"))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected):
+                await agent
+            holder.release()
+            (await quote).release()
+
+        asyncio.run(run())
+        stats = controller.stats()
+        self.assertEqual((stats["shed"], stats["rejected_queue_full"], stats["in_flight"]), (1, 2, 0))
+        self.assertEqual(sum(stats["queue_depth"].values()), 0)
+
+    def test_reserved_slots_keep_quotes_moving_while_agents_hold_the_rest(self):
+        controller = AdmissionController(max_concurrency=3, reserved_slots=1, user_rate=None, global_rate=None)
+
+        async def run():
+            agents = [await controller.acquire(f"ip:{n}", "agent") for n in range(2)]
+            # The last slot is reserved: another agent call queues, a quote does not
+            queued = asyncio.create_task(controller.acquire("ip:late", "agent"))
+            await asyncio.sleep(0)
+            self.assertEqual(controller.stats()["queue_depth"]["agent"], 1)
+            quote = await controller.acquire("ip:q", "quote", timeout=0.01)
+            self.assertEqual(controller.stats()["in_flight"], 3)
+            # A finished quote frees only the reserved slot, which the agent may not take
+            quote.release()
+            await asyncio.sleep(0)
+            self.assertFalse(queued.done())
+            agents[0].release()
+            (await queued).release()
+            agents[1].release()
+
+        asyncio.run(run())
+        self.assertEqual(controller.stats()["in_flight"], 0)
+        with self.assertRaises(ValueError):
+            AdmissionController(max_concurrency=2, reserved_slots=2)
+
+    def test_deadline_and_cancelled_waiters_do_not_leak_slots(self):
+        controller = AdmissionController(max_concurrency=1, reserved_slots=0, user_rate=None, global_rate=None)
+
+        async def run():
+            holder = await controller.acquire("ip:holder", "agent")
+            with self.assertRaises(AdmissionRejected) as caught:
+                await controller.acquire("ip:a", "agent", timeout=0.01)
+            self.assertEqual((caught.exception.reason, caught.exception.status_code), ("deadline", 503))
+
+            cancelled = asyncio.create_task(controller.acquire("ip:b", "agent"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+            holder.release()
+            holder.release()
+            # The slot is free again, not held by either abandoned waiter
+            (await controller.acquire("ip:c", "agent", timeout=0.01)).release()
+
+        asyncio.run(run())
+        self.assertEqual(controller.stats()["in_flight"], 0)
+        self.assertEqual(sum(controller.stats()["queue_depth"].values()), 0)
+
+
+class TestAdmissionEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.previous = admission._admission
+        configure_admission(AdmissionController(user_rate=0.01, user_burst=2, global_rate=None))
+
+    def tearDown(self):
+        configure_admission(self.previous)
+
+    def test_rate_limited_client_gets_429_with_retry_after(self):
+        client = TestClient(create_app(init_schema=False))
+        with mock.patch.object(chatbot_routes, "get_stock_price", lambda ticker: {"ticker": ticker, "price": 1.0}):
+            statuses = [client.get("/api/stock-price/AAPL").status_code for _ in range(2)]
+            limited = client.get("/api/stock-price/AAPL")
+
+        self.assertEqual(statuses, [200, 200])
+        self.assertEqual(limited.status_code, 429)
+        self.assertEqual(limited.headers["retry-after"], "100")
+        self.assertEqual(limited.json()["detail"], "Too many requests from this client")
+        self.assertEqual(client.get("/api/stats").json()["data"]["admission"]["rejected_user_rate"], 1)
+        self.assertIn('finbot_admission_rejected_total{lane="quote",reason="user_rate"}', render_metrics())
+        self.assertIn('finbot_admission_wait_seconds_count{lane="quote"}', render_metrics())
+
+    def test_limits_follow_the_client_not_the_user_id_in_the_body(self):
+        client = TestClient(create_app(init_schema=False))
+        with mock.patch.object(chatbot_routes, "run_agent", mock.AsyncMock(return_value="ok")):
+            statuses = [
+                client.post("/api/agent", json={"query": "hi", "user_id": user_id}).status_code
+                for user_id in (1, 2, 3)
+            ]
+        # One agent call empties the bucket; rotating user_id does not buy a fresh one
+        self.assertEqual(statuses, [200, 429, 429])
+
+
+if __name__ == "__main__":
+    unittest.main()
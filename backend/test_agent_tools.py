@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from backend.agents import agent_tools, finance_agent
+from backend.utils import answer_cache
+from backend.utils.answer_cache import AnswerCache
+
+
+def function_call(call_id, name, arguments):
+    return SimpleNamespace(type="function_call", call_id=call_id, name=name, arguments=json.dumps(arguments))
+
+
+class ScriptedGateway:
+    """Returns the scripted responses in order and records every request"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def create_response(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.responses.pop(0)
+
+
+class ScriptedStreamGateway:
+    """Streams the scripted event lists in order, one list per turn"""
+
+    def __init__(self, turns):
+        self.turns = list(turns)
+
+    async def stream_response(self, **kwargs):
+        for event in self.turns.pop(0):
+            yield event
+
+
+def text_delta(delta):
+    return SimpleNamespace(type="response.output_text.delta", delta=delta)
+
+
+def slow_tool(seconds, result):
+    async def handler(**kwargs):
+        await asyncio.sleep(seconds)
+        return dict(result, **kwargs)
+    return handler
+
+
+class TestAgentToolLoop(unittest.TestCase):
+    def patched_tools(self, **handlers):
+        tools = dict(agent_tools.AGENT_TOOLS)
+        for name, (handler, timeout) in handlers.items():
+            tools[name] = tools[name]._replace(handler=handler, timeout=timeout)
+        return mock.patch.object(agent_tools, "AGENT_TOOLS", tools)
+
+    def run_turns(self, gateway, user_id=None):
+        with mock.patch.object(finance_agent, "get_gateway", lambda: gateway), \
+                mock.patch.object(finance_agent, "extract_output_text", lambda response: getattr(response, "text", "")):
+            return asyncio.run(finance_agent.run_agent_turns("AAPL price in EUR?", user_id))
+
+    def test_tool_calls_in_one_turn_run_concurrently(self):
+        gateway = ScriptedGateway([
+            SimpleNamespace(id="resp_1", output=[
+                function_call("c1", "get_stock_quotes", {"tickers": ["AAPL"]}),
+                function_call("c2", "convert_currency", {"base": "USD", "target": "EUR"}),
+            ]),
+            SimpleNamespace(id="resp_2", output=[], text="About 175 EUR."),
+        ])
+        with self.patched_tools(
+            get_stock_quotes=(slow_tool(0.2, {"price": 190}), 1.0),
+            convert_currency=(slow_tool(0.2, {"rate": 0.92}), 1.0),
+        ):
+            started = time.perf_counter()
+            text, trace = self.run_turns(gateway)
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(text, "About 175 EUR.")
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual([t["tool"] for t in trace[0]["tools"]], ["get_stock_quotes", "convert_currency"])
+        follow_up = gateway.requests[1]
+        self.assertEqual(follow_up["previous_response_id"], "resp_1")
+        self.assertEqual([item["call_id"] for item in follow_up["input"]], ["c1", "c2"])
+        self.assertEqual(json.loads(follow_up["input"][0]["output"])["tickers"], ["AAPL"])
+
+    def test_slow_tool_times_out_without_failing_the_turn(self):
+        gateway = ScriptedGateway([
+            SimpleNamespace(id="resp_1", output=[function_call("c1", "get_stock_quotes", {"tickers": ["AAPL"]})]),
+            SimpleNamespace(id="resp_2", output=[], text="Quotes are unavailable right now."),
+        ])
+        with self.patched_tools(get_stock_quotes=(slow_tool(1.0, {}), 0.05)):
+            text, trace = self.run_turns(gateway)
+
+        self.assertEqual(trace[0]["tools"][0]["status"], "timeout")
+        self.assertIn("timed out", json.loads(gateway.requests[1]["input"][0]["output"])["error"])
+        self.assertEqual(text, "Quotes are unavailable right now.")
+
+    def test_turns_are_capped(self):
+        looping = [
+            SimpleNamespace(id=f"resp_{i}", output=[function_call(f"c{i}", "get_stock_quotes", {"tickers": ["AAPL"]})])
+            for i in range(10)
+        ]
+        gateway = ScriptedGateway(looping)
+        with self.patched_tools(get_stock_quotes=(slow_tool(0, {}), 1.0)), \
+                mock.patch.object(finance_agent, "MAX_AGENT_TURNS", 3):
+            _, trace = self.run_turns(gateway)
+
+        self.assertEqual(len(trace), 3)
+        self.assertEqual(gateway.requests[-1]["tool_choice"], "none")
+
+    def test_streamed_answer_is_only_the_final_turns_text(self):
+        gateway = ScriptedStreamGateway([
+            [
+                SimpleNamespace(type="response.created", response=SimpleNamespace(id="resp_1")),
+                text_delta("Let me look that up. "),
+                SimpleNamespace(type="response.output_item.done",
+                                item=function_call("c1", "get_stock_quotes", {"tickers": ["AAPL"]})),
+            ],
+            [text_delta("About "), text_delta("175 EUR.")],
+        ])
+        cache = AnswerCache()
+
+        async def collect():
+            return [event async for event in finance_agent.stream_agent("AAPL price in EUR?")]
+
+        with self.patched_tools(get_stock_quotes=(slow_tool(0, {"price": 190}), 1.0)), \
+                mock.patch.object(finance_agent, "get_gateway", lambda: gateway), \
+                mock.patch.object(answer_cache, "_answer_cache", cache):
+            events = asyncio.run(collect())
+
+        # Every delta is still streamed, but the answer kept is the final turn's
+        self.assertEqual([e["delta"] for e in events if e["type"] == "token"],
+                         ["Let me look that up. ", "About ", "175 EUR."])
+        self.assertEqual(events[-1], {"type": "done", "response": "About 175 EUR."})
+        config = finance_agent.agent_config(finance_agent.build_agent_request("AAPL price in EUR?"), None)
+        self.assertEqual(cache.lookup("AAPL price in EUR?", config)[0], "About 175 EUR.")
+
+    def test_user_data_tools_need_a_user(self):
+        names = {tool["name"] for tool in agent_tools.tool_definitions()}
+        self.assertNotIn("get_budgets", names)
+        self.assertIn("get_budgets", {tool["name"] for tool in agent_tools.tool_definitions(user_id=1)})
+        output, timing = asyncio.run(agent_tools.call_tool("get_budgets", "{}"))
+        self.assertEqual(timing["status"], "error")
+
+
+if __name__ == "__main__":
+    unittest.main()
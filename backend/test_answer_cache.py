@@ -0,0 +1,122 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from backend.agents import finance_agent
+from backend.utils import answer_cache
+from backend.utils.answer_cache import AnswerCache, classify_query
+from backend.utils.cache import AsyncSingleFlight
+
+CONFIG = {"model": "gpt-4.1", "tools": [{"type": "web_search_preview"}]}
+
+
+class TestAnswerCache(unittest.TestCase):
+    def test_exact_then_semantic_lookup(self):
+        cache = AnswerCache()
+        cache.store("How can I save money?", CONFIG, "Spend less than you earn.")
+
+        self.assertEqual(cache.lookup("how can i save money", CONFIG), ("Spend less than you earn.", "exact"))
+        self.assertEqual(cache.lookup("Tips to save money", CONFIG), ("Spend less than you earn.", "semantic"))
+        self.assertEqual(cache.lookup("How can I make money?", CONFIG), (None, None))
+        # A different tool configuration never shares answers
+        self.assertEqual(cache.lookup("How can I save money?", {"model": "other"}), (None, None))
+
+        stats = cache.stats()
+        self.assertEqual((stats["exact_hits"], stats["semantic_hits"], stats["misses"]), (1, 1, 2))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_market_questions_expire_fast_and_need_exact_matches(self):
+        self.assertEqual(classify_query("What is the AAPL stock price?"), "market")
+        cache = AnswerCache(ttls={"market": 0.05})
+        cache.store("What is the AAPL stock price?", CONFIG, "$190")
+        self.assertEqual(cache.lookup("What is the MSFT stock price?", CONFIG), (None, None))
+        time.sleep(0.06)
+        self.assertEqual(cache.lookup("What is the AAPL stock price?", CONFIG), (None, None))
+
+    def test_numbers_must_agree_for_semantic_hits(self):
+        cache = AnswerCache()
+        cache.store("How much is 20% of my 3000 budget?", CONFIG, "600")
+        self.assertEqual(cache.lookup("how much is 20% of my 4000 budget", CONFIG), (None, None))
+
+    def test_lru_eviction_bounds_memory(self):
+        cache = AnswerCache(max_entries=2)
+        for topic in ("saving", "investing", "retirement"):
+            cache.store(f"Explain {topic}", CONFIG, topic)
+        self.assertEqual(cache.lookup("Explain saving", CONFIG), (None, None))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+class TestAgentSingleFlight(unittest.TestCase):
+    def test_identical_concurrent_questions_share_one_model_call(self):
+        calls = []
+
+        class SlowGateway:
+            async def create_response(self, **kwargs):
+                calls.append(kwargs["input"])
+                await asyncio.sleep(0.05)
+                return object()
+
+        async def ask_many():
+            return await asyncio.gather(*(finance_agent.run_agent("How do I build credit?") for _ in range(5)))
+
+        with mock.patch.object(finance_agent, "get_gateway", lambda: SlowGateway()), \
+                mock.patch.object(finance_agent, "extract_output_text", lambda response: "Pay on time."), \
+                mock.patch.object(answer_cache, "_answer_cache", AnswerCache()):
+            answers = asyncio.run(ask_many())
+            again = asyncio.run(finance_agent.run_agent("how do i build credit"))
+            stats = answer_cache.get_answer_cache().stats()
+
+        self.assertEqual(answers, ["Pay on time."] * 5)
+        self.assertEqual(again, "Pay on time.")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((stats["coalesced"], stats["exact_hits"]), (4, 1))
+
+    def test_cancelled_leader_does_not_cancel_its_followers(self):
+        flight = AsyncSingleFlight()
+        started = []
+
+        async def call():
+            started.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        async def run():
+            leader = asyncio.create_task(flight.do("q", call))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flight.do("q", call))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        self.assertEqual(asyncio.run(run()), ("answer", True))
+        self.assertEqual(len(started), 1)
+
+    def test_call_is_cancelled_once_every_waiter_has_gone(self):
+        flight = AsyncSingleFlight()
+        cancelled = []
+
+        async def call():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        async def run():
+            waiters = [asyncio.create_task(flight.do("q", call)) for _ in range(2)]
+            await asyncio.sleep(0)
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        self.assertEqual(cancelled, [1])
+        self.assertEqual(flight._calls, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from backend.benchmarks.fakes import sqlite_database
+from backend.utils import database, migrations
+from backend.utils.database import init_db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestLazyStartup(unittest.TestCase):
+    def test_importing_the_app_skips_heavy_dependencies(self):
+        code = (
+            "import json, sys, backend.main\n"
+            "print(json.dumps([m for m in ('numpy', 'pandas', 'yfinance', 'openai') if m in sys.modules]))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(json.loads(output.strip().splitlines()[-1]), [])
+
+    def test_lazy_modules_load_on_first_use(self):
+        from backend.tools import currency_rates
+        table = currency_rates.FxRateTable("USD", {"USD": 1.0, "EUR": 0.5}, 0)
+        self.assertEqual(table.convert([2.0], "USD", "EUR").tolist(), [1.0])
+        self.assertTrue(currency_rates.np.loaded)
+
+
+class TestSchemaMarker(unittest.TestCase):
+    def setUp(self):
+        self.enterContext(sqlite_database(migrate=False))
+
+    def test_migrations_run_once_then_the_marker_short_circuits(self):
+        with mock.patch("builtins.print"):
+            self.assertTrue(init_db())
+        # A fresh process (simulated by resetting the flag) only reads the marker
+        database._schema_ready = False
+        with mock.patch.object(database, "apply_migrations", side_effect=AssertionError("DDL ran")):
+            self.assertFalse(init_db())
+            self.assertFalse(init_db())
+
+    def test_outdated_marker_triggers_migrations(self):
+        conn = database.get_db_connection()
+        migrations.apply_migrations(conn, "sqlite", target_version=migrations.LATEST_VERSION - 1)
+        self.assertFalse(migrations.schema_is_current(conn))
+        conn.close()
+        with mock.patch("builtins.print"):
+            self.assertTrue(init_db())
+        conn = database.get_db_connection()
+        self.assertTrue(migrations.schema_is_current(conn))
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
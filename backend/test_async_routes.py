@@ -0,0 +1,56 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest import mock
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from backend.main import app
+from backend.routes import chatbot_routes
+
+SLOW_SECONDS = 1.0
+
+
+def slow_stock_price(ticker):
+    time.sleep(SLOW_SECONDS)
+    return {"ticker": ticker, "price": 1.0, "currency": "USD"}
+
+
+def fast_exchange_rate(base, target):
+    return {"base": base, "target": target, "rate": 1.0, "timestamp": None}
+
+
+class TestSlowToolsDoNotBlock(unittest.TestCase):
+    async def _timed_get(self, client, url):
+        started = time.perf_counter()
+        response = await client.get(url)
+        return response, time.perf_counter() - started
+
+    async def _run(self):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            slow = asyncio.create_task(self._timed_get(client, "/api/stock-price/AAPL"))
+            await asyncio.sleep(0.05)
+            root, root_elapsed = await self._timed_get(client, "/")
+            rate, rate_elapsed = await self._timed_get(client, "/api/exchange-rate?base=USD&target=EUR")
+            slow_response, slow_elapsed = await slow
+        return root, root_elapsed, rate, rate_elapsed, slow_response, slow_elapsed
+
+    def test_slow_stock_lookup_does_not_delay_other_endpoints(self):
+        with mock.patch.object(chatbot_routes, "get_stock_price", slow_stock_price), \
+                mock.patch.object(chatbot_routes, "get_exchange_rate", fast_exchange_rate):
+            root, root_elapsed, rate, rate_elapsed, slow, slow_elapsed = asyncio.run(self._run())
+
+        self.assertEqual(root.status_code, 200)
+        self.assertEqual(rate.status_code, 200)
+        self.assertEqual(slow.status_code, 200)
+        self.assertGreaterEqual(slow_elapsed, SLOW_SECONDS * 0.9)
+        self.assertLess(root_elapsed, SLOW_SECONDS / 4)
+        self.assertLess(rate_elapsed, SLOW_SECONDS / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from backend.benchmarks.fakes import sqlite_database
+from backend.tools import budgets
+
+JANUARY = {"start_date": "2025-01-01", "end_date": "2025-01-31"}
+
+
+class TestBudgetBatch(unittest.TestCase):
+    def setUp(self):
+        self.pool = self.enterContext(sqlite_database())
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO dbo.T_SNG_Users (username) VALUES ('test')")
+        cursor.execute(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, expense_date) VALUES (1, 75, 'Food', ?)",
+            (date(2025, 1, 10),)
+        )
+        conn.commit()
+        conn.close()
+
+    def test_batch_creates_then_updates_the_same_periods(self):
+        created = budgets.upsert_budgets(1, [
+            {"category": "Food", "amount": 300, **JANUARY},
+            {"category": "Rent", "amount": 900, **JANUARY},
+        ])
+        self.assertEqual(created["created"], 2)
+        food, rent = created["budgets"]
+        self.assertEqual((food["category"], food["actual_spent"], food["remaining_amount"]), ("Food", 75.0, 225.0))
+        self.assertEqual((rent["category"], rent["actual_spent"]), ("Rent", 0.0))
+
+        updated = budgets.upsert_budgets(1, [
+            {"category": "Food", "amount": 250, **JANUARY},
+            {"category": "Travel", "amount": 50, **JANUARY},
+        ])
+        self.assertEqual((updated["created"], updated["updated"]), (1, 1))
+        self.assertEqual(updated["budgets"][0]["budget_id"], food["budget_id"])
+        self.assertEqual(updated["budgets"][0]["remaining_amount"], 175.0)
+        self.assertEqual(updated["budgets"][1]["action"], "created")
+        self.assertEqual(budgets.get_budgets(1)["count"], 3)
+
+    def test_set_budget_returns_the_budget_it_wrote(self):
+        budgets.set_budget(1, "Food", 100, "2024-12-01", "2024-12-31")
+        result = budgets.set_budget(1, "Food", 300, **JANUARY)
+        self.assertEqual(result["budget"]["start_date"], "2025-01-01")
+        self.assertEqual(result["budget"]["actual_spent"], 75.0)
+
+    def test_invalid_batch_writes_nothing(self):
+        with self.assertRaises(ValueError):
+            budgets.upsert_budgets(1, [
+                {"category": "Food", "amount": 300, **JANUARY},
+                {"category": "Rent", "amount": 900, "start_date": "2025-02-01", "end_date": "2025-01-01"},
+            ])
+        self.assertEqual(budgets.get_budgets(1)["count"], 0)
+
+    def test_failed_merge_is_not_hidden_by_the_cleanup_drop(self):
+        cursor = mock.Mock()
+
+        def execute(sql, *args):
+            if "MERGE" in sql:
+                raise RuntimeError("merge failed")
+            if sql.startswith("DROP"):
+                raise RuntimeError("transaction is doomed")
+
+        cursor.execute.side_effect = execute
+        with self.assertRaisesRegex(RuntimeError, "merge failed"):
+            budgets._upsert_mssql(cursor, [])
+        self.assertEqual(cursor.execute.call_args.args, ("DROP TABLE #BudgetBatch",))
+
+    def test_get_budgets_reports_a_connection_failure(self):
+        with mock.patch.object(budgets, "get_db_connection", side_effect=RuntimeError("pool exhausted")):
+            with self.assertRaisesRegex(RuntimeError, "pool exhausted"):
+                budgets.get_budgets(1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+from datetime import date, timedelta
+
+from backend.benchmarks.fakes import sqlite_database
+from backend.tools import budget_forecast
+from backend.tools.budget_forecast import forecast_user_budgets, run_nightly_forecasts
+from backend.utils import database
+
+JANUARY = (date(2025, 1, 1), date(2025, 1, 31))
+
+
+def saturdays(start, end):
+    day = start + timedelta(days=(5 - start.weekday()) % 7)
+    while day <= end:
+        yield day
+        day += timedelta(days=7)
+
+
+class TestBudgetForecast(unittest.TestCase):
+    def setUp(self):
+        self.pool = self.enterContext(sqlite_database())
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO dbo.T_SNG_Users (username) VALUES (?)", [("sat",), ("subs",), ("idle",)])
+        expenses = [(1, 70, "Food", "", day) for day in saturdays(date(2024, 10, 1), date(2025, 1, 31))]
+        # User 2: a streaming charge on the 5th and rent on the 20th, plus groceries
+        for month in (10, 11, 12):
+            expenses.append((2, 15.99, "Bills", "Netflix", date(2024, month, 5)))
+            expenses.append((2, 900, "Bills", "Rent", date(2024, month, 20)))
+        expenses.append((2, 15.99, "Bills", "Netflix", date(2025, 1, 5)))
+        expenses.append((2, 60, "Bills", "Electricity", date(2025, 1, 9)))
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (?, ?, ?, ?, ?)",
+            expenses
+        )
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
+            [(1, "Food", 250, *JANUARY), (2, "Bills", 1000, *JANUARY), (3, "Fun", 50, *JANUARY)]
+        )
+        conn.commit()
+        conn.close()
+
+    def test_weekday_pattern_shapes_the_projection(self):
+        # Friday the 10th: one Saturday spent, three still ahead
+        forecast = forecast_user_budgets(1, date(2025, 1, 10))["forecasts"][0]
+        self.assertEqual((forecast["spent_to_date"], forecast["days_remaining"]), (70.0, 21))
+        flat = 70 + 70 / 10 * 21
+        self.assertGreater(forecast["projected_spend"], flat)
+        self.assertLessEqual(forecast["projected_spend"], 70 * 4)
+
+        # Sunday the 12th: two Saturdays spent, two ahead; flat overshoots
+        forecast = forecast_user_budgets(1, date(2025, 1, 12))["forecasts"][0]
+        self.assertLess(forecast["projected_spend"], 140 + 140 / 12 * 19)
+        self.assertGreaterEqual(forecast["projected_spend"], 70 * 4)
+
+    def test_recurring_charges_are_not_extrapolated(self):
+        result = forecast_user_budgets(2, date(2025, 1, 15))
+        forecast = result["forecasts"][0]
+        self.assertEqual(forecast["spent_to_date"], 75.99)
+        self.assertEqual(forecast["recurring_to_date"], 15.99)
+        # Rent is due on the 19th/20th; Netflix is not due again until February
+        self.assertEqual(forecast["expected_recurring"], 900.0)
+        self.assertAlmostEqual(forecast["projected_spend"], 75.99 + 900 + forecast["daily_rate"] * 16, delta=30)
+        self.assertTrue(forecast["will_exceed"])
+        self.assertEqual(result["at_risk"], 1)
+        self.assertIsNotNone(forecast["exhaustion_date"])
+
+    def insert(self, sql, rows):
+        conn = self.pool.acquire()
+        conn.cursor().executemany(sql, rows)
+        conn.commit()
+        conn.close()
+
+    def test_overlapping_budgets_each_count_the_expense(self):
+        # A weekly Food budget inside the monthly one, as the totals triggers see it
+        self.insert(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
+            [(1, "Food", 80, date(2025, 1, 6), date(2025, 1, 12))]
+        )
+        forecasts = forecast_user_budgets(1, date(2025, 1, 12))["forecasts"]
+        spent = {f["end_date"]: f["spent_to_date"] for f in forecasts}
+        self.assertEqual(spent, {"2025-01-31": 140.0, "2025-01-12": 70.0})
+
+    def test_daily_purchases_at_the_same_price_are_not_recurring(self):
+        start = date(2024, 12, 1)
+        self.insert(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (?, ?, ?, ?, ?)",
+            [(3, 4.5, "Fun", "Coffee", start + timedelta(days=n)) for n in range(45)]
+        )
+        forecast = forecast_user_budgets(3, date(2025, 1, 14))["forecasts"][0]
+        self.assertEqual((forecast["recurring_to_date"], forecast["expected_recurring"]), (0.0, 0.0))
+        self.assertEqual(forecast["spent_to_date"], 63.0)
+        self.assertGreater(forecast["projected_spend"], 4.5 * 31 - 10)
+
+    def test_nightly_job_writes_one_row_per_active_budget(self):
+        stats = run_nightly_forecasts(date(2025, 1, 15), partition_users=2)
+        self.assertEqual((stats["users"], stats["budgets"], stats["partitions"]), (3, 3, 2))
+        run_nightly_forecasts(date(2025, 1, 15), partition_users=1)
+
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, projected_spend, will_exceed FROM dbo.T_SNG_BudgetForecasts ORDER BY user_id")
+        rows = cursor.fetchall()
+        conn.close()
+        self.assertEqual([row[0] for row in rows], [1, 2, 3])
+        single = forecast_user_budgets(2, date(2025, 1, 15))["forecasts"][0]
+        self.assertAlmostEqual(float(rows[1][1]), single["projected_spend"], places=2)
+        self.assertEqual(rows[1][2], 1)
+        # An idle user's budget projects to nothing spent
+        self.assertEqual((float(rows[2][1]), rows[2][2]), (0.0, 0))
+
+    def test_weekday_counts(self):
+        import numpy as np
+        counts = budget_forecast.weekday_counts(np.array(["2025-01-06"], dtype="datetime64[D]"), [10])
+        self.assertEqual(counts.tolist(), [[2, 2, 2, 1, 1, 1, 1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from backend.tools import currency_rates
+from backend.tools.currency_rates import FxRateTable
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class TestFxRateTable(unittest.TestCase):
+    def setUp(self):
+        self.table = FxRateTable("USD", {"EUR": 0.8, "GBP": 0.5, "JPY": 100.0}, as_of=0)
+
+    def test_cross_rates_are_consistent(self):
+        self.assertAlmostEqual(self.table.rate("EUR", "GBP"), 0.625)
+        self.assertAlmostEqual(self.table.rate("GBP", "EUR") * self.table.rate("EUR", "GBP"), 1.0)
+        self.assertAlmostEqual(
+            self.table.rate("GBP", "EUR") * self.table.rate("EUR", "JPY"),
+            self.table.rate("GBP", "JPY")
+        )
+        self.assertEqual(self.table.rate("JPY", "JPY"), 1.0)
+        with self.assertRaises(ValueError):
+            self.table.rate("USD", "XXX")
+
+    def test_bulk_conversions(self):
+        np.testing.assert_allclose(self.table.convert([10, 20], "USD", "EUR"), [8, 16])
+        np.testing.assert_allclose(
+            self.table.convert_pairs([1, 1, 100], ["USD", "GBP", "JPY"], ["JPY", "USD", "EUR"]),
+            [100, 2, 0.8]
+        )
+
+    def test_one_fetch_serves_many_pairs_until_refresh(self):
+        payload = {"success": True, "timestamp": int(time.time()), "rates": {"EUR": 0.8, "GBP": 0.5}}
+        with mock.patch.object(currency_rates.get_upstream("fx").session, "get", return_value=FakeResponse(payload)) as get, \
+                mock.patch.object(currency_rates, "_table", None):
+            first = currency_rates.get_exchange_rate("usd", "eur")
+            second = currency_rates.get_exchange_rate("GBP", "EUR")
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(first["rate"], 0.8)
+        self.assertEqual(second["rate"], 1.6)
+        self.assertIn("age_seconds", second)
+
+    def test_expired_table_keeps_serving_while_the_upstream_is_down(self):
+        table = FxRateTable("USD", {"EUR": 0.8}, as_of=0)
+        refreshing, release = threading.Event(), threading.Event()
+
+        def down(fn):
+            refreshing.set()
+            release.wait(5)
+            raise ConnectionError("fx is down")
+
+        expired = time.time() - currency_rates.FX_REFRESH_SECONDS - 1
+        with mock.patch.object(currency_rates.get_upstream("fx"), "call", side_effect=down) as call, \
+                mock.patch.multiple(currency_rates, _table=table, _table_fetched_at=expired,
+                                    _next_attempt_at=0.0, _failed_refreshes=0):
+            refresher = threading.Thread(target=currency_rates.get_rate_table)
+            refresher.start()
+            self.assertTrue(refreshing.wait(5))
+            # Served straight away while the one refresh is stuck upstream
+            started = time.perf_counter()
+            self.assertIs(currency_rates.get_rate_table(), table)
+            self.assertLess(time.perf_counter() - started, 0.1)
+            release.set()
+            refresher.join(5)
+
+            # The failure backs off: later calls do not try again yet
+            for _ in range(3):
+                self.assertEqual(currency_rates.get_exchange_rate("USD", "EUR")["rate"], 0.8)
+            self.assertEqual(call.call_count, 1)
+            self.assertGreater(currency_rates._next_attempt_at, time.time())
+
+
+if __name__ == "__main__":
+    unittest.main()
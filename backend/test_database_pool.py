@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from backend.utils.database import ConnectionPool, connect_sqlite
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        conn = connect_sqlite(self.path)
+        conn.execute("CREATE TABLE dbo.T_SNG_Budgets (budget_id INTEGER PRIMARY KEY, amount REAL)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_reuses_warm_connections(self):
+        pool = ConnectionPool([self.path], dialect="sqlite", max_size=2)
+        for _ in range(5):
+            conn = pool.acquire()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM dbo.T_SNG_Budgets")
+            self.assertEqual(cursor.fetchone()[0], 0)
+            conn.close()
+        stats = pool.stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["reused"], 4)
+        self.assertEqual(stats["idle"], 1)
+
+    def test_remembers_working_target(self):
+        attempts = []
+
+        def connect(target):
+            attempts.append(target)
+            if target == "bad":
+                raise sqlite3.OperationalError("unreachable")
+            return connect_sqlite(target)
+
+        pool = ConnectionPool(["bad", self.path], connect=connect, dialect="sqlite")
+        first, second = pool.acquire(), pool.acquire()
+        first.close()
+        second.close()
+        self.assertEqual(attempts, ["bad", self.path, self.path])
+        self.assertEqual(pool.stats()["connect_failures"], 1)
+
+    def test_pool_size_is_bounded(self):
+        pool = ConnectionPool([self.path], dialect="sqlite", max_size=1, acquire_timeout=0.1)
+        held = pool.acquire()
+        with self.assertRaises(Exception):
+            pool.acquire()
+
+        threading.Timer(0.05, held.close).start()
+        pool.acquire_timeout = 2
+        conn = pool.acquire()
+        conn.close()
+        self.assertEqual(pool.stats()["created"], 1)
+
+    def test_evicts_idle_and_unhealthy_connections(self):
+        pool = ConnectionPool([self.path], dialect="sqlite", max_idle_seconds=0.01)
+        pool.acquire().close()
+        time.sleep(0.02)
+        pool.acquire().close()
+        self.assertEqual(pool.stats()["evicted_idle"], 1)
+
+        pool = ConnectionPool([self.path], dialect="sqlite", health_check_interval=0)
+        conn = pool.acquire()
+        raw = conn._raw
+        conn.close()
+        raw.close()
+        pool.acquire().close()
+        stats = pool.stats()
+        self.assertEqual(stats["failed_health_checks"], 1)
+        self.assertEqual(stats["created"], 2)
+
+    def test_release_rolls_back_uncommitted_work(self):
+        pool = ConnectionPool([self.path], dialect="sqlite", max_size=1)
+        conn = pool.acquire()
+        conn.cursor().execute("INSERT INTO dbo.T_SNG_Budgets (amount) VALUES (10)")
+        conn.close()
+        conn = pool.acquire()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM dbo.T_SNG_Budgets")
+        self.assertEqual(cursor.fetchone()[0], 0)
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
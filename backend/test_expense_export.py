@@ -0,0 +1,143 @@
+import asyncio
+import csv
+import io
+import json
+import time
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+
+from backend.benchmarks.fakes import disconnecting_request, sqlite_database
+from backend.main import create_app
+from backend.tools import expense_export
+from backend.tools.expense_export import EXPORT_MAX_CONCURRENCY, accepts_gzip, claim_export_slot, export_expenses
+
+ROWS = 2500
+
+
+class TestExpenseExport(unittest.TestCase):
+    def setUp(self):
+        self.pool = self.enterContext(sqlite_database())
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO dbo.T_SNG_Users (username) VALUES (?)", [("a",), ("b",)])
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (?, ?, ?, ?, ?)",
+            [(1, i % 97 + 0.5, "Food" if i % 2 else "Rent", f'item "{i}", note' if i % 3 else None,
+              date(2020, 1, 1) + timedelta(days=i % 1000)) for i in range(ROWS)]
+            + [(2, 1, "Food", "not mine", date(2021, 1, 1))]
+        )
+        conn.commit()
+        conn.close()
+
+    def test_csv_and_ndjson_stream_every_row_in_batches(self):
+        chunks = list(export_expenses(1, "csv"))
+        self.assertGreater(len(chunks), 1)
+        rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+        self.assertEqual(len(rows), ROWS)
+        self.assertEqual(rows[0]["expense_date"], "2020-01-01")
+        self.assertIn('item "1", note', {row["description"] for row in rows})
+        self.assertEqual({row["category"] for row in rows}, {"Food", "Rent"})
+
+        lines = b"".join(export_expenses(1, "ndjson", start_date=date(2020, 1, 1), end_date=date(2020, 1, 10))).splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 30)
+        self.assertTrue(all("2020-01-01" <= r["expense_date"] <= "2020-01-10" for r in records))
+        self.assertEqual(self.pool.stats()["in_use"], 0)
+
+    def test_parquet_is_written_in_row_groups(self):
+        chunks = list(expense_export.parquet_chunks(
+            expense_export.iter_expense_batches(1, batch_rows=300), row_group_rows=1000
+        ))
+        table_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+        self.assertEqual(table_file.metadata.num_rows, ROWS)
+        self.assertEqual(table_file.metadata.num_row_groups, 3)
+        # Each finished row group is passed on before the next one is read
+        self.assertGreaterEqual(len([chunk for chunk in chunks if chunk]), 3)
+        table = table_file.read()
+        self.assertEqual(table.column("expense_date")[0].as_py(), date(2020, 1, 1))
+        self.assertAlmostEqual(sum(table.column("amount").to_pylist()), sum(i % 97 + 0.5 for i in range(ROWS)))
+
+    def test_abandoned_stream_releases_its_connection(self):
+        chunks = export_expenses(1, "csv")
+        next(chunks)
+        next(chunks)
+        self.assertEqual(self.pool.stats()["in_use"], 1)
+        chunks.close()
+        self.assertEqual(self.pool.stats()["in_use"], 0)
+
+    def test_client_leaving_mid_batch_releases_the_connection(self):
+        encode = expense_export.csv_chunks
+
+        def slow_csv_chunks(batches):
+            for chunk in encode(expense_export.iter_expense_batches(1, batch_rows=100)):
+                time.sleep(0.02)
+                yield chunk
+
+        with mock.patch.object(expense_export, "csv_chunks", slow_csv_chunks):
+            status, received = asyncio.run(
+                disconnecting_request(create_app(init_schema=False), "GET", "/api/expenses/export/1?format=csv",
+                                      after_chunks=2)
+            )
+        self.assertEqual(status, 200)
+        self.assertLess(len(received), ROWS // 100)
+        # Released as soon as the response ends, not whenever the generator is collected
+        self.assertEqual(self.pool.stats()["in_use"], 0)
+        self.assert_export_slots_free()
+
+    def assert_export_slots_free(self):
+        slots = [claim_export_slot() for _ in range(EXPORT_MAX_CONCURRENCY)]
+        for slot in slots:
+            slot.release()
+
+    def test_exports_beyond_the_cap_get_503_instead_of_a_connection(self):
+        client = TestClient(create_app(init_schema=False))
+        slots = [claim_export_slot() for _ in range(EXPORT_MAX_CONCURRENCY)]
+        try:
+            busy = client.get("/api/expenses/export/1")
+            self.assertEqual(busy.status_code, 503)
+            self.assertEqual(busy.headers["retry-after"], "5")
+            self.assertEqual(self.pool.stats()["in_use"], 0)
+        finally:
+            slots.pop().release()
+        try:
+            self.assertEqual(client.get("/api/expenses/export/1").status_code, 200)
+        finally:
+            for slot in slots:
+                slot.release()
+        self.assert_export_slots_free()
+
+    def test_endpoint_gzips_when_accepted(self):
+        client = TestClient(create_app(init_schema=False))
+        url = "/api/expenses/export/1"
+
+        response = client.get(url, params={"format": "csv"}, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertIn('filename="expenses-1.csv"', response.headers["content-disposition"])
+        self.assertEqual(len(response.text.splitlines()), ROWS + 1)
+
+        raw = client.get(url, params={"format": "ndjson"}, headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", raw.headers)
+        self.assertEqual(len(raw.content.splitlines()), ROWS)
+
+        # Parquet pages are already compressed, so it is never gzipped again
+        parquet = client.get(url, params={"format": "parquet"}, headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", parquet.headers)
+        self.assertEqual(pq.ParquetFile(io.BytesIO(parquet.content)).metadata.num_rows, ROWS)
+
+        self.assertEqual(client.get(url, params={"format": "xlsx"}).status_code, 400)
+
+    def test_accept_encoding_parsing(self):
+        self.assertTrue(accepts_gzip("gzip, deflate, br"))
+        self.assertTrue(accepts_gzip("br;q=1.0, gzip;q=0.8"))
+        self.assertFalse(accepts_gzip("gzip;q=0"))
+        self.assertFalse(accepts_gzip("identity"))
+        self.assertFalse(accepts_gzip(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
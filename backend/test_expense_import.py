@@ -0,0 +1,76 @@
+import io
+import unittest
+
+from backend.benchmarks.fakes import sqlite_database
+from backend.tools import expenses
+
+SAMPLE_CSV = """user_id,category,amount,description,expense_date
+1,Food,"$1,250.50",Groceries,1/1/2025
+1,Transport,12,Bus,2025-01-02
+1,,30,No category,1/3/2025
+1,Food,abc,Bad amount,1/4/2025
+1,Food,10,Bad date,32/13/2025
+2,Food,10,Someone else,1/5/2025
+1,Rent,900,,01/06/2025
+"""
+
+
+class TestExpenseImport(unittest.TestCase):
+    def setUp(self):
+        self.pool = self.enterContext(sqlite_database())
+        conn = self.pool.acquire()
+        conn.cursor().execute("INSERT INTO dbo.T_SNG_Users (username) VALUES ('test')")
+        conn.commit()
+        conn.close()
+
+    def stored(self):
+        conn = self.pool.acquire()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT category, amount, expense_date FROM dbo.T_SNG_Expenses ORDER BY expense_id")
+            return [(row[0], float(row[1]), str(row[2])) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def test_valid_rows_are_inserted_and_bad_rows_reported_by_line(self):
+        result = expenses.import_expenses_csv(1, io.StringIO(SAMPLE_CSV), chunk_size=3)
+
+        self.assertEqual(result["rows_read"], 7)
+        self.assertEqual(result["inserted"], 3)
+        self.assertEqual(result["rejected"], 4)
+        self.assertEqual(result["chunks"], 3)
+        self.assertEqual([e["line"] for e in result["errors"]], [4, 5, 6, 7])
+        self.assertIn("missing category", result["errors"][0]["error"])
+        self.assertIn("user_id", result["errors"][3]["error"])
+        self.assertEqual(self.stored(), [
+            ("Food", 1250.5, "2025-01-01"),
+            ("Transport", 12.0, "2025-01-02"),
+            ("Rent", 900.0, "2025-01-06"),
+        ])
+
+    def test_missing_required_column_fails_the_import(self):
+        with self.assertRaises(ValueError):
+            expenses.import_expenses_csv(1, io.StringIO("category,amount\nFood,1\n"))
+
+    def test_unreadable_row_rolls_back_earlier_chunks(self):
+        ragged = SAMPLE_CSV + "1,Food,5,Extra field,1/7/2025,unexpected\n"
+        with self.assertRaises(ValueError):
+            expenses.import_expenses_csv(1, io.StringIO(ragged), chunk_size=2)
+        self.assertEqual(self.stored(), [])
+
+    def test_add_expense_writes_to_expenses_table(self):
+        result = expenses.add_expense(1, 20, "Food", "Lunch", "2025-02-01")
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.stored(), [("Food", 20.0, "2025-02-01")])
+
+    def test_summary_rejects_impossible_months(self):
+        expenses.import_expenses_csv(1, io.StringIO(SAMPLE_CSV))
+        summary = expenses.get_expense_summary(1, "2025-01")
+        self.assertEqual(summary["total"], 2162.5)
+        for month in ("2025-13", "2025-00", "2025-1"):
+            with self.assertRaisesRegex(ValueError, "Invalid month"):
+                expenses.get_expense_summary(1, month)
+
+
+if __name__ == "__main__":
+    unittest.main()
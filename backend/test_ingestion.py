@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from backend.utils import ingestion
+from backend.utils.ingestion import LocalIndexTarget, OpenAIVectorStoreTarget, ingest
+from backend.utils.retrieval import HashingEmbedding, HybridIndex
+
+
+class FakeOpenAI:
+    """Just enough of the files / vector_stores API to count calls"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uploaded, self.attached, self.deleted = [], [], []
+        self.files = SimpleNamespace(create=self._upload, delete=self.deleted.append)
+        self.vector_stores = SimpleNamespace(
+            create=lambda name: SimpleNamespace(id="vs_test"),
+            file_batches=SimpleNamespace(create_and_poll=lambda vector_store_id, file_ids: self.attached.extend(file_ids)),
+            files=SimpleNamespace(delete=lambda vector_store_id, file_id: None)
+        )
+
+    def _upload(self, file, purpose):
+        with self.lock:
+            self.uploaded.append(os.path.basename(file.name))
+            return SimpleNamespace(id=f"file-{len(self.uploaded)}")
+
+
+class TestIncrementalIngestion(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.docs = os.path.join(self.root, "docs")
+        os.makedirs(self.docs)
+        for name in ("a.txt", "b.txt", "c.md"):
+            self.write(name, f"Notes about {name} and the monthly budget.")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, text):
+        with open(os.path.join(self.docs, name), "w") as f:
+            f.write(text)
+
+    def local_target(self):
+        return LocalIndexTarget(HybridIndex.load(os.path.join(self.root, "index"), HashingEmbedding(128)))
+
+    def test_second_run_on_unchanged_corpus_does_no_work(self):
+        first = ingest(self.docs, self.local_target())
+        self.assertEqual(first["added"], ["a.txt", "b.txt", "c.md"])
+
+        with mock.patch.object(ingestion, "file_digest") as digest, \
+                mock.patch.object(ingestion, "chunk_file") as chunk:
+            second = ingest(self.docs, self.local_target())
+        digest.assert_not_called()
+        chunk.assert_not_called()
+        self.assertEqual((second["added"], second["changed"], second["unchanged"]), ([], [], 3))
+
+    def test_only_changed_and_deleted_files_are_touched(self):
+        ingest(self.docs, self.local_target())
+        self.write("b.txt", "Completely different text about rent.")
+        os.remove(os.path.join(self.docs, "c.md"))
+        # Same content, new mtime: hashed but not re-chunked
+        os.utime(os.path.join(self.docs, "a.txt"), ns=(1, 1))
+
+        target = self.local_target()
+        with mock.patch.object(ingestion, "chunk_file", wraps=ingestion.chunk_file) as chunk:
+            result = ingest(self.docs, target)
+        self.assertEqual([call.args[1] for call in chunk.call_args_list], ["b.txt"])
+        self.assertEqual((result["changed"], result["removed"]), (["b.txt"], ["c.md"]))
+        self.assertEqual(target.index.sources(), {"a.txt", "b.txt"})
+        self.assertEqual(target.index.search("rent", k=1)[0]["source"], "b.txt")
+
+    def test_remote_store_uploads_changes_and_deletes_replaced_files(self):
+        client = FakeOpenAI()
+        manifest_path = os.path.join(self.root, "openai_manifest.json")
+        ingest(self.docs, OpenAIVectorStoreTarget(client, manifest_path=manifest_path), workers=3)
+        self.assertEqual(sorted(client.uploaded), ["a.txt", "b.txt", "c.md"])
+        self.assertEqual(len(client.attached), 3)
+
+        self.write("a.txt", "Updated notes.")
+        result = ingest(self.docs, OpenAIVectorStoreTarget(client, manifest_path=manifest_path))
+        self.assertEqual(result["changed"], ["a.txt"])
+        self.assertEqual(len(client.uploaded), 4)
+        self.assertEqual(len(client.deleted), 1)
+
+    def test_failed_delete_is_reported_in_the_result(self):
+        client = FakeOpenAI()
+        manifest_path = os.path.join(self.root, "openai_manifest.json")
+        ingest(self.docs, OpenAIVectorStoreTarget(client, manifest_path=manifest_path))
+
+        def delete(vector_store_id, file_id):
+            raise RuntimeError("store unavailable")
+
+        client.vector_stores.files.delete = delete
+        os.remove(os.path.join(self.docs, "b.txt"))
+        result = ingest(self.docs, OpenAIVectorStoreTarget(client, manifest_path=manifest_path))
+        self.assertEqual(result["removed"], ["b.txt"])
+        self.assertEqual(list(result["failed"]), ["b.txt"])
+        self.assertIn("store unavailable", result["failed"]["b.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
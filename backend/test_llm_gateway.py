@@ -0,0 +1,252 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import httpx
+
+from backend.benchmarks.fakes import disconnecting_request
+from backend.utils import admission
+from backend.utils.admission import AdmissionController, configure_admission
+from backend.utils.llm_gateway import LLMGateway, configure_gateway, extract_output_text
+from backend.utils.upstream import CircuitBreaker, UpstreamUnavailable, get_upstream
+
+
+def fake_response(text):
+    return {
+        "id": "resp_test",
+        "object": "response",
+        "created_at": 0,
+        "model": "gpt-4.1",
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": "msg_test",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}]
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": []
+    }
+
+
+def fake_stream(chunks):
+    events = [{"type": "response.web_search_call.searching", "item_id": "ws_test", "output_index": 0}]
+    events += [
+        {"type": "response.output_text.delta", "delta": chunk, "item_id": "msg_test",
+         "output_index": 1, "content_index": 0}
+        for chunk in chunks
+    ]
+    events.append({"type": "response.completed", "response": fake_response("".join(chunks))})
+    return "".join(
+        f"event: {event['type']}\ndata: {json.dumps({**event, 'sequence_number': i})}\n\n"
+        for i, event in enumerate(events)
+    )
+
+
+class FakeResponsesServer:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, request):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            body = json.loads(request.content)
+            if body.get("stream"):
+                return httpx.Response(
+                    200,
+                    headers={"content-type": "text/event-stream"},
+                    content=fake_stream(["Save ", "20% ", "of income."])
+                )
+            return httpx.Response(200, json=fake_response(f"echo: {body['input']}"))
+        finally:
+            self.in_flight -= 1
+
+
+class EndlessStreamServer:
+    """Streams three quick tokens, then one every half second until the client closes the stream"""
+
+    def __init__(self):
+        self.closed = asyncio.Event()
+
+    async def events(self):
+        try:
+            for i in range(1000):
+                event = {"type": "response.output_text.delta", "delta": f"{i} ", "item_id": "msg_test",
+                         "output_index": 0, "content_index": 0, "sequence_number": i}
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+                await asyncio.sleep(0.01 if i < 3 else 0.5)
+        finally:
+            self.closed.set()
+
+    async def __call__(self, request):
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=self.events())
+
+
+class TestLLMGateway(unittest.TestCase):
+    def test_returns_text_through_transport(self):
+        gateway = LLMGateway(api_key="test", transport=httpx.MockTransport(FakeResponsesServer()))
+
+        async def call():
+            response = await gateway.create_response(input="hello")
+            await gateway.aclose()
+            return response
+
+        self.assertEqual(extract_output_text(asyncio.run(call())), "echo: hello")
+        self.assertEqual(gateway.stats()["calls"], 1)
+
+    def test_caps_in_flight_calls_and_records_queue_wait(self):
+        server = FakeResponsesServer(delay=0.05)
+        gateway = LLMGateway(api_key="test", max_concurrency=2, transport=httpx.MockTransport(server))
+
+        async def burst():
+            results = await asyncio.gather(*[
+                gateway.create_response(input=str(i)) for i in range(6)
+            ])
+            await gateway.aclose()
+            return results
+
+        results = asyncio.run(burst())
+        self.assertEqual(len(results), 6)
+        self.assertEqual(server.peak, 2)
+        stats = gateway.stats()
+        self.assertEqual(stats["calls"], 6)
+        self.assertGreater(stats["max_wait_ms"], 50)
+
+    def test_times_out_slow_calls(self):
+        gateway = LLMGateway(api_key="test", transport=httpx.MockTransport(FakeResponsesServer(delay=1)))
+
+        async def call():
+            try:
+                await gateway.create_response(input="slow", timeout=0.05)
+            finally:
+                await gateway.aclose()
+
+        with self.assertRaises(TimeoutError):
+            asyncio.run(call())
+        self.assertEqual(gateway.stats()["timeouts"], 1)
+
+    def test_breaker_counts_only_upstream_faults(self):
+        async def bad_request(request):
+            return httpx.Response(400, json={"error": {"message": "bad prompt", "type": "invalid_request_error"}})
+
+        gateway = LLMGateway(api_key="test", transport=httpx.MockTransport(bad_request))
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+        async def call():
+            try:
+                for _ in range(3):
+                    with self.assertRaises(Exception):
+                        await gateway.create_response(input="bad")
+            finally:
+                await gateway.aclose()
+
+        with mock.patch.object(get_upstream("openai"), "breaker", breaker):
+            asyncio.run(call())
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(gateway.stats()["errors"], 3)
+
+    def test_cancelled_waiter_does_not_keep_the_half_open_trial(self):
+        server = FakeResponsesServer(delay=0.05)
+        gateway = LLMGateway(api_key="test", max_concurrency=1, transport=httpx.MockTransport(server))
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+
+        async def run():
+            await asyncio.sleep(0.02)
+            # The trial call is cancelled, then a queued caller gives up
+            trial = asyncio.create_task(gateway.create_response(input="trial"))
+            queued = asyncio.create_task(gateway.create_response(input="queued"))
+            await asyncio.sleep(0.01)
+            trial.cancel()
+            queued.cancel()
+            await asyncio.gather(trial, queued, return_exceptions=True)
+            response = await gateway.create_response(input="after")
+            await gateway.aclose()
+            return response
+
+        with mock.patch.object(get_upstream("openai"), "breaker", breaker):
+            self.assertEqual(extract_output_text(asyncio.run(run())), "echo: after")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(gateway.stats()["cancelled"], 1)
+
+    def test_open_breaker_rejects_without_queueing(self):
+        gateway = LLMGateway(api_key="test", transport=httpx.MockTransport(FakeResponsesServer()))
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+
+        async def call():
+            try:
+                await gateway.create_response(input="hello")
+            finally:
+                await gateway.aclose()
+
+        with mock.patch.object(get_upstream("openai"), "breaker", breaker):
+            with self.assertRaises(UpstreamUnavailable):
+                asyncio.run(call())
+        self.assertEqual(gateway.stats()["rejected"], 1)
+
+    def test_agent_stream_endpoint_relays_tokens_and_tool_progress(self):
+        from backend.main import app
+
+        gateway = configure_gateway(LLMGateway(api_key="test", transport=httpx.MockTransport(FakeResponsesServer())))
+
+        async def call():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/api/agent/stream", json={"query": "How do I save?"})
+            await gateway.aclose()
+            return response
+
+        try:
+            response = asyncio.run(call())
+        finally:
+            configure_gateway(None)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [
+            json.loads(line[len("data: "):])
+            for line in response.text.splitlines() if line.startswith("data: ")
+        ]
+        self.assertEqual(events[0], {"type": "tool", "tool": "web_search", "status": "searching"})
+        self.assertEqual([e["delta"] for e in events if e["type"] == "token"], ["Save ", "20% ", "of income."])
+        self.assertEqual(events[-1], {"type": "done", "response": "Save 20% of income."})
+
+    def test_client_disconnect_closes_the_upstream_stream_and_frees_the_slot(self):
+        from backend.main import create_app
+
+        server = EndlessStreamServer()
+        gateway = configure_gateway(LLMGateway(api_key="test", transport=httpx.MockTransport(server)))
+        previous_admission = admission._admission
+        controller = configure_admission(AdmissionController(user_rate=None, global_rate=None))
+
+        async def call():
+            status, received = await disconnecting_request(
+                create_app(init_schema=False), "POST", "/api/agent/stream",
+                body=json.dumps({"query": "Tell me a long story"}).encode(), after_chunks=3
+            )
+            upstream_closed = server.closed.is_set()
+            await gateway.aclose()
+            return status, received, upstream_closed
+
+        try:
+            status, received, upstream_closed = asyncio.run(call())
+        finally:
+            configure_gateway(None)
+            configure_admission(previous_admission)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(received), 3)
+        self.assertTrue(upstream_closed)
+        self.assertEqual(gateway.stats()["in_flight"], 0)
+        self.assertEqual(gateway.stats()["cancelled"], 1)
+        self.assertEqual(controller.stats()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
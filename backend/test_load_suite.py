@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+
+from backend.benchmarks.fakes import offline_upstreams
+from backend.benchmarks.load_suite import SCENARIOS, compare, run_suite
+from backend.utils import database
+
+
+class TestLoadSuite(unittest.TestCase):
+    def test_every_scenario_runs_offline(self):
+        previous_pool = database._pool
+        with offline_upstreams(users=5) as fakes:
+            results = asyncio.run(run_suite(SCENARIOS, requests=6, concurrency=3, users=5, warmup=0))
+
+        self.assertEqual(set(results), {scenario.name for scenario in SCENARIOS})
+        for name, result in results.items():
+            self.assertEqual(result["errors"], 0, f"{name}: {result.get('first_error')}")
+            self.assertEqual(result["requests"], 6)
+            self.assertTrue(result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"])
+        # Stock questions take a tool call and a second model turn
+        self.assertGreater(fakes["openai"].calls, 6)
+        self.assertGreaterEqual(fakes["yahoo"].calls, 1)
+        self.assertEqual(fakes["fx"].calls, 1)
+        self.assertIs(database._pool, previous_pool)
+
+    def test_compare_flags_slower_scenarios(self):
+        baseline = {
+            "agent": {"p95_ms": 100.0, "throughput_rps": 50.0, "errors": 0},
+            "convert": {"p95_ms": 1.0, "throughput_rps": 900.0, "errors": 0},
+        }
+        results = {
+            "agent": {"p95_ms": 130.0, "throughput_rps": 35.0, "errors": 0},
+            # Within the absolute noise floor despite being 2.5x slower
+            "convert": {"p95_ms": 2.5, "throughput_rps": 880.0, "errors": 0},
+            "new_scenario": {"p95_ms": 5.0, "throughput_rps": 10.0, "errors": 0},
+        }
+        regressions = compare(results, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(message.startswith("agent:") for message in regressions))
+
+
+if __name__ == "__main__":
+    unittest.main()
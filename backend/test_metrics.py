@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import unittest
+
+from fastapi.testclient import TestClient
+
+from backend.main import create_app
+from backend.utils import metrics
+from backend.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry, instrument
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_exposition(self):
+        registry = MetricsRegistry()
+        histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0), registry=registry)
+        counter = Counter("requests_total", "Requests", ("path",), registry=registry)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.labels("/a").observe(value)
+        counter.labels('say "hi"\n').inc(2)
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE latency_seconds histogram", lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1.0"} 3', lines)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 4', lines)
+        self.assertIn('latency_seconds_sum{route="/a"} 3.65', lines)
+        self.assertIn('latency_seconds_count{route="/a"} 4', lines)
+        self.assertIn('requests_total{path="say \\"hi\\"\\n"} 2', lines)
+
+        with self.assertRaises(ValueError):
+            Counter("requests_total", "Again", registry=registry)
+        with self.assertRaises(ValueError):
+            counter.labels()
+
+    def test_counts_are_exact_across_threads(self):
+        registry = MetricsRegistry()
+        counter = Counter("hits_total", "Hits", registry=registry)
+        gauge = Gauge("in_flight", "In flight", registry=registry)
+
+        def work():
+            for _ in range(20000):
+                counter.inc()
+                gauge.inc()
+                gauge.dec()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.labels().value(), 160000)
+        self.assertEqual(gauge.labels().value(), 0)
+
+    def test_instrument_records_latency_and_errors(self):
+        @instrument("test.sync")
+        def lookup(fail=False):
+            if fail:
+                raise ValueError("boom")
+            return 42
+
+        @instrument("test.async")
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        self.assertEqual(lookup(), 42)
+        with self.assertRaises(ValueError):
+            lookup(fail=True)
+        self.assertEqual(asyncio.run(fetch()), "ok")
+
+        buckets, total = metrics.TOOL_DURATION.labels("test.sync").snapshot()
+        self.assertEqual(buckets[-1], 2)
+        self.assertEqual(metrics.TOOL_ERRORS.labels("test.sync").value(), 1)
+        self.assertEqual(metrics.TOOL_IN_FLIGHT.labels("test.sync").value(), 0)
+        buckets, total = metrics.TOOL_DURATION.labels("test.async").snapshot()
+        self.assertEqual(buckets[-1], 1)
+        self.assertGreaterEqual(total, 0.01)
+
+    def test_endpoint_reports_routes_by_template(self):
+        metrics.register_cache("test_cache", lambda: {"hits": 3, "misses": 1})
+        self.addCleanup(metrics._cache_sources.pop, "test_cache", None)
+        client = TestClient(create_app(init_schema=False))
+        client.get("/")
+        client.get("/api/stock-price/not-a-ticker")
+        client.get("/no/such/path")
+
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        text = response.text
+        self.assertIn('finbot_http_requests_total{method="GET",route="/api/stock-price/{ticker}",status="200"}', text)
+        self.assertIn('finbot_http_requests_total{method="GET",route="unmatched",status="404"}', text)
+        self.assertIn('finbot_http_request_duration_seconds_count{method="GET",route="/"}', text)
+        self.assertIn('finbot_cache_hit_ratio{cache="test_cache"} 0.75', text)
+        self.assertNotIn("not-a-ticker", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from backend.utils.database import ConnectionPool, reconcile_budget_totals
+from backend.utils.migrations import LATEST_VERSION, apply_migrations, current_version
+
+
+class TestSqliteMigrations(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.pool = ConnectionPool([self.path], dialect="sqlite", max_size=2)
+        self.conn = self.pool.acquire()
+        apply_migrations(self.conn, "sqlite")
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("INSERT INTO dbo.T_SNG_Users (username) VALUES ('test')")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.pool.close_all()
+        os.remove(self.path)
+
+    def spent(self, budget_id):
+        self.cursor.execute("SELECT actual_spent FROM dbo.T_SNG_Budgets WHERE budget_id = ?", (budget_id,))
+        return float(self.cursor.fetchone()[0])
+
+    def test_migrations_are_recorded_and_not_reapplied(self):
+        self.assertEqual(current_version(self.conn, "sqlite"), LATEST_VERSION)
+        self.assertEqual(apply_migrations(self.conn, "sqlite"), [])
+
+    def test_triggers_keep_budget_totals_current(self):
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, expense_date) VALUES (1, 40, 'Food', ?)",
+            (date(2025, 1, 3),)
+        )
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (1, 'Food', 300, ?, ?)",
+            (date(2025, 1, 1), date(2025, 1, 31))
+        )
+        january = self.cursor.lastrowid
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (1, 'Food', 300, ?, ?)",
+            (date(2025, 2, 1), date(2025, 2, 28))
+        )
+        february = self.cursor.lastrowid
+        self.assertEqual(self.spent(january), 40)
+
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, expense_date) VALUES (1, 60, 'Food', ?)",
+            (date(2025, 1, 20),)
+        )
+        moved = self.cursor.lastrowid
+        self.assertEqual(self.spent(january), 100)
+
+        # Moving an expense across budget ranges shifts it between totals
+        self.cursor.execute("UPDATE dbo.T_SNG_Expenses SET expense_date = ? WHERE expense_id = ?", (date(2025, 2, 2), moved))
+        self.assertEqual((self.spent(january), self.spent(february)), (40, 60))
+
+        self.cursor.execute("DELETE FROM dbo.T_SNG_Expenses WHERE expense_id = ?", (moved,))
+        self.assertEqual(self.spent(february), 0)
+        self.conn.commit()
+
+        self.cursor.execute("SELECT expense_month FROM dbo.V_SNG_UserExpenses_L1")
+        self.assertEqual(self.cursor.fetchone()[0], "2025-01")
+
+    def test_reconcile_repairs_drift(self):
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (1, 'Rent', 800, ?, ?)",
+            (date(2025, 1, 1), date(2025, 1, 31))
+        )
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, expense_date) VALUES (1, 800, 'Rent', ?)",
+            (date(2025, 1, 1),)
+        )
+        self.cursor.execute("UPDATE dbo.T_SNG_Budgets SET actual_spent = 5")
+        self.conn.commit()
+
+        report = reconcile_budget_totals(conn=self.conn)
+        self.assertEqual(report["drifted"], 1)
+        self.assertEqual(report["drift"][0]["expected_spent"], 800)
+        self.assertEqual(reconcile_budget_totals(conn=self.conn)["drifted"], 0)
+
+    def test_reconcile_keeps_expenses_applied_after_the_drift_check(self):
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (1, 'Food', 300, ?, ?)",
+            (date(2025, 1, 1), date(2025, 1, 31))
+        )
+        budget_id = self.cursor.lastrowid
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, expense_date) VALUES (1, 40, 'Food', ?)",
+            (date(2025, 1, 3),)
+        )
+        self.cursor.execute("UPDATE dbo.T_SNG_Budgets SET actual_spent = 0")
+        self.conn.commit()
+        conn = self.conn
+
+        class LateExpense:
+            """Lets the triggers record one more expense right after the drift SELECT"""
+
+            def __init__(self):
+                self.inserted = False
+
+            def cursor(self):
+                return self
+
+            def execute(self, sql, params=()):
+                result = conn.cursor().execute(sql, params)
+                self.last = result
+                if "HAVING" in sql and not self.inserted:
+                    self.inserted = True
+                    conn.cursor().execute(
+                        "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, expense_date) VALUES (1, 25, 'Food', ?)",
+                        (date(2025, 1, 4),)
+                    )
+                return result
+
+            def fetchone(self):
+                return self.last.fetchone()
+
+            def fetchall(self):
+                return self.last.fetchall()
+
+            @property
+            def rowcount(self):
+                return self.last.rowcount
+
+            def commit(self):
+                conn.commit()
+
+        report = reconcile_budget_totals(conn=LateExpense())
+        self.assertEqual((report["drifted"], report["repaired"]), (1, 1))
+        self.assertEqual(report["drift"][0]["expected_spent"], 40)
+        self.assertEqual(self.spent(budget_id), 65)
+
+    def test_reconcile_check_only_reports_without_writing(self):
+        self.cursor.execute(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (1, 'Fun', 50, ?, ?)",
+            (date(2025, 1, 1), date(2025, 1, 31))
+        )
+        budget_id = self.cursor.lastrowid
+        self.cursor.execute("UPDATE dbo.T_SNG_Budgets SET actual_spent = 9")
+        self.conn.commit()
+
+        report = reconcile_budget_totals(repair=False, conn=self.conn)
+        self.assertEqual((report["drifted"], report["repaired"]), (1, 0))
+        self.assertEqual(self.spent(budget_id), 9)
+        self.assertEqual(reconcile_budget_totals(user_id=2, conn=self.conn)["checked"], 0)
+        self.assertEqual(reconcile_budget_totals(user_id=1, conn=self.conn)["repaired"], 1)
+        self.assertEqual(self.spent(budget_id), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
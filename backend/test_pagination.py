@@ -0,0 +1,96 @@
+import unittest
+from datetime import date, timedelta
+
+from backend.benchmarks.fakes import sqlite_database
+from backend.tools.budgets import list_budgets
+from backend.tools.expenses import list_expenses
+from backend.utils import database, pagination
+
+START = date(2024, 11, 1)
+
+
+class TestKeysetPagination(unittest.TestCase):
+    def setUp(self):
+        self.pool = self.enterContext(sqlite_database())
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO dbo.T_SNG_Users (username) VALUES (?)", [("a",), ("b",)])
+        # Three expenses a day for 90 days, so many rows share an expense_date
+        rows = [
+            (1, 10 + n, ("Food", "Rent", "Fun")[n], f"item {day}-{n}", START + timedelta(days=day))
+            for day in range(90) for n in range(3)
+        ]
+        rows.append((2, 99, "Food", "other user", START))
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
+            [(1, category, 100, date(2024, month, 1), date(2024, month, 28))
+             for month in range(1, 13) for category in ("Food", "Rent")]
+        )
+        conn.commit()
+        conn.close()
+
+    def walk(self, list_fn, key, **filters):
+        pages, items, cursor = 0, [], None
+        while True:
+            page = list_fn(1, cursor=cursor, **filters)
+            pages += 1
+            items.extend(page[key])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages, items
+
+    def test_expense_pages_cover_every_row_once_in_order(self):
+        pages, expenses = self.walk(list_expenses, "expenses", limit=40)
+        self.assertEqual((pages, len(expenses)), (7, 270))
+        keys = [(e["date"], e["expense_id"]) for e in expenses]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(len(set(keys)), 270)
+        self.assertNotIn("other user", {e["description"] for e in expenses})
+
+    def test_filters_and_rows_added_between_pages(self):
+        first = list_expenses(1, category="Rent", month="2024-12", limit=10)
+        self.assertEqual([e["category"] for e in first["expenses"]], ["Rent"] * 10)
+        self.assertEqual(first["expenses"][0]["date"], "2024-12-31")
+
+        # A new expense on a date already paged past must not shift the next page
+        conn = database.get_db_connection()
+        conn.cursor().execute(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date) VALUES (1, 5, 'Rent', 'late', '2024-12-31')"
+        )
+        conn.commit()
+        conn.close()
+
+        _, rest = self.walk(list_expenses, "expenses", category="Rent", month="2024-12", limit=10)
+        self.assertEqual(len(rest), 32)
+        second = list_expenses(1, category="Rent", month="2024-12", limit=10, cursor=first["next_cursor"])
+        self.assertTrue(set(e["expense_id"] for e in second["expenses"]).isdisjoint(
+            e["expense_id"] for e in first["expenses"]))
+        self.assertEqual(second["expenses"][0]["date"], "2024-12-21")
+
+    def test_cursor_is_bound_to_its_listing(self):
+        page = list_expenses(1, category="Food", limit=5)
+        with self.assertRaisesRegex(ValueError, "does not belong"):
+            list_expenses(1, category="Fun", limit=5, cursor=page["next_cursor"])
+        with self.assertRaisesRegex(ValueError, "Invalid cursor"):
+            list_expenses(1, cursor="not-a-cursor")
+        with self.assertRaises(ValueError):
+            list_expenses(1, month="2024-13")
+        self.assertEqual(list_expenses(1, limit=10 ** 6)["count"], pagination.MAX_PAGE_SIZE)
+
+    def test_budget_pages(self):
+        pages, budgets = self.walk(list_budgets, "budgets", limit=5)
+        self.assertEqual((pages, len(budgets)), (5, 24))
+        self.assertEqual(budgets[0]["start_date"], "2024-12-01")
+        self.assertGreater(budgets[0]["budget_id"], budgets[1]["budget_id"])
+
+        june = list_budgets(1, month="2024-06")
+        self.assertEqual([b["start_date"] for b in june["budgets"]], ["2024-06-01"] * 2)
+        self.assertIsNone(june["next_cursor"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from backend.benchmarks.fakes import FakeYahoo
+from backend.tools import stock_prices
+from backend.utils.cache import TTLCache
+
+
+class TestQuoteCache(unittest.TestCase):
+    def setUp(self):
+        stock_prices._quote_cache.clear()
+        stock_prices._currency_cache.clear()
+        self.fetches = []
+
+    def fake_fetch(self, ticker):
+        self.fetches.append(ticker)
+        time.sleep(0.05)
+        return {"price": 101.234, "currency": "USD"}
+
+    def test_hit_after_miss_reports_age(self):
+        with mock.patch.object(stock_prices, "fetch_quote", self.fake_fetch):
+            first = stock_prices.get_stock_price("aapl")
+            second = stock_prices.get_stock_price("AAPL")
+        self.assertFalse(first["cache"]["hit"])
+        self.assertTrue(second["cache"]["hit"])
+        self.assertEqual(second["price"], 101.23)
+        self.assertEqual(self.fetches, ["AAPL"])
+
+    def test_concurrent_misses_share_one_fetch(self):
+        results = []
+        with mock.patch.object(stock_prices, "fetch_quote", self.fake_fetch):
+            threads = [
+                threading.Thread(target=lambda: results.append(stock_prices.get_stock_price("MSFT")))
+                for _ in range(20)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(self.fetches, ["MSFT"])
+        self.assertEqual(len(results), 20)
+        self.assertTrue(all(r["price"] == 101.23 for r in results))
+
+    def test_miss_after_the_leader_finished_does_not_fetch_again(self):
+        real_get = stock_prices._quote_cache.get
+        calls = []
+
+        def get(key):
+            # The first lookup misses just before another request caches the quote
+            calls.append(key)
+            if len(calls) == 1:
+                stock_prices._quote_cache.set(key, {"price": 99.0, "currency": "USD"}, 60)
+                return None
+            return real_get(key)
+
+        with mock.patch.object(stock_prices, "fetch_quote", self.fake_fetch), \
+                mock.patch.object(stock_prices._quote_cache, "get", get):
+            result = stock_prices.get_stock_price("NVDA")
+        self.assertEqual(self.fetches, [])
+        self.assertEqual(result["price"], 99.0)
+
+    def test_ttl_is_shorter_during_market_hours(self):
+        tz = stock_prices.MARKET_TZ
+        open_market = datetime(2025, 3, 4, 11, 0, tzinfo=tz)
+        after_close = datetime(2025, 3, 4, 17, 0, tzinfo=tz)
+        weekend = datetime(2025, 3, 8, 11, 0, tzinfo=tz)
+        self.assertLess(stock_prices.quote_ttl(open_market), stock_prices.quote_ttl(after_close))
+        self.assertEqual(stock_prices.quote_ttl(weekend), stock_prices.quote_ttl(after_close))
+
+    def test_batch_reports_partial_failures(self):
+        def fake_fetch_quotes(tickers):
+            self.fetches.append(list(tickers))
+            return {t: {"price": 10.0} for t in tickers if t != "ZZZZ"}, \
+                {"ZZZZ": "No price data found for symbol ZZZZ"}
+
+        with mock.patch.object(stock_prices, "fetch_quotes", fake_fetch_quotes), \
+                mock.patch.object(stock_prices, "yf", FakeYahoo()):
+            result = stock_prices.get_stock_prices(["brk.b", "AAPL", "ZZZZ", "not a ticker", "AAPL"])
+        self.assertEqual(self.fetches, [["BRK.B", "AAPL", "ZZZZ"]])
+        self.assertEqual([q["ticker"] for q in result["quotes"]], ["BRK.B", "AAPL"])
+        self.assertEqual(set(result["errors"]), {"ZZZZ", "not a ticker"})
+        self.assertEqual(stock_prices.yahoo_symbol("BRK.B"), "BRK-B")
+
+    def test_single_and_batch_quotes_report_the_same_currency(self):
+        fake = FakeYahoo()
+        currencies = {"SAP": "EUR", "AAPL": "USD"}
+        real_ticker = fake.Ticker
+
+        def ticker(symbol):
+            stock = real_ticker(symbol)
+            stock.fast_info = {"currency": currencies[symbol]}
+            return stock
+
+        with mock.patch.object(stock_prices, "yf", fake), mock.patch.object(fake, "Ticker", ticker):
+            batch = stock_prices.get_stock_prices(["SAP", "AAPL"])
+            stock_prices._quote_cache.clear()
+            single = stock_prices.get_stock_price("SAP")
+        self.assertEqual([q["currency"] for q in batch["quotes"]], ["EUR", "USD"])
+        self.assertEqual(single["currency"], "EUR")
+
+    def test_failed_currency_lookup_is_not_retried_on_every_request(self):
+        fake = FakeYahoo()
+        lookups = []
+        real_ticker = fake.Ticker
+
+        class NoInfo:
+            @property
+            def fast_info(self):
+                lookups.append(1)
+                raise KeyError("currency")
+
+        def ticker(symbol):
+            return NoInfo() if symbol == "SAP" else real_ticker(symbol)
+
+        with mock.patch.object(stock_prices, "yf", fake), mock.patch.object(fake, "Ticker", ticker):
+            for _ in range(3):
+                stock_prices._quote_cache.clear()
+                batch = stock_prices.get_stock_prices(["SAP", "AAPL"])
+        self.assertEqual([q["currency"] for q in batch["quotes"]], ["USD", "USD"])
+        self.assertEqual(len(lookups), 1)
+        # Cached briefly, so the lookup is retried later
+        entry = stock_prices._currency_cache.get("SAP")
+        self.assertEqual(entry.expires_at - entry.stored_at, stock_prices.CURRENCY_RETRY_TTL)
+
+    def test_lru_eviction_and_expiry(self):
+        cache = TTLCache(max_entries=2)
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        cache.get("a")
+        cache.set("c", 3, ttl=60)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a").value, 1)
+        cache.set("d", 4, ttl=-1)
+        self.assertIsNone(cache.get("d"))
+        self.assertEqual(cache.get_stale("d").value, 4)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.utils import retrieval
+from backend.utils.retrieval import HashingEmbedding, HybridIndex, chunk_file, index_directory
+from backend.utils.tokens import RegexEncoding, split_tokens
+
+DOCUMENTS = {
+    "rent.txt": "Rent is due on the first of every month. The lease renews in June.",
+    "travel.txt": "Transportation costs include the monthly bus pass and occasional taxis.",
+    "savings.md": "The emergency fund target is six months of expenses kept in savings.",
+}
+
+
+class TestHybridIndex(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.docs = os.path.join(self.root, "docs")
+        os.makedirs(self.docs)
+        for name, text in DOCUMENTS.items():
+            with open(os.path.join(self.docs, name), "w") as f:
+                f.write(text)
+        self.index_dir = os.path.join(self.root, "index")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_token_windows_overlap_and_round_trip(self):
+        encoding = RegexEncoding()
+        text = " ".join(f"word{i}" for i in range(25))
+        windows = split_tokens(text, 10, overlap=2, encoding=encoding)
+        self.assertEqual(len(windows), 3)
+        self.assertTrue(windows[1].startswith(" word8 word9"))
+        self.assertEqual(encoding.decode(encoding.encode(text)), text)
+
+    def test_hybrid_search_ranks_matching_document_first_and_persists(self):
+        index = index_directory(HybridIndex(self.index_dir, HashingEmbedding(256)), self.docs)
+
+        hits = index.search("when is the rent due", k=2)
+        self.assertEqual(hits[0]["source"], "rent.txt")
+        self.assertGreater(hits[0]["bm25"], 0)
+        # Trigrams let the dense side match a misspelling BM25 cannot
+        self.assertEqual(index.search("transpotation", k=1, mode="dense")[0]["source"], "travel.txt")
+
+        reloaded = HybridIndex.load(self.index_dir, HashingEmbedding(256))
+        self.assertEqual(reloaded.sources(), set(DOCUMENTS))
+        self.assertEqual(reloaded.search("emergency fund", k=1)[0]["source"], "savings.md")
+
+    def test_removed_documents_leave_the_index(self):
+        index = index_directory(HybridIndex(self.index_dir, HashingEmbedding(256)), self.docs)
+        os.remove(os.path.join(self.docs, "rent.txt"))
+        index_directory(index, self.docs)
+        self.assertNotIn("rent.txt", index.sources())
+        self.assertEqual(len(index.chunks), index.embeddings.shape[0])
+
+    def test_csv_rows_become_labelled_lines(self):
+        path = os.path.join(self.docs, "expenses.csv")
+        with open(path, "w") as f:
+            f.write("category,amount\nFood,12\nRent,900\n")
+        chunks = chunk_file(path)
+        self.assertIn("category: Rent | amount: 900", chunks[0]["text"])
+
+
+if __name__ == "__main__":
+    unittest.main()
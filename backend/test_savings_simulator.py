@@ -0,0 +1,112 @@
+import asyncio
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from backend.agents import agent_tools
+from backend.benchmarks.fakes import sqlite_database
+from backend.main import create_app
+from backend.tools import savings_simulator
+from backend.tools.savings_simulator import add_months, simulate_savings, simulate_user_savings
+from backend.utils import database
+from backend.utils.executors import get_executor
+
+TODAY = date.today()
+
+
+class TestSavingsSimulator(unittest.TestCase):
+    def setUp(self):
+        self.pool = self.enterContext(sqlite_database())
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO dbo.T_SNG_Users (username) VALUES ('test')")
+        # Six complete months: rent every month, travel in alternate months
+        rows = []
+        for i in range(1, 7):
+            month = add_months(TODAY.replace(day=1), -i)
+            rows.append((1, 1000, "Rent", month + timedelta(days=2)))
+            if i % 2:
+                rows.append((1, 600, "Travel", month + timedelta(days=10)))
+        # The current, incomplete month is not part of the history
+        rows.append((1, 5000, "Rent", TODAY.replace(day=1)))
+        cursor.executemany(
+            "INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, expense_date) VALUES (?, ?, ?, ?)", rows
+        )
+        conn.commit()
+        conn.close()
+
+    def test_history_is_a_month_by_category_matrix(self):
+        months, categories, matrix = savings_simulator.load_spend_history(1, 12, TODAY)
+        self.assertEqual(len(months), 6)
+        self.assertEqual(categories, ["Rent", "Travel"])
+        self.assertEqual(matrix[:, 0].tolist(), [1000.0] * 6)
+        self.assertEqual(sorted(matrix[:, 1].tolist()), [0.0] * 3 + [600.0] * 3)
+
+    def test_deterministic_inputs_match_the_recurrence(self):
+        history = np.array([[1000.0]])
+        balances = simulate_savings(history, 3000, months=12, current_savings=500, annual_return=0.06, paths=200)
+        expected, balance = [], 500.0
+        for _ in range(12):
+            balance = balance * 1.06 ** (1 / 12) + 2000
+            expected.append(balance)
+        np.testing.assert_allclose(balances[0], expected)
+        np.testing.assert_allclose(balances, np.broadcast_to(expected, balances.shape))
+
+    def test_goal_probability_reflects_bootstrapped_spending(self):
+        # Monthly spend is 1000 or 1600, so 12 months at 2500 income save 10800..18000
+        result = simulate_user_savings(1, 14400, 2500, months=12, paths=5000, seed=7, today=TODAY)
+        self.assertEqual(len(result["months"]), 12)
+        self.assertEqual(result["months"][0], savings_simulator.month_key(add_months(TODAY, 1)))
+        self.assertGreater(result["probability_of_goal"], 0.3)
+        self.assertLess(result["probability_of_goal"], 0.7)
+        p10, p90 = result["percentiles"]["p10"][-1], result["percentiles"]["p90"][-1]
+        self.assertTrue(10800 <= p10 < p90 <= 18000)
+        self.assertEqual(simulate_user_savings(1, 20000, 2500, paths=500, today=TODAY)["probability_of_goal"], 0.0)
+
+    def test_budgets_cap_spending_when_respected(self):
+        conn = database.get_db_connection()
+        conn.cursor().execute(
+            "INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date) VALUES (1, 'Travel', ?, ?, ?)",
+            (12 * 100, TODAY - timedelta(days=180), TODAY + timedelta(days=184))
+        )
+        conn.commit()
+        conn.close()
+
+        result = simulate_user_savings(1, 17000, 2500, months=12, respect_budgets=True, paths=1000, seed=1, today=TODAY)
+        self.assertAlmostEqual(result["history"]["monthly_budgets"]["Travel"], 100.0, delta=0.5)
+        # Spend is now 1000 or about 1100 a month: every path saves close to 16800 or more
+        self.assertGreaterEqual(result["final_balance"]["p10"], 16790)
+        self.assertGreater(result["probability_of_goal"], 0.3)
+
+    def test_agent_tool_returns_a_compact_projection(self):
+        output, timing = asyncio.run(agent_tools.call_tool(
+            "simulate_savings_goal", {"goal_amount": 5000, "monthly_income": 2500, "months": 24}, user_id=1
+        ))
+        self.assertEqual(timing["status"], "ok")
+        self.assertEqual(output["probability_of_goal"], 1.0)
+        self.assertEqual(len(output["trajectory"]), 6)
+        self.assertEqual(output["trajectory"][-1]["month"], savings_simulator.month_key(add_months(TODAY, 24)))
+
+    def test_endpoint_reads_on_the_db_pool_and_simulates_on_the_cpu_pool(self):
+        completed = {name: get_executor(name).stats()["completed"] for name in ("db", "cpu")}
+        response = TestClient(create_app(init_schema=False)).post("/api/simulate/savings", json={
+            "user_id": 1, "goal_amount": 5000, "monthly_income": 2500, "months": 24, "seed": 1
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["probability_of_goal"], 1.0)
+        self.assertEqual({name: get_executor(name).stats()["completed"] - n for name, n in completed.items()},
+                         {"db": 1, "cpu": 1})
+
+    def test_inputs_are_validated(self):
+        with self.assertRaises(ValueError):
+            simulate_user_savings(1, -5, 2500)
+        with self.assertRaises(ValueError):
+            simulate_user_savings(1, 5000, 2500, months=0)
+        with self.assertRaises(ValueError):
+            simulate_user_savings(2, 5000, 2500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from backend.agents import finance_agent, session_memory
+from backend.benchmarks.fakes import sqlite_database
+from backend.utils import answer_cache
+from backend.utils.answer_cache import AnswerCache
+
+# Long enough that a handful of turns overflows the history budget
+ANSWER = "Put the surplus toward the highest interest debt first, then build savings. " * 20
+
+
+class RecordingGateway:
+    """Answers agent calls with ANSWER and summary calls with a short summary"""
+
+    def __init__(self):
+        self.agent_requests = []
+        self.summary_requests = []
+
+    async def create_response(self, **kwargs):
+        if kwargs["model"] == session_memory.SUMMARY_MODEL:
+            self.summary_requests.append(kwargs)
+            return SimpleNamespace(output=[], text="User is paying down a credit card before saving.")
+        self.agent_requests.append(kwargs)
+        return SimpleNamespace(id="resp", output=[], text=ANSWER)
+
+
+class TestSessionMemory(unittest.TestCase):
+    def setUp(self):
+        self.pool = self.enterContext(sqlite_database())
+        conn = self.pool.acquire()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO dbo.T_SNG_Users (username) VALUES ('test')")
+        conn.commit()
+        conn.close()
+
+    def converse(self, gateway, turns, budget=800):
+        text = lambda response: getattr(response, "text", "")
+
+        async def run():
+            answers = []
+            for i in range(turns):
+                answers.append(await finance_agent.run_agent(f"Question {i}: what should I do next?", 1, "s1"))
+                # Let the background summary land before the next turn
+                await asyncio.gather(*session_memory._summary_tasks)
+            return answers
+
+        with mock.patch.object(finance_agent, "get_gateway", lambda: gateway), \
+                mock.patch.object(session_memory, "get_gateway", lambda: gateway), \
+                mock.patch.object(finance_agent, "extract_output_text", text), \
+                mock.patch.object(session_memory, "extract_output_text", text), \
+                mock.patch.object(session_memory, "CONTEXT_TOKEN_BUDGET", budget), \
+                mock.patch.object(answer_cache, "_answer_cache", AnswerCache()):
+            return asyncio.run(run())
+
+    def test_context_stays_within_budget_as_the_session_grows(self):
+        gateway = RecordingGateway()
+        self.converse(gateway, turns=12)
+
+        sizes = [
+            sum(session_memory.count_tokens(item["content"]) + session_memory.MESSAGE_OVERHEAD_TOKENS
+                for item in request["input"])
+            for request in gateway.agent_requests
+        ]
+        self.assertEqual(len(sizes), 12)
+        self.assertLessEqual(max(sizes), 800)
+        # Once history fills the window, later turns cost about the same
+        self.assertLess(max(sizes[6:]) - min(sizes[6:]), 200)
+
+        session = session_memory.load_session("s1", 1)
+        self.assertIn("credit card", session["summary"])
+        self.assertGreater(session["summarized_through"], 0)
+        self.assertTrue(gateway.summary_requests)
+        # The summary is passed back as background on later turns
+        self.assertIn("credit card", gateway.agent_requests[-1]["input"][0]["content"])
+
+    def test_instruction_prefix_is_identical_across_requests(self):
+        gateway = RecordingGateway()
+        self.converse(gateway, turns=3)
+        instructions = {request["instructions"] for request in gateway.agent_requests}
+        tools = {repr(request["tools"]) for request in gateway.agent_requests}
+        self.assertEqual((len(instructions), len(tools)), (1, 1))
+        self.assertEqual(instructions.pop(), session_memory.load_instructions())
+
+    def test_sessions_are_private_to_their_user(self):
+        session_memory.append_turn("s2", 1, "hi", "hello")
+        self.assertEqual(len(session_memory.load_session("s2", 1)["messages"]), 2)
+        for other in (2, None):
+            with self.assertRaises(ValueError):
+                session_memory.load_session("s2", other)
+
+
+if __name__ == "__main__":
+    unittest.main()
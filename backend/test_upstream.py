@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+
+from backend.utils.upstream import CircuitBreaker, Upstream, UpstreamUnavailable
+
+
+class TestUpstream(unittest.TestCase):
+    def test_retries_then_serves_stale_when_breaker_opens(self):
+        upstream = Upstream("test", timeout=1, retries=1, backoff=0, breaker_threshold=2, breaker_reset=60)
+        healthy = threading.Event()
+        healthy.set()
+        calls = []
+
+        def fetch(key):
+            calls.append(key)
+            if not healthy.is_set():
+                raise ConnectionError("upstream down")
+            return {"price": 10}
+
+        self.assertFalse(upstream.call(fetch, "AAPL", stale_key="AAPL").stale)
+        healthy.clear()
+        for _ in range(2):
+            result = upstream.call(fetch, "AAPL", stale_key="AAPL")
+            self.assertTrue(result.stale)
+            self.assertEqual(result.value, {"price": 10})
+        self.assertEqual(upstream.breaker.state, CircuitBreaker.OPEN)
+
+        calls.clear()
+        self.assertTrue(upstream.call(fetch, "AAPL", stale_key="AAPL").stale)
+        self.assertEqual(calls, [])
+        with self.assertRaises(UpstreamUnavailable):
+            upstream.call(fetch, "MSFT", stale_key="MSFT")
+        stats = upstream.stats()
+        self.assertEqual(stats["breaker"], "open")
+        self.assertEqual(stats["rejected"], 2)
+        self.assertEqual(stats["retries"], 2)
+
+    def test_half_open_trial_closes_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_hedged_request_wins_over_slow_primary(self):
+        upstream = Upstream("hedge", timeout=2, retries=0, hedge_after=0.05)
+        delays = iter([1.0, 0.0])
+
+        def fetch():
+            time.sleep(next(delays))
+            return "ok"
+
+        started = time.perf_counter()
+        self.assertEqual(upstream.call(fetch).value, "ok")
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(upstream.stats()["hedges"], 1)
+
+    def test_value_errors_are_not_upstream_failures(self):
+        upstream = Upstream("bad-input", retries=3, breaker_threshold=1)
+
+        def fetch():
+            raise ValueError("No price data found")
+
+        with self.assertRaises(ValueError):
+            upstream.call(fetch)
+        self.assertEqual(upstream.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(upstream.stats()["retries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,443 @@
+"""End-of-period spend forecasts for active budgets.
+
+Run the nightly job with:
+
+    python -m backend.tools.budget_forecast [--as-of 2025-01-15] [--partition-users 5000]
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from backend.utils.database import get_db_connection, get_pool
+from backend.utils.lazy import LazyModule
+from backend.utils.metrics import instrument
+
+np = LazyModule("numpy")
+
+# Weekday pattern and recurring-charge detection look back this far (13 weeks)
+SEASONALITY_DAYS = int(os.getenv("FORECAST_SEASONALITY_DAYS", "91"))
+# A user's weekday weights are pulled toward flat until they have about
+# this many transactions behind them
+SEASONALITY_PRIOR_COUNT = 20
+RECURRING_INTERVAL_DAYS = 30
+# Occurrences of a recurring charge are on average at least this far apart,
+# so a daily coffee at the same price is not mistaken for a subscription
+RECURRING_MIN_GAP_DAYS = RECURRING_INTERVAL_DAYS * 3 // 4
+# A recurring charge not seen for longer than this is treated as cancelled
+RECURRING_GRACE_DAYS = RECURRING_INTERVAL_DAYS + 10
+# Rates from fewer elapsed days than this are flagged as low confidence
+LOW_CONFIDENCE_DAYS = 7
+FORECAST_PARTITION_USERS = int(os.getenv("FORECAST_PARTITION_USERS", "5000"))
+FETCH_BATCH_ROWS = 10000
+CENTS_RADIX = 2 * 10 ** 10
+
+
+def _fetch_columns(cursor, sql, params, n_columns):
+    """Run a query and return one list per column, reading rows in batches"""
+    columns = [[] for _ in range(n_columns)]
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(FETCH_BATCH_ROWS)
+        if not rows:
+            break
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+    return columns
+
+
+def _encode(values, codes):
+    """Map strings to integer codes, adding unseen values to ``codes``"""
+    return np.fromiter((codes.setdefault(value, len(codes)) for value in values), dtype=np.int64, count=len(values))
+
+
+def load_forecast_inputs(as_of: date, first_user: int = None, last_user: int = None):
+    """Active budgets and the expenses behind them, as columnar numpy arrays.
+
+    Returns ``(budgets, expenses)`` dicts of equal-length arrays. Expenses
+    cover the seasonality window and every active budget's period up to
+    ``as_of``; users are optionally limited to ``first_user..last_user``.
+    Categories and descriptions arrive as integer codes (description code 0
+    is "no description"); sorting millions of strings would cost more than
+    the whole forecast.
+    """
+    category_codes, description_codes = {}, {"": 0}
+    user_filter = "" if first_user is None else " AND user_id BETWEEN ? AND ?"
+    user_params = () if first_user is None else (first_user, last_user)
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        budget_id, user_id, category, amount, start_date, end_date = _fetch_columns(cursor, f"""
+            SELECT budget_id, user_id, category, amount, start_date, end_date
+            FROM dbo.T_SNG_Budgets
+            WHERE start_date <= ? AND end_date >= ?{user_filter}
+            ORDER BY user_id, budget_id
+        """, (as_of, as_of) + user_params, 6)
+        budgets = {
+            "budget_id": np.array(budget_id, dtype=np.int64),
+            "user_id": np.array(user_id, dtype=np.int64),
+            "category": np.array(category, dtype=str),
+            "category_code": _encode(category, category_codes),
+            "amount": np.array(amount, dtype=np.float64),
+            "start_date": np.array(start_date, dtype="datetime64[D]"),
+            "end_date": np.array(end_date, dtype="datetime64[D]"),
+        }
+
+        window_start = as_of - timedelta(days=SEASONALITY_DAYS - 1)
+        if start_date:
+            window_start = min(window_start, min(start_date))
+        if first_user is None and user_id:
+            first_user, last_user = min(user_id), max(user_id)
+            user_filter, user_params = " AND user_id BETWEEN ? AND ?", (first_user, last_user)
+        user_id, category, expense_date, amount, description = _fetch_columns(cursor, f"""
+            SELECT user_id, category, expense_date, amount, LOWER(LTRIM(RTRIM(COALESCE(description, ''))))
+            FROM dbo.T_SNG_Expenses
+            WHERE expense_date >= ? AND expense_date <= ?{user_filter}
+        """, (window_start, as_of) + user_params, 5) if user_id else ([], [], [], [], [])
+        expenses = {
+            "user_id": np.array(user_id, dtype=np.int64),
+            "category_code": _encode(category, category_codes),
+            "expense_date": np.array(expense_date, dtype="datetime64[D]"),
+            "amount": np.array(amount, dtype=np.float64),
+            "description_code": _encode(description, description_codes),
+        }
+        return budgets, expenses
+    except Exception as e:
+        raise ValueError(f"Error loading forecast inputs: {str(e)}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+
+def weekday_counts(start, days):
+    """Mondays..Sundays in ``days[i]`` consecutive days from ``start[i]``; shape ``(n, 7)``"""
+    days = np.maximum(np.asarray(days, dtype=np.int64), 0)
+    # 1970-01-01, day 0 of datetime64[D], was a Thursday
+    first = (np.asarray(start, dtype="datetime64[D]").astype(np.int64) + 3) % 7
+    offset = (np.arange(7) - first[:, None]) % 7
+    return days[:, None] // 7 + (offset < days[:, None] % 7)
+
+
+def _ranges(lo, hi):
+    """Every ``(i, j)`` with ``lo[i] <= j < hi[i]``, as two index arrays"""
+    counts = np.maximum(hi - lo, 0)
+    owner = np.repeat(np.arange(len(lo)), counts)
+    offset = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, np.repeat(lo, counts) + offset
+
+
+def _recurring_series(expenses, user_index, candidates):
+    """Group expenses that repeat: same user, category, description and amount in 2+ months,
+    about once per ``RECURRING_INTERVAL_DAYS``.
+
+    Returns ``(series_id, recurring)``: a series number per expense (-1 for
+    rows that cannot recur, e.g. without a description) and a per-series
+    mask of which series are recurring. Keys are packed into int64 so the
+    grouping is a couple of 1-D sorts rather than a row-wise unique.
+    """
+    series_id = np.full(len(user_index), -1, dtype=np.int64)
+    rows = np.flatnonzero(candidates & (expenses["description_code"] > 0))
+    if not len(rows):
+        return series_id, np.zeros(0, dtype=bool)
+
+    n_categories = int(expenses["category_code"].max()) + 1
+    n_descriptions = int(expenses["description_code"].max()) + 1
+    key = (user_index[rows] * n_categories + expenses["category_code"][rows]) * n_descriptions
+    _, key = np.unique(key + expenses["description_code"][rows], return_inverse=True)
+    # DECIMAL(10,2) amounts are under 10**10 cents either side of zero
+    cents = np.round(expenses["amount"][rows] * 100).astype(np.int64) + CENTS_RADIX // 2
+    _, ids = np.unique(key.ravel() * CENTS_RADIX + cents, return_inverse=True)
+    ids = ids.ravel()
+
+    n_series = int(ids.max()) + 1
+    month = expenses["expense_date"][rows].astype("datetime64[M]").astype(np.int64)
+    month -= month.min()
+    span = int(month.max()) + 1
+    months_seen = np.bincount(np.unique(ids * span + month) // span, minlength=n_series)
+
+    day = expenses["expense_date"][rows].astype(np.int64)
+    first_seen = np.full(n_series, np.iinfo(np.int64).max)
+    last_seen = np.full(n_series, np.iinfo(np.int64).min)
+    np.minimum.at(first_seen, ids, day)
+    np.maximum.at(last_seen, ids, day)
+    occurrences = np.bincount(ids, minlength=n_series)
+    regular = (last_seen - first_seen) >= RECURRING_MIN_GAP_DAYS * (occurrences - 1)
+    series_id[rows] = ids
+    return series_id, (months_seen >= 2) & regular
+
+
+def forecast_budgets(budgets, expenses, as_of: date):
+    """Project end-of-period spend for every budget in one vectorized pass.
+
+    For each budget:
+
+    * spent to date is split into recurring charges and discretionary spend;
+    * discretionary spend becomes a daily rate, normalised by the user's
+      weekday pattern (a Saturday-heavy spender who is mid-week is not
+      projected to slow down), and is extrapolated over the remaining days
+      with the same weights;
+    * recurring charges still due before the period ends are added once each.
+
+    Returns a dict of arrays aligned with ``budgets``.
+    """
+    as_of = np.datetime64(as_of, "D")
+    n_budgets = len(budgets["budget_id"])
+    if n_budgets == 0:
+        expenses = {key: values[:0] for key, values in expenses.items()}
+    days_elapsed = (as_of - budgets["start_date"]).astype(np.int64) + 1
+    days_remaining = np.maximum((budgets["end_date"] - as_of).astype(np.int64), 0)
+
+    # Budgets and expenses share category codes, so (user, category) packs into one int64
+    n_categories = int(max(budgets["category_code"].max(initial=0), expenses["category_code"].max(initial=0))) + 1
+    budget_key = budgets["user_id"] * n_categories + budgets["category_code"]
+    expense_key = expenses["user_id"] * n_categories + expenses["category_code"]
+
+    # Like the totals triggers, an expense counts toward every budget of its
+    # user and category whose period has started by then (a weekly Food budget
+    # and the monthly one around it). Sorted by key and then start date, those
+    # budgets are one run of ``order`` per expense.
+    first_start = budgets["start_date"].min() if n_budgets else as_of
+    start_offset = (budgets["start_date"] - first_start).astype(np.int64) + 1
+    span = int(start_offset.max(initial=0)) + 1
+    packed = budget_key * span + start_offset
+    order = np.argsort(packed, kind="stable")
+    packed = packed[order]
+    day = expenses["expense_date"]
+    day_offset = np.clip((day - first_start).astype(np.int64) + 1, 0, span - 1)
+    lo = np.searchsorted(packed, expense_key * span)
+    hi = np.where(day <= as_of, np.searchsorted(packed, expense_key * span + day_offset, side="right"), lo)
+    pair_expense, pair_budget = _ranges(lo, hi)
+    pair_budget = order[pair_budget]
+
+    users, budget_user = np.unique(budgets["user_id"], return_inverse=True)
+    budget_user = budget_user.ravel()
+    expense_user = np.minimum(np.searchsorted(users, expenses["user_id"]), max(len(users) - 1, 0))
+    known_user = users[expense_user] == expenses["user_id"]
+
+    series_id, recurring_series = _recurring_series(expenses, expense_user, known_user)
+    in_series = series_id >= 0
+    recurring = np.zeros(len(day), dtype=bool)
+    recurring[in_series] = recurring_series[series_id[in_series]]
+
+    pair_amount = expenses["amount"][pair_expense]
+    spent = np.bincount(pair_budget, weights=pair_amount, minlength=n_budgets)
+    pair_recurring = recurring[pair_expense]
+    recurring_spent = np.bincount(
+        pair_budget[pair_recurring], weights=pair_amount[pair_recurring], minlength=n_budgets
+    )
+    discretionary = spent - recurring_spent
+
+    # Weekday weights per user from recent non-recurring spend, shrunk toward flat
+    n_users = len(users)
+    seasonal = known_user & ~recurring & (day > as_of - SEASONALITY_DAYS)
+    weekday = (day.astype(np.int64) + 3) % 7
+    totals = np.bincount(
+        expense_user[seasonal] * 7 + weekday[seasonal], weights=expenses["amount"][seasonal], minlength=n_users * 7
+    ).reshape(n_users, 7)
+    transactions = np.bincount(expense_user[seasonal], minlength=n_users)[:, None]
+    window = weekday_counts([as_of - SEASONALITY_DAYS + 1], [SEASONALITY_DAYS])[0]
+    per_day = totals / window
+    mean = per_day.mean(axis=1, keepdims=True)
+    raw = np.divide(per_day, mean, out=np.ones_like(per_day), where=mean > 0)
+    weights = (transactions * raw + SEASONALITY_PRIOR_COUNT) / (transactions + SEASONALITY_PRIOR_COUNT)
+
+    user_weights = weights[budget_user]
+    elapsed_weight = (weekday_counts(budgets["start_date"], days_elapsed) * user_weights).sum(axis=1)
+    remaining_weight = (weekday_counts(np.full(n_budgets, as_of + 1), days_remaining) * user_weights).sum(axis=1)
+    daily_rate = np.divide(discretionary, elapsed_weight, out=np.zeros(n_budgets), where=elapsed_weight > 0)
+    projected_discretionary = daily_rate * remaining_weight
+
+    # Recurring charges still due: occurrences at last + k * interval inside (as_of, end]
+    expected_recurring = np.zeros(n_budgets)
+    if recurring_series.any():
+        n_series = len(recurring_series)
+        rows = np.flatnonzero(in_series)
+        last_seen = np.full(n_series, np.iinfo(np.int64).min)
+        np.maximum.at(last_seen, series_id[rows], day[rows].astype(np.int64))
+        # Every row of a series has the same user, category and amount
+        series_key = np.zeros(n_series, dtype=np.int64)
+        series_key[series_id[rows]] = expense_key[rows]
+        series_amount = np.zeros(n_series)
+        series_amount[series_id[rows]] = expenses["amount"][rows]
+
+        today = as_of.astype(np.int64)
+        active = recurring_series & (today - last_seen <= RECURRING_GRACE_DAYS)
+        # A charge still to come falls in every active budget of its key
+        series, position = _ranges(
+            np.searchsorted(packed, series_key * span), np.searchsorted(packed, (series_key + 1) * span)
+        )
+        keep = active[series]
+        series, budget = series[keep], order[position[keep]]
+        end = budgets["end_date"].astype(np.int64)[budget]
+        last = last_seen[series]
+        due = np.maximum((end - last) // RECURRING_INTERVAL_DAYS - (today - last) // RECURRING_INTERVAL_DAYS, 0)
+        expected_recurring = np.bincount(budget, weights=series_amount[series] * due, minlength=n_budgets)
+
+    projected_spend = spent + projected_discretionary + expected_recurring
+    future_daily = np.divide(
+        projected_spend - spent, days_remaining, out=np.zeros(n_budgets), where=days_remaining > 0
+    )
+    headroom = budgets["amount"] - spent
+    days_to_exhaust = np.ceil(np.divide(headroom, future_daily, out=np.full(n_budgets, np.inf), where=future_daily > 0))
+    exhausted = (headroom <= 0) | (days_to_exhaust <= days_remaining)
+    exhaustion_days = np.where(headroom <= 0, 0, np.where(exhausted, days_to_exhaust, 0)).astype(np.int64)
+
+    return {
+        "budget_id": budgets["budget_id"],
+        "user_id": budgets["user_id"],
+        "category": budgets["category"],
+        "amount": budgets["amount"],
+        "start_date": budgets["start_date"],
+        "end_date": budgets["end_date"],
+        "days_elapsed": days_elapsed,
+        "days_remaining": days_remaining,
+        "spent_to_date": spent,
+        "recurring_to_date": recurring_spent,
+        "daily_rate": daily_rate,
+        "projected_discretionary": projected_discretionary,
+        "expected_recurring": expected_recurring,
+        "projected_spend": projected_spend,
+        "will_exceed": projected_spend > budgets["amount"],
+        "exhaustion_date": np.where(exhausted, as_of + exhaustion_days, np.datetime64("NaT")),
+        "low_confidence": days_elapsed < LOW_CONFIDENCE_DAYS,
+    }
+
+
+def forecast_records(forecast):
+    """Row-wise dicts for API responses"""
+    records = []
+    for i in range(len(forecast["budget_id"])):
+        exhaustion = forecast["exhaustion_date"][i]
+        records.append({
+            "budget_id": int(forecast["budget_id"][i]),
+            "category": str(forecast["category"][i]),
+            "amount": round(float(forecast["amount"][i]), 2),
+            "start_date": str(forecast["start_date"][i]),
+            "end_date": str(forecast["end_date"][i]),
+            "days_elapsed": int(forecast["days_elapsed"][i]),
+            "days_remaining": int(forecast["days_remaining"][i]),
+            "spent_to_date": round(float(forecast["spent_to_date"][i]), 2),
+            "recurring_to_date": round(float(forecast["recurring_to_date"][i]), 2),
+            "daily_rate": round(float(forecast["daily_rate"][i]), 2),
+            "expected_recurring": round(float(forecast["expected_recurring"][i]), 2),
+            "projected_spend": round(float(forecast["projected_spend"][i]), 2),
+            "projected_remaining": round(float(forecast["amount"][i] - forecast["projected_spend"][i]), 2),
+            "will_exceed": bool(forecast["will_exceed"][i]),
+            "exhaustion_date": None if np.isnat(exhaustion) else str(exhaustion),
+            "low_confidence": bool(forecast["low_confidence"][i]),
+        })
+    return records
+
+
+@instrument()
+def forecast_user_budgets(user_id: int, as_of: date = None, inputs=None):
+    """Forecasts for one user's active budgets, most at risk first.
+
+    ``inputs`` is ``load_forecast_inputs(as_of, user_id, user_id)`` when the
+    caller has already read it.
+    """
+    as_of = as_of or date.today()
+    started = time.perf_counter()
+    budgets, expenses = inputs or load_forecast_inputs(as_of, user_id, user_id)
+    forecasts = forecast_records(forecast_budgets(budgets, expenses, as_of))
+    forecasts.sort(key=lambda f: f["projected_remaining"])
+    return {
+        "user_id": user_id,
+        "as_of": as_of.isoformat(),
+        "forecasts": forecasts,
+        "at_risk": sum(f["will_exceed"] for f in forecasts),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def save_forecasts(forecast, as_of: date, first_user: int, last_user: int):
+    """Replace the stored forecasts for ``first_user..last_user``"""
+    # NaT becomes None (NULL) on the way to object
+    exhaustion = forecast["exhaustion_date"]
+    rows = list(zip(
+        forecast["budget_id"].tolist(),
+        forecast["user_id"].tolist(),
+        [as_of] * len(forecast["budget_id"]),
+        np.round(forecast["spent_to_date"], 2).tolist(),
+        np.round(forecast["expected_recurring"], 2).tolist(),
+        np.round(forecast["projected_spend"], 2).tolist(),
+        forecast["will_exceed"].astype(int).tolist(),
+        exhaustion.astype(object).tolist(),
+    ))
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        if get_pool().dialect == "mssql":
+            cursor.fast_executemany = True
+        cursor.execute(
+            "DELETE FROM dbo.T_SNG_BudgetForecasts WHERE user_id BETWEEN ? AND ?", (first_user, last_user)
+        )
+        if rows:
+            cursor.executemany("""
+                INSERT INTO dbo.T_SNG_BudgetForecasts
+                    (budget_id, user_id, as_of, spent_to_date, expected_recurring,
+                     projected_spend, will_exceed, exhaustion_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+        conn.commit()
+    except Exception as e:
+        raise ValueError(f"Error saving forecasts: {str(e)}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+
+def run_nightly_forecasts(as_of: date = None, partition_users: int = FORECAST_PARTITION_USERS):
+    """Forecast every active budget, ``partition_users`` users at a time.
+
+    Each partition is one load, one vectorized pass and one batched write,
+    so time and memory grow linearly with the number of budgets.
+    """
+    as_of = as_of or date.today()
+    started = time.perf_counter()
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        (user_ids,) = _fetch_columns(cursor, """
+            SELECT DISTINCT user_id FROM dbo.T_SNG_Budgets
+            WHERE start_date <= ? AND end_date >= ?
+            ORDER BY user_id
+        """, (as_of, as_of), 1)
+        # Forecasts for budgets that have ended or users with none left
+        cursor.execute("DELETE FROM dbo.T_SNG_BudgetForecasts WHERE as_of < ?", (as_of,))
+        conn.commit()
+    except Exception as e:
+        raise ValueError(f"Error starting forecast run: {str(e)}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+    stats = {"as_of": as_of.isoformat(), "users": len(user_ids), "budgets": 0, "at_risk": 0,
+             "partitions": 0, "load_ms": 0.0, "compute_ms": 0.0, "write_ms": 0.0}
+    for i in range(0, len(user_ids), partition_users):
+        first_user, last_user = user_ids[i], user_ids[min(i + partition_users, len(user_ids)) - 1]
+        step = time.perf_counter()
+        budgets, expenses = load_forecast_inputs(as_of, first_user, last_user)
+        loaded = time.perf_counter()
+        forecast = forecast_budgets(budgets, expenses, as_of)
+        computed = time.perf_counter()
+        save_forecasts(forecast, as_of, first_user, last_user)
+
+        stats["partitions"] += 1
+        stats["budgets"] += len(forecast["budget_id"])
+        stats["at_risk"] += int(forecast["will_exceed"].sum())
+        stats["load_ms"] += (loaded - step) * 1000
+        stats["compute_ms"] += (computed - loaded) * 1000
+        stats["write_ms"] += (time.perf_counter() - computed) * 1000
+
+    for key in ("load_ms", "compute_ms", "write_ms"):
+        stats[key] = round(stats[key], 2)
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast end-of-period spend for every active budget")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None)
+    parser.add_argument("--partition-users", type=int, default=FORECAST_PARTITION_USERS)
+    args = parser.parse_args()
+    print(run_nightly_forecasts(args.as_of, args.partition_users))
@@ -1,89 +1,247 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Dict, List
-from backend.utils.database import get_db_connection
+from backend.utils.database import get_db_connection, get_pool
+from backend.utils.metrics import instrument
+from backend.utils.pagination import decode_cursor, encode_cursor, month_range, page_size, read_page
 
-def set_budget(user_id: int, category: str, amount: float, start_date: str, end_date: str):
+MAX_BATCH_BUDGETS = 100
+
+# Identical (user_id, category, start_date, end_date) periods are updated in
+# place; anything else becomes a new budget
+MSSQL_UPSERT_SQL = """
+    SET NOCOUNT ON;
+    DECLARE @results TABLE (row_no INT, budget_id INT, action NVARCHAR(10));
+
+    MERGE dbo.T_SNG_Budgets WITH (HOLDLOCK) AS t
+    USING #BudgetBatch AS s
+        ON t.user_id = s.user_id
+        AND t.category = s.category
+        AND t.start_date = s.start_date
+        AND t.end_date = s.end_date
+    WHEN MATCHED THEN
+        UPDATE SET t.amount = s.amount
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (user_id, category, amount, start_date, end_date)
+        VALUES (s.user_id, s.category, s.amount, s.start_date, s.end_date)
+    -- The table has triggers, so OUTPUT has to go INTO a table variable
+    OUTPUT s.row_no, INSERTED.budget_id, $action INTO @results;
+
+    SELECT
+        r.row_no,
+        r.action,
+        b.budget_id,
+        b.category,
+        b.amount AS budgeted_amount,
+        b.actual_spent,
+        b.amount - b.actual_spent AS remaining_amount,
+        b.start_date,
+        b.end_date
+    FROM @results AS r
+    JOIN dbo.T_SNG_Budgets AS b ON b.budget_id = r.budget_id
+    ORDER BY r.row_no;
+"""
+
+def _budget_from_row(row):
+    return {
+        "category": row[0],
+        "budgeted_amount": float(row[1]),
+        "actual_spent": float(row[2]) if row[2] is not None else 0.0,
+        "remaining_amount": float(row[3]) if row[3] is not None else float(row[1]),
+        "start_date": row[4].strftime("%Y-%m-%d"),
+        "end_date": row[5].strftime("%Y-%m-%d")
+    }
+
+def _validate_budgets(user_id: int, budgets: List[Dict]):
+    """Check and normalise a batch; later duplicates of a period replace earlier ones"""
+    if not budgets:
+        raise ValueError("At least one budget is required")
+    if len(budgets) > MAX_BATCH_BUDGETS:
+        raise ValueError(f"Too many budgets: {len(budgets)}. Maximum is {MAX_BATCH_BUDGETS}.")
+
+    rows = {}
+    for position, budget in enumerate(budgets):
+        category = (budget.get("category") or "").strip()
+        if not category or len(category) > 100:
+            raise ValueError(f"Budget {position}: category must be 1-100 characters")
+        amount = round(float(budget["amount"]), 2)
+        if amount < 0:
+            raise ValueError(f"Budget {position}: amount cannot be negative")
+        start = datetime.strptime(budget["start_date"], "%Y-%m-%d").date()
+        end = datetime.strptime(budget["end_date"], "%Y-%m-%d").date()
+        if end < start:
+            raise ValueError(f"Budget {position}: end_date is before start_date")
+        rows[(category, start, end)] = (user_id, category, amount, start, end)
+    return [(row_no, *row) for row_no, row in enumerate(rows.values())]
+
+def _drop_quietly(cursor, sql):
+    """Drop a batch table after a failed write without hiding the write's error"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Insert new budget
+        cursor.execute(sql)
+    except Exception:
+        # A doomed transaction refuses the drop; its rollback removes the table
+        pass
+
+def _upsert_mssql(cursor, rows):
+    # A table left behind by an earlier failed batch on this pooled connection
+    cursor.execute("IF OBJECT_ID('tempdb..#BudgetBatch') IS NOT NULL DROP TABLE #BudgetBatch")
+    cursor.execute("""
+        CREATE TABLE #BudgetBatch (
+            row_no INT PRIMARY KEY,
+            user_id INT NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            amount DECIMAL(10,2) NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL
+        )
+    """)
+    try:
+        cursor.fast_executemany = True
+        cursor.executemany("INSERT INTO #BudgetBatch VALUES (?, ?, ?, ?, ?, ?)", rows)
+        cursor.execute(MSSQL_UPSERT_SQL)
+        results = [(row[1].lower() == "insert", row[2], row[3:]) for row in cursor.fetchall()]
+    except Exception:
+        _drop_quietly(cursor, "DROP TABLE #BudgetBatch")
+        raise
+    cursor.execute("DROP TABLE #BudgetBatch")
+    return results
+
+def _upsert_sqlite(cursor, rows):
+    # SQLite has no MERGE and RETURNING cannot see the source row, so the
+    # update and insert each return their ids and the batch key joins them back
+    cursor.execute("DROP TABLE IF EXISTS temp.budget_batch")
+    cursor.execute("""
+        CREATE TEMP TABLE budget_batch (
+            row_no INT PRIMARY KEY, user_id INT, category VARCHAR(100),
+            amount DECIMAL(10,2), start_date DATE, end_date DATE
+        )
+    """)
+    try:
+        cursor.executemany("INSERT INTO temp.budget_batch VALUES (?, ?, ?, ?, ?, ?)", rows)
+        cursor.execute("""
+            UPDATE dbo.T_SNG_Budgets AS t
+            SET amount = s.amount
+            FROM temp.budget_batch AS s
+            WHERE t.user_id = s.user_id AND t.category = s.category
+                AND t.start_date = s.start_date AND t.end_date = s.end_date
+            RETURNING budget_id
+        """)
+        updated = {row[0] for row in cursor.fetchall()}
         cursor.execute("""
             INSERT INTO dbo.T_SNG_Budgets (user_id, category, amount, start_date, end_date)
-            VALUES (?, ?, ?, ?, ?)
-        """, (user_id, category, amount, start_date, end_date))
-        
+            SELECT s.user_id, s.category, s.amount, s.start_date, s.end_date
+            FROM temp.budget_batch AS s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM dbo.T_SNG_Budgets AS t
+                WHERE t.user_id = s.user_id AND t.category = s.category
+                    AND t.start_date = s.start_date AND t.end_date = s.end_date
+            )
+            ORDER BY s.row_no
+            RETURNING budget_id
+        """)
+        created = {row[0] for row in cursor.fetchall()}
+        ids = sorted(updated | created)
+        cursor.execute(f"""
+            SELECT
+                s.row_no,
+                b.budget_id,
+                b.category,
+                b.amount AS budgeted_amount,
+                b.actual_spent,
+                b.amount - b.actual_spent AS remaining_amount,
+                b.start_date,
+                b.end_date
+            FROM dbo.T_SNG_Budgets AS b
+            JOIN temp.budget_batch AS s
+                ON s.user_id = b.user_id AND s.category = b.category
+                AND s.start_date = b.start_date AND s.end_date = b.end_date
+            WHERE b.budget_id IN ({", ".join("?" * len(ids))})
+            ORDER BY s.row_no
+        """, ids)
+        results = [(row[1] in created, row[1], row[2:]) for row in cursor.fetchall()]
+    except Exception:
+        _drop_quietly(cursor, "DROP TABLE IF EXISTS temp.budget_batch")
+        raise
+    cursor.execute("DROP TABLE IF EXISTS temp.budget_batch")
+    return results
+
+@instrument()
+def upsert_budgets(user_id: int, budgets: List[Dict]):
+    """Create or update many budgets in one transaction.
+
+    Each budget is keyed by its category and period. The whole batch is
+    written with one set-based statement and the resulting statuses are read
+    back in one query for exactly the budget ids that statement touched.
+    """
+    try:
+        rows = _validate_budgets(user_id, budgets)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Error setting budgets: {str(e)}")
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if get_pool().dialect == "mssql":
+            results = _upsert_mssql(cursor, rows)
+        else:
+            results = _upsert_sqlite(cursor, rows)
         conn.commit()
-        
-        # Get the inserted budget using the view
-        cursor.execute("""
-            SELECT 
-                category,
-                budgeted_amount,
-                actual_spent,
-                remaining_amount,
-                start_date,
-                end_date
-            FROM dbo.V_SNG_BudgetStatus_L1
-            WHERE user_id = ? AND category = ?
-        """, (user_id, category))
-        
-        row = cursor.fetchone()
-        
-        if row:
-            budget = {
-                "category": row[0],
-                "budgeted_amount": float(row[1]),
-                "actual_spent": float(row[2]) if row[2] is not None else 0.0,
-                "remaining_amount": float(row[3]) if row[3] is not None else float(row[1]),
-                "start_date": row[4].strftime("%Y-%m-%d"),
-                "end_date": row[5].strftime("%Y-%m-%d")
-            }
-            
-            return {
-                "user_id": user_id,
-                "budget": budget,
-                "message": "Budget successfully created"
-            }
-        
-        raise ValueError("Failed to retrieve created budget")
-        
+
+        budgets = [
+            {"budget_id": budget_id, "action": "created" if created else "updated", **_budget_from_row(row)}
+            for created, budget_id, row in results
+        ]
+        return {
+            "user_id": user_id,
+            "budgets": budgets,
+            "created": sum(1 for b in budgets if b["action"] == "created"),
+            "updated": sum(1 for b in budgets if b["action"] == "updated"),
+            "count": len(budgets)
+        }
     except Exception as e:
-        raise ValueError(f"Error setting budget: {str(e)}")
+        raise ValueError(f"Error setting budgets: {str(e)}")
     finally:
-        cursor.close()
         conn.close()
 
+def set_budget(user_id: int, category: str, amount: float, start_date: str, end_date: str):
+    result = upsert_budgets(user_id, [{
+        "category": category,
+        "amount": amount,
+        "start_date": start_date,
+        "end_date": end_date
+    }])
+    if not result["budgets"]:
+        raise ValueError("Error setting budget: Failed to retrieve created budget")
+
+    budget = result["budgets"][0]
+    return {
+        "user_id": user_id,
+        "budget": budget,
+        "message": f"Budget successfully {budget['action']}"
+    }
+
+@instrument()
 def get_budgets(user_id: int):
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Get all budgets for user using the view
+        # Index seek on the maintained totals instead of aggregating expenses
         cursor.execute("""
             SELECT 
                 category,
-                budgeted_amount,
+                amount AS budgeted_amount,
                 actual_spent,
-                remaining_amount,
+                amount - actual_spent AS remaining_amount,
                 start_date,
                 end_date
-            FROM dbo.V_SNG_BudgetStatus_L1
+            FROM dbo.T_SNG_Budgets
             WHERE user_id = ?
             ORDER BY start_date DESC
         """, (user_id,))
         
         budgets = []
         for row in cursor.fetchall():
-            budget = {
-                "category": row[0],
-                "budgeted_amount": float(row[1]),
-                "actual_spent": float(row[2]) if row[2] is not None else 0.0,
-                "remaining_amount": float(row[3]) if row[3] is not None else float(row[1]),
-                "start_date": row[4].strftime("%Y-%m-%d"),
-                "end_date": row[5].strftime("%Y-%m-%d")
-            }
-            budgets.append(budget)
+            budgets.append(_budget_from_row(row))
         
         return {
             "user_id": user_id,
@@ -94,5 +252,64 @@ def get_budgets(user_id: int):
     except Exception as e:
         raise ValueError(f"Error getting budgets: {str(e)}")
     finally:
-        cursor.close()
+        conn.close()
+
+@instrument()
+def list_budgets(user_id: int, category: str = None, month: str = None, limit: int = None, cursor: str = None):
+    """One page of a user's budgets, latest period first, keyset-paginated on (start_date, budget_id).
+
+    ``month`` keeps budgets whose period overlaps that ``YYYY-MM`` month.
+    Pass the returned ``next_cursor`` back with the same filters for the next
+    page; ``next_cursor`` is None on the last page.
+    """
+    size = page_size(limit)
+    filters = {"list": "budgets", "user_id": user_id, "category": category, "month": month}
+    conditions, params = ["user_id = ?"], [user_id]
+    if category:
+        conditions.append("category = ?")
+        params.append(category)
+    if month:
+        first_day, next_month = month_range(month)
+        conditions.append("start_date < ? AND end_date >= ?")
+        params.extend([next_month, first_day])
+    if cursor:
+        try:
+            last_start, last_id = decode_cursor(cursor, filters)
+            last_start, last_id = date.fromisoformat(last_start), int(last_id)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Error listing budgets: {str(e) or 'Invalid cursor'}")
+        conditions.append("start_date <= ? AND (start_date < ? OR (start_date = ? AND budget_id < ?))")
+        params.extend([last_start, last_start, last_start, last_id])
+
+    mssql = get_pool().dialect == "mssql"
+    conn = get_db_connection()
+    try:
+        db_cursor = conn.cursor()
+        db_cursor.execute(f"""
+            SELECT {"TOP (?) " if mssql else ""}
+                budget_id,
+                category,
+                amount AS budgeted_amount,
+                actual_spent,
+                amount - actual_spent AS remaining_amount,
+                start_date,
+                end_date
+            FROM dbo.T_SNG_Budgets
+            WHERE {" AND ".join(conditions)}
+            ORDER BY start_date DESC, budget_id DESC{"" if mssql else " LIMIT ?"}
+        """, [size + 1, *params] if mssql else [*params, size + 1])
+        budgets, last_row, has_more = read_page(
+            db_cursor, size, lambda row: {"budget_id": row[0], **_budget_from_row(row[1:])}
+        )
+        return {
+            "user_id": user_id,
+            "category": category,
+            "month": month,
+            "budgets": budgets,
+            "count": len(budgets),
+            "next_cursor": encode_cursor((last_row[5].isoformat(), last_row[0]), filters) if has_more else None
+        }
+    except Exception as e:
+        raise ValueError(f"Error listing budgets: {str(e)}")
+    finally:
         conn.close()
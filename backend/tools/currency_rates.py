@@ -1,27 +1,167 @@
+import os
+import threading
+import time
 import requests
+from backend.utils.lazy import LazyModule
+from backend.utils.metrics import instrument
+from backend.utils.upstream import get_upstream
 
+np = LazyModule("numpy")
+
+FX_BASE = os.getenv("FX_BASE", "USD")
+FX_REFRESH_SECONDS = float(os.getenv("FX_REFRESH_SECONDS", "3600"))
+FX_TIMEOUT = float(os.getenv("FX_TIMEOUT", "5"))
+# First wait after a failed refresh; it doubles with each further failure,
+# up to FX_REFRESH_SECONDS
+FX_RETRY_SECONDS = float(os.getenv("FX_RETRY_SECONDS", "30"))
+
+
+class FxRateTable:
+    """Every cross rate for one snapshot of a base-currency rate table.
+
+    ``matrix[i, j]`` is how many units of currency ``j`` one unit of
+    currency ``i`` buys. All pairs are derived from the same base vector, so
+    cross rates are consistent (A->B->C equals A->C) and inverses are exact.
+    """
+
+    def __init__(self, base: str, rates: dict, as_of: float):
+        rates = {code.upper(): float(rate) for code, rate in rates.items() if rate}
+        rates[base.upper()] = 1.0
+        self.base = base.upper()
+        self.as_of = as_of
+        self.fetched_at = time.time()
+        self.currencies = sorted(rates)
+        self.index = {code: i for i, code in enumerate(self.currencies)}
+        per_base = np.array([rates[code] for code in self.currencies], dtype=np.float64)
+        self.matrix = per_base[np.newaxis, :] / per_base[:, np.newaxis]
+
+    def _position(self, code: str) -> int:
+        try:
+            return self.index[code.upper()]
+        except KeyError:
+            raise ValueError(f"Currency {code.upper()} not found in rates")
+
+    def rate(self, base: str, target: str) -> float:
+        return float(self.matrix[self._position(base), self._position(target)])
+
+    def convert(self, amounts, base: str, target: str) -> "np.ndarray":
+        """Convert an array of amounts from one currency to another"""
+        return np.asarray(amounts, dtype=np.float64) * self.matrix[self._position(base), self._position(target)]
+
+    def convert_pairs(self, amounts, bases, targets) -> "np.ndarray":
+        """Convert ``amounts[k]`` from ``bases[k]`` to ``targets[k]`` in one gather"""
+        rows = np.fromiter((self._position(c) for c in bases), dtype=np.intp, count=len(bases))
+        cols = np.fromiter((self._position(c) for c in targets), dtype=np.intp, count=len(targets))
+        return np.asarray(amounts, dtype=np.float64) * self.matrix[rows, cols]
+
+    def age_seconds(self) -> float:
+        return time.time() - self.as_of
+
+
+def rate_table_url(base: str):
+    api_key = os.getenv("EXCHANGE_RATE_API_KEY", "")
+    if api_key:
+        return f"https://v6.exchangerate-api.com/v6/{api_key}/latest/{base}"
+    return f"https://api.exchangerate.host/latest?base={base}"
+
+
+@instrument("fx.fetch_rate_table")
+def fetch_rate_table(base: str = FX_BASE) -> FxRateTable:
+    """Download the full rate table for ``base`` in one request"""
+    response = get_upstream("fx").session.get(rate_table_url(base), timeout=FX_TIMEOUT)
+    response.raise_for_status()  # Raise an error for bad status codes
+    data = response.json()
+
+    if not data.get("success", True) or data.get("result") == "error":
+        raise ValueError("API returned unsuccessful response")
+
+    # exchangerate.host calls it "rates", exchangerate-api.com "conversion_rates"
+    rates = data.get("rates") or data.get("conversion_rates")
+    if not rates:
+        raise ValueError("No rates data in response")
+
+    as_of = data.get("timestamp") or data.get("time_last_update_unix") or time.time()
+    return FxRateTable(base, rates, float(as_of))
+
+
+_table = None
+_table_fetched_at = 0.0
+_next_attempt_at = 0.0
+_failed_refreshes = 0
+_table_lock = threading.Lock()
+_fx_stats = {"refreshes": 0, "refresh_failures": 0}
+
+
+def _refresh_due() -> bool:
+    now = time.time()
+    if now < _next_attempt_at:
+        return False
+    return _table is None or now - _table_fetched_at >= FX_REFRESH_SECONDS
+
+
+def get_rate_table() -> FxRateTable:
+    """Return the in-memory rate table, refreshing it every FX_REFRESH_SECONDS.
+
+    Once a table exists, callers never wait on a refresh: one thread
+    refreshes while the others keep serving the current table. A failed
+    refresh backs off before the next attempt, so an FX outage costs one
+    upstream call per backoff rather than one per request.
+    """
+    global _table, _table_fetched_at, _next_attempt_at, _failed_refreshes
+    if _table is not None and not _refresh_due():
+        return _table
+
+    if not _table_lock.acquire(blocking=_table is None):
+        # Another thread is already refreshing
+        return _table
+    try:
+        if not _refresh_due():
+            if _table is not None:
+                return _table
+            raise ValueError(f"FX rates unavailable; retrying in {_next_attempt_at - time.time():.0f}s")
+        try:
+            _table = get_upstream("fx").call(fetch_rate_table).value
+            _table_fetched_at = time.time()
+            _failed_refreshes = 0
+            _next_attempt_at = 0.0
+            _fx_stats["refreshes"] += 1
+        except Exception:
+            _fx_stats["refresh_failures"] += 1
+            _failed_refreshes += 1
+            _next_attempt_at = time.time() + min(FX_RETRY_SECONDS * 2 ** (_failed_refreshes - 1), FX_REFRESH_SECONDS)
+            if _table is None:
+                raise
+    finally:
+        _table_lock.release()
+    return _table
+
+
+def is_stale(table: FxRateTable) -> bool:
+    """True when refreshes have been failing and an old table is still serving"""
+    return time.time() - table.fetched_at > FX_REFRESH_SECONDS * 2
+
+
+def fx_stats():
+    table = _table
+    return {
+        **_fx_stats,
+        "stale": is_stale(table) if table else None,
+        "currencies": len(table.currencies) if table else 0,
+        "age_seconds": round(table.age_seconds(), 1) if table else None,
+    }
+
+
+@instrument()
 def get_exchange_rate(base: str, target: str):
-    url = f"https://api.exchangerate.host/latest?base={base.upper()}&symbols={target.upper()}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an error for bad status codes
-        data = response.json()
-        
-        if not data.get("success", True):  # Check if the API indicates failure
-            raise ValueError("API returned unsuccessful response")
-            
-        if "rates" not in data:
-            raise ValueError("No rates data in response")
-            
-        if target.upper() not in data["rates"]:
-            raise ValueError(f"Target currency {target.upper()} not found in rates")
-            
-        rate = data["rates"][target.upper()]
+        table = get_rate_table()
         return {
             "base": base.upper(),
             "target": target.upper(),
-            "rate": round(float(rate), 4),
-            "timestamp": data.get("timestamp", None)
+            "rate": round(table.rate(base, target), 4),
+            "timestamp": int(table.as_of),
+            "age_seconds": round(table.age_seconds(), 1),
+            "stale": is_stale(table)
         }
     except requests.RequestException as e:
         raise ValueError(f"Network error: {str(e)}")
@@ -29,3 +169,23 @@ def get_exchange_rate(base: str, target: str):
         raise ValueError(f"Error processing exchange rate: {str(e)}")
     except Exception as e:
         raise ValueError(f"Unexpected error: {str(e)}")
+
+
+@instrument()
+def convert_amounts(amounts, base: str, target: str):
+    try:
+        table = get_rate_table()
+        converted = table.convert(amounts, base, target)
+        return {
+            "base": base.upper(),
+            "target": target.upper(),
+            "rate": round(table.rate(base, target), 6),
+            "amounts": np.round(converted, 2).tolist(),
+            "timestamp": int(table.as_of),
+            "age_seconds": round(table.age_seconds(), 1),
+            "stale": is_stale(table)
+        }
+    except requests.RequestException as e:
+        raise ValueError(f"Network error: {str(e)}")
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Error converting amounts: {str(e)}")
@@ -0,0 +1,240 @@
+"""Stream a user's full expense history as CSV, NDJSON or Parquet.
+
+Rows are read from ``V_SNG_UserExpenses_L1`` through one forward-only
+cursor with ``fetchmany``. Each batch is encoded and handed on before the
+next is fetched, so memory stays flat however long the history is.
+Parquet is written one row group at a time, and the bytes of each finished
+row group are passed on straight away. ``gzip_chunks`` compresses any of
+the byte streams on the fly.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import zlib
+from datetime import date
+from backend.utils.admission import AdmissionRejected
+from backend.utils.database import get_db_connection
+from backend.utils.lazy import LazyModule
+
+# Parquet support is optional; pyarrow is only imported for Parquet exports
+pa = LazyModule("pyarrow")
+pq = LazyModule("pyarrow.parquet")
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+PARQUET_ROW_GROUP_ROWS = int(os.getenv("PARQUET_ROW_GROUP_ROWS", "100000"))
+# A running export holds a pooled connection for as long as the client takes
+# to download it; kept below DB_POOL_SIZE (10) so slow downloads cannot take
+# the connections every other endpoint needs
+EXPORT_MAX_CONCURRENCY = int(os.getenv("EXPORT_MAX_CONCURRENCY", "4"))
+EXPORT_RETRY_AFTER = 5.0
+
+EXPORT_COLUMNS = ["expense_id", "expense_date", "amount", "category", "description"]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_SQL = """
+    SELECT expense_id, expense_date, amount, category, description
+    FROM dbo.V_SNG_UserExpenses_L1
+    WHERE user_id = ?{range}
+    ORDER BY expense_date, expense_id
+"""
+
+
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENCY)
+
+
+class ExportSlot:
+    """One of the ``EXPORT_MAX_CONCURRENCY`` export slots; ``release`` may be called more than once"""
+
+    __slots__ = ("_released",)
+
+    def __init__(self):
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            _export_slots.release()
+
+
+def claim_export_slot():
+    """Take an export slot without waiting; a 503 with Retry-After when all are in use"""
+    if not _export_slots.acquire(blocking=False):
+        raise AdmissionRejected("Too many exports are running", "export_slots", EXPORT_RETRY_AFTER, 503)
+    return ExportSlot()
+
+
+def iter_expense_batches(user_id: int, start_date: date = None, end_date: date = None,
+                         batch_rows: int = EXPORT_BATCH_ROWS):
+    """Yield lists of at most ``batch_rows`` expense rows, oldest first.
+
+    The connection stays checked out until the generator is exhausted or closed.
+    """
+    conditions, params = "", [user_id]
+    if start_date:
+        conditions += " AND expense_date >= ?"
+        params.append(start_date)
+    if end_date:
+        conditions += " AND expense_date <= ?"
+        params.append(end_date)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(EXPORT_SQL.format(range=conditions), params)
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def _values(row):
+    return row[0], row[1].isoformat(), round(float(row[2]), 2), row[3], row[4] or ""
+
+
+def csv_chunks(batches):
+    """Header, then one CSV chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_values(row) for row in rows)
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(batches):
+    """One JSON object per line, one chunk per batch"""
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _values(row))), separators=(",", ":")) + "\n" for row in rows
+        ).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what was written until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_schema():
+    return pa.schema([
+        ("expense_id", pa.int64()),
+        ("expense_date", pa.date32()),
+        ("amount", pa.float64()),
+        ("category", pa.string()),
+        ("description", pa.string()),
+    ])
+
+
+def parquet_chunks(batches, row_group_rows: int = PARQUET_ROW_GROUP_ROWS):
+    """Parquet file bytes, emitted as each row group is written"""
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    columns = [[] for _ in EXPORT_COLUMNS]
+
+    def flush(count):
+        arrays = [pa.array(values[:count], type=field.type) for values, field in zip(columns, schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=count)
+        for values in columns:
+            del values[:count]
+        return sink.drain()
+
+    try:
+        for rows in batches:
+            for column, values in zip(columns, zip(*rows)):
+                column.extend(values)
+            while len(columns[0]) >= row_group_rows:
+                yield flush(row_group_rows)
+        if columns[0]:
+            yield flush(len(columns[0]))
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def gzip_chunks(chunks, level: int = 6):
+    """Gzip a byte stream chunk by chunk"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """True when an Accept-Encoding header allows gzip (and does not give it q=0)"""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            quality = params.strip().lower()
+            if not quality.startswith("q="):
+                return True
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def export_expenses(user_id: int, fmt: str = "csv", start_date: date = None, end_date: date = None,
+                    gzip: bool = False):
+    """Return a generator of export bytes for one user in ``fmt``.
+
+    Parquet is never gzipped on top: its pages are already compressed.
+    """
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Unsupported export format: {fmt}. Use one of {', '.join(EXPORT_MEDIA_TYPES)}.")
+    if start_date and end_date and end_date < start_date:
+        raise ValueError("end_date is before start_date")
+    if fmt == "parquet":
+        try:
+            pq.ParquetWriter
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow installed")
+
+    batches = iter_expense_batches(user_id, start_date, end_date)
+    encode = {"csv": csv_chunks, "ndjson": ndjson_chunks, "parquet": parquet_chunks}[fmt]
+    chunks = encode(batches)
+    if gzip and fmt != "parquet":
+        chunks = gzip_chunks(chunks)
+    return _closing(chunks, batches)
+
+
+def _closing(chunks, batches):
+    """Release the cursor's connection as soon as the stream ends or is abandoned"""
+    try:
+        yield from chunks
+    finally:
+        batches.close()
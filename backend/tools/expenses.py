@@ -1,16 +1,251 @@
-from db.connection import get_db
+import os
+import time
+from datetime import date
+from backend.db.connection import get_db
+from backend.utils.database import get_pool
+from backend.utils.lazy import LazyModule
+from backend.utils.metrics import instrument
+from backend.utils.pagination import decode_cursor, encode_cursor, month_range, page_size, read_page
 
+# Only CSV imports need pandas
+pd = LazyModule("pandas")
+
+IMPORT_CHUNK_SIZE = int(os.getenv("EXPENSE_IMPORT_CHUNK_SIZE", "5000"))
+MAX_REPORTED_ERRORS = int(os.getenv("EXPENSE_IMPORT_MAX_ERRORS", "1000"))
+
+# Header names seen in bank and card exports, mapped to our columns
+COLUMN_ALIASES = {
+    "date": "expense_date",
+    "transaction date": "expense_date",
+    "posted date": "expense_date",
+    "posting date": "expense_date",
+    "memo": "description",
+    "details": "description",
+    "payee": "description",
+    "value": "amount",
+}
+
+# Tried in order; the sample exports use US month/day dates like 1/5/2025
+DATE_FORMATS = ["%m/%d/%Y", "%Y-%m-%d", "%m/%d/%y", "%d.%m.%Y"]
+
+INSERT_EXPENSE_SQL = """
+    INSERT INTO dbo.T_SNG_Expenses (user_id, amount, category, description, expense_date)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+@instrument()
 def add_expense(user_id: int, amount: float, category: str, description: str, date: str):
     try:
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO Expenses (user_id, amount, category, description, date)
-            VALUES (?, ?, ?, ?, ?)
-        """, (user_id, amount, category, description, date))
+        cursor.execute(INSERT_EXPENSE_SQL, (user_id, amount, category, description, date))
         conn.commit()
         return {"status": "success", "message": "Expense added successfully"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+@instrument()
+def get_expense_summary(user_id: int, month: str = None):
+    """Spending per category for a user, optionally limited to one ``YYYY-MM`` month"""
+    if month is not None:
+        month_range(month)
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        # expense_month is the persisted month key covered by IX_SNG_Expenses_User_Month
+        cursor.execute(f"""
+            SELECT category, COUNT(*) AS expense_count, SUM(amount) AS total_amount
+            FROM dbo.T_SNG_Expenses
+            WHERE user_id = ?{" AND expense_month = ?" if month else ""}
+            GROUP BY category
+            ORDER BY total_amount DESC
+        """, (user_id, month) if month else (user_id,))
+        categories = [
+            {"category": row[0], "count": int(row[1]), "total": round(float(row[2]), 2)}
+            for row in cursor.fetchall()
+        ]
+        return {
+            "user_id": user_id,
+            "month": month,
+            "categories": categories,
+            "total": round(sum(c["total"] for c in categories), 2)
+        }
+    except Exception as e:
+        raise ValueError(f"Error summarising expenses: {str(e)}")
+    finally:
+        conn.close()
+
+def _expense_from_row(row):
+    return {
+        "expense_id": row[0],
+        "date": row[1].strftime("%Y-%m-%d"),
+        "amount": float(row[2]),
+        "category": row[3],
+        "description": row[4] or ""
+    }
+
+@instrument()
+def list_expenses(user_id: int, category: str = None, month: str = None, limit: int = None, cursor: str = None):
+    """One page of a user's expenses, newest first, keyset-paginated on (expense_date, expense_id).
+
+    Pass the returned ``next_cursor`` back with the same filters for the next
+    page; ``next_cursor`` is None on the last page.
+    """
+    size = page_size(limit)
+    filters = {"list": "expenses", "user_id": user_id, "category": category, "month": month}
+    conditions, params = ["user_id = ?"], [user_id]
+    if category:
+        conditions.append("category = ?")
+        params.append(category)
+    if month:
+        # A date range on the index key instead of the month column, so the
+        # same index also serves the ORDER BY
+        conditions.append("expense_date >= ? AND expense_date < ?")
+        params.extend(month_range(month))
+    if cursor:
+        try:
+            last_date, last_id = decode_cursor(cursor, filters)
+            last_date, last_id = date.fromisoformat(last_date), int(last_id)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Error listing expenses: {str(e) or 'Invalid cursor'}")
+        # The redundant "<=" bound lets SQL Server seek instead of scanning the OR
+        conditions.append("expense_date <= ? AND (expense_date < ? OR (expense_date = ? AND expense_id < ?))")
+        params.extend([last_date, last_date, last_date, last_id])
+
+    mssql = get_pool().dialect == "mssql"
+    conn = get_db()
+    try:
+        db_cursor = conn.cursor()
+        db_cursor.execute(f"""
+            SELECT {"TOP (?) " if mssql else ""}expense_id, expense_date, amount, category, description
+            FROM dbo.V_SNG_UserExpenses_L1
+            WHERE {" AND ".join(conditions)}
+            ORDER BY expense_date DESC, expense_id DESC{"" if mssql else " LIMIT ?"}
+        """, [size + 1, *params] if mssql else [*params, size + 1])
+        expenses, last_row, has_more = read_page(db_cursor, size, _expense_from_row)
+        return {
+            "user_id": user_id,
+            "category": category,
+            "month": month,
+            "expenses": expenses,
+            "count": len(expenses),
+            "next_cursor": encode_cursor((last_row[1].isoformat(), last_row[0]), filters) if has_more else None
+        }
+    except Exception as e:
+        raise ValueError(f"Error listing expenses: {str(e)}")
+    finally:
+        conn.close()
+
+def _parse_dates(values: "pd.Series") -> "pd.Series":
+    """Parse a column of date strings, trying each known format in turn"""
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors="coerce")
+    return parsed
+
+def _validate_chunk(chunk: "pd.DataFrame", user_id: int, first_line: int):
+    """Validate one chunk column-wise; returns (rows to insert, row errors)"""
+    chunk = chunk.rename(columns=lambda c: COLUMN_ALIASES.get(c.strip().lower(), c.strip().lower()))
+    for column in ("amount", "category", "expense_date"):
+        if column not in chunk.columns:
+            raise ValueError(f"CSV is missing required column: {column}")
+    if "description" not in chunk.columns:
+        chunk["description"] = ""
+
+    amounts = pd.to_numeric(
+        chunk["amount"].str.replace(r"[$,\s]", "", regex=True),
+        errors="coerce"
+    ).round(2)
+    dates = _parse_dates(chunk["expense_date"].str.strip())
+    categories = chunk["category"].fillna("").str.strip()
+    descriptions = chunk["description"].fillna("").str.strip().str.slice(0, 255)
+
+    problems = pd.Series("", index=chunk.index)
+    problems[amounts.isna()] += "invalid amount; "
+    problems[amounts.abs() >= 1e8] += "amount out of range; "
+    problems[dates.isna()] += "unrecognised date; "
+    problems[categories == ""] += "missing category; "
+    problems[categories.str.len() > 100] += "category longer than 100 characters; "
+    if "user_id" in chunk.columns:
+        problems[pd.to_numeric(chunk["user_id"], errors="coerce") != user_id] += "user_id does not match the importing user; "
+
+    bad = problems != ""
+    # Line numbers count the header as line 1
+    errors = [
+        {"line": first_line + int(position), "error": message.rstrip("; ")}
+        for position, message in zip(chunk.index[bad] - chunk.index[0], problems[bad])
+    ]
+
+    good = ~bad
+    rows = list(zip(
+        [user_id] * int(good.sum()),
+        amounts[good].astype(float).tolist(),
+        categories[good].tolist(),
+        descriptions[good].tolist(),
+        dates[good].dt.strftime("%Y-%m-%d").tolist()
+    ))
+    return rows, errors
+
+@instrument()
+def import_expenses_csv(user_id: int, fileobj, chunk_size: int = IMPORT_CHUNK_SIZE):
+    """Stream a CSV of expenses into T_SNG_Expenses in validated, batched chunks.
+
+    The file is read ``chunk_size`` rows at a time so memory stays flat
+    regardless of file size. Each chunk is validated column-wise and its
+    valid rows are inserted with one ``executemany`` (``fast_executemany`` on
+    pyodbc). Invalid rows are skipped and reported by line number. The whole
+    file is one transaction: a file that cannot be read to the end (e.g. a
+    ragged row) stores nothing, so the client can fix it and retry without
+    duplicating the chunks before it.
+    """
+    started = time.perf_counter()
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        if get_pool().dialect == "mssql":
+            cursor.fast_executemany = True
+
+        rows_read = inserted = chunks = 0
+        errors, error_count = [], 0
+        reader = pd.read_csv(
+            fileobj,
+            chunksize=chunk_size,
+            dtype=str,
+            keep_default_na=False,
+            skipinitialspace=True
+        )
+        for chunk in reader:
+            rows, chunk_errors = _validate_chunk(chunk, user_id, first_line=rows_read + 2)
+            if rows:
+                cursor.executemany(INSERT_EXPENSE_SQL, rows)
+            rows_read += len(chunk)
+            inserted += len(rows)
+            chunks += 1
+            error_count += len(chunk_errors)
+            errors.extend(chunk_errors[:max(MAX_REPORTED_ERRORS - len(errors), 0)])
+        conn.commit()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "user_id": user_id,
+            "rows_read": rows_read,
+            "inserted": inserted,
+            "rejected": error_count,
+            "errors": errors,
+            "errors_truncated": error_count > len(errors),
+            "chunks": chunks,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "rows_per_second": round(rows_read / elapsed, 1) if elapsed > 0 else None
+        }
+    except pd.errors.EmptyDataError:
+        raise ValueError("Error importing expenses: the uploaded file is empty")
+    except Exception as e:
+        raise ValueError(f"Error importing expenses: {str(e)}")
     finally:
         conn.close()
@@ -1,14 +1,36 @@
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
+from backend.utils.llm_gateway import get_gateway, extract_output_text
+from backend.utils.executors import run_blocking
+from backend.utils.retrieval import search_documents
 
 # Load environment variables
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# "local" searches the in-process index over vector_store/docs; "openai"
+# keeps using the hosted file_search tool against VECTOR_STORE_ID
+FILE_SEARCH_BACKEND = os.getenv("FILE_SEARCH_BACKEND", "local").lower()
 
-def search_finance_files(query: str):
+def format_matches(matches):
+    return "\n\n".join(
+        f"[{match['source']} p.{match['page']}] {match['text']}" for match in matches
+    )
+
+async def search_local_files(query: str, k: int = 5):
+    result = await run_blocking("search", search_documents, query, k)
+    return {
+        "query": query,
+        "results": format_matches(result["matches"]) or "No results found",
+        "matches": result["matches"],
+        "elapsed_ms": result["elapsed_ms"],
+        "source": "Local file index"
+    }
+
+async def search_finance_files(query: str):
     try:
+        if FILE_SEARCH_BACKEND != "openai":
+            return await search_local_files(query)
+
         # Get vector store ID and validate it
         vector_store_id = os.getenv("VECTOR_STORE_ID")
         if not vector_store_id or not vector_store_id.startswith("vs_"):
@@ -18,7 +40,7 @@ def search_finance_files(query: str):
                 "source": "File search"
             }
 
-        response = client.responses.create(
+        response = await get_gateway().create_response(
             model="gpt-4.1",
             tools=[{
                 "type": "file_search",
@@ -29,23 +51,13 @@ def search_finance_files(query: str):
         )
         
         # Extract text response and citations
-        if hasattr(response, 'output_text'):
+        text = extract_output_text(response)
+        if text:
             return {
                 "query": query,
-                "results": response.output_text,
+                "results": text,
                 "source": "File search"
             }
-            
-        # If output_text is not available, try to extract from message content
-        for output in response.output:
-            if output.type == "message":
-                for content in output.content:
-                    if content.type == "output_text":
-                        return {
-                            "query": query,
-                            "results": content.text,
-                            "source": "File search"
-                        }
         
         return {
             "query": query,
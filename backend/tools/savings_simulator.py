@@ -0,0 +1,238 @@
+import os
+import time
+from collections import namedtuple
+from datetime import date
+from backend.utils.database import get_db_connection
+from backend.utils.lazy import LazyModule
+
+np = LazyModule("numpy")
+
+DEFAULT_SIM_PATHS = int(os.getenv("SIM_PATHS", "10000"))
+MAX_SIM_PATHS = int(os.getenv("SIM_MAX_PATHS", "50000"))
+MAX_SIM_MONTHS = int(os.getenv("SIM_MAX_MONTHS", "120"))
+SIM_HISTORY_MONTHS = int(os.getenv("SIM_HISTORY_MONTHS", "12"))
+PERCENTILES = (10, 25, 50, 75, 90)
+DAYS_PER_MONTH = 365.25 / 12
+
+# Everything ``simulate_user_savings`` reads from the database
+SpendingInputs = namedtuple("SpendingInputs", ["today", "months", "categories", "history", "budgets"])
+
+
+def add_months(day: date, count: int) -> date:
+    """First day of the month ``count`` months after ``day``'s month"""
+    years, month = divmod(day.month - 1 + count, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def month_key(day: date) -> str:
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+def load_spend_history(user_id: int, history_months: int = SIM_HISTORY_MONTHS, today: date = None):
+    """Monthly spend per category over the last ``history_months`` complete months.
+
+    Returns ``(months, categories, matrix)`` where ``matrix[i, j]`` is the
+    spend in month ``i`` on category ``j`` (0 when nothing was spent).
+    Months before the user's first expense are left out so a new user's
+    history is not padded with empty months.
+    """
+    end = (today or date.today()).replace(day=1)
+    start = add_months(end, -history_months)
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT expense_month, category, SUM(amount)
+            FROM dbo.T_SNG_Expenses
+            WHERE user_id = ? AND expense_date >= ? AND expense_date < ?
+            GROUP BY expense_month, category
+        """, (user_id, start, end))
+        rows = cursor.fetchall()
+    except Exception as e:
+        raise ValueError(f"Error loading spending history: {str(e)}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+    if not rows:
+        return [], [], np.zeros((0, 0))
+    first = min(row[0] for row in rows)
+    months = []
+    month = date(int(first[:4]), int(first[5:7]), 1)
+    while month < end:
+        months.append(month_key(month))
+        month = add_months(month, 1)
+    categories = sorted({row[1] for row in rows})
+    month_index = {key: i for i, key in enumerate(months)}
+    category_index = {category: j for j, category in enumerate(categories)}
+    matrix = np.zeros((len(months), len(categories)))
+    for month, category, total in rows:
+        matrix[month_index[month], category_index[category]] = float(total)
+    return months, categories, matrix
+
+
+def load_monthly_budgets(user_id: int, today: date = None):
+    """Current budgets as a monthly amount per category (``{category: amount}``)"""
+    today = today or date.today()
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT category, amount, start_date, end_date
+            FROM dbo.T_SNG_Budgets
+            WHERE user_id = ? AND start_date <= ? AND end_date >= ?
+        """, (user_id, today, today))
+        rows = cursor.fetchall()
+    except Exception as e:
+        raise ValueError(f"Error loading budgets: {str(e)}")
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+    monthly = {}
+    for category, amount, start_date, end_date in rows:
+        days = (end_date - start_date).days + 1
+        # Overlapping budgets for one category: the most generous one applies
+        monthly[category] = max(monthly.get(category, 0.0), float(amount) * DAYS_PER_MONTH / days)
+    return monthly
+
+
+def simulate_savings(history, monthly_income: float, months: int = 12, current_savings: float = 0.0,
+                     income_growth: float = 0.0, income_volatility: float = 0.0,
+                     annual_return: float = 0.0, return_volatility: float = 0.0,
+                     budget_caps=None, fixed_spend: float = 0.0,
+                     paths: int = DEFAULT_SIM_PATHS, seed: int = None):
+    """Simulate ``paths`` savings balances over ``months`` as one array computation.
+
+    ``history`` is a ``(history_months, categories)`` spend matrix. Each
+    simulated month draws a whole historical month, so categories keep
+    their joint behaviour (a heavy travel month stays heavy everywhere).
+    ``budget_caps`` (one per category, ``inf`` for none) limits each
+    category before drawing. Returns a ``(paths, months)`` balance array:
+
+        balance[t] = balance[t-1] * (1 + return[t]) + income[t] - spend[t]
+
+    solved in closed form with cumulative products and sums rather than a
+    loop over months.
+    """
+    rng = np.random.default_rng(seed)
+    history = np.asarray(history, dtype=np.float64)
+    if history.size:
+        if budget_caps is not None:
+            history = np.minimum(history, budget_caps)
+        monthly_totals = history.sum(axis=1)
+        spend = monthly_totals[rng.integers(0, len(monthly_totals), size=(paths, months))]
+    else:
+        spend = np.zeros((paths, months))
+    if fixed_spend:
+        spend += fixed_spend
+
+    elapsed_years = np.arange(1, months + 1) / 12
+    income = monthly_income * (1 + income_growth) ** elapsed_years
+    if income_volatility:
+        income = income * np.maximum(1 + income_volatility * rng.standard_normal((paths, months)), 0)
+    net = income - spend
+
+    monthly_return = (1 + annual_return) ** (1 / 12) - 1
+    if return_volatility:
+        returns = monthly_return + return_volatility / np.sqrt(12) * rng.standard_normal((paths, months))
+        returns = np.maximum(returns, -0.99)
+    else:
+        returns = np.full((1, months), monthly_return)
+    growth = np.cumprod(1 + returns, axis=1)
+    return growth * (current_savings + np.cumsum(net / growth, axis=1))
+
+
+def summarize_paths(balances, goal_amount: float, month_labels):
+    """Percentile trajectories and goal probabilities for simulated balances"""
+    trajectories = np.percentile(balances, PERCENTILES, axis=0)
+    reached = balances >= goal_amount
+    ever = reached.any(axis=1)
+    first_month = reached.argmax(axis=1) + 1
+    final = balances[:, -1]
+    return {
+        "months": month_labels,
+        "probability_of_goal": round(float((final >= goal_amount).mean()), 4),
+        "probability_reached_anytime": round(float(ever.mean()), 4),
+        "goal_probability_by_month": np.round(reached.mean(axis=0), 4).tolist(),
+        "median_months_to_goal": float(np.median(first_month[ever])) if ever.any() else None,
+        "final_balance": {
+            **{f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, trajectories[:, -1])},
+            "mean": round(float(final.mean()), 2),
+        },
+        "percentiles": {
+            f"p{p}": np.round(row, 2).tolist() for p, row in zip(PERCENTILES, trajectories)
+        },
+    }
+
+
+def load_user_spending(user_id: int, history_months: int = SIM_HISTORY_MONTHS, today: date = None):
+    """The spend history and current budgets a simulation runs on, as ``SpendingInputs``"""
+    today = today or date.today()
+    months, categories, history = load_spend_history(user_id, history_months, today)
+    return SpendingInputs(today, months, categories, history, load_monthly_budgets(user_id, today))
+
+
+def simulate_user_savings(user_id: int, goal_amount: float, monthly_income: float, months: int = 12,
+                          current_savings: float = 0.0, income_growth: float = 0.0,
+                          income_volatility: float = 0.0, annual_return: float = 0.0,
+                          return_volatility: float = 0.0, respect_budgets: bool = False,
+                          history_months: int = SIM_HISTORY_MONTHS, paths: int = None,
+                          seed: int = None, today: date = None, inputs: SpendingInputs = None):
+    """Will the user reach ``goal_amount`` in ``months``? Monte Carlo over their own spending.
+
+    Monthly spend is bootstrapped from the user's expense history. Budgeted
+    categories with no history count at their budget; with
+    ``respect_budgets`` every budgeted category is also capped at its budget.
+    ``inputs`` from ``load_user_spending`` skips the queries, so callers can
+    read on the db pool and simulate on the cpu pool.
+    """
+    paths = paths or DEFAULT_SIM_PATHS
+    if goal_amount <= 0:
+        raise ValueError("goal_amount must be positive")
+    if monthly_income < 0:
+        raise ValueError("monthly_income cannot be negative")
+    if not 1 <= months <= MAX_SIM_MONTHS:
+        raise ValueError(f"months must be between 1 and {MAX_SIM_MONTHS}")
+    if not 100 <= paths <= MAX_SIM_PATHS:
+        raise ValueError(f"paths must be between 100 and {MAX_SIM_PATHS}")
+    if min(income_volatility, return_volatility) < 0:
+        raise ValueError("Volatilities cannot be negative")
+
+    inputs = inputs or load_user_spending(user_id, history_months, today)
+    today, history_labels, categories, history, budgets = inputs
+    if not categories and not budgets:
+        raise ValueError("No expense history or current budgets to simulate from")
+
+    # Planned spending in budgeted categories the history has not seen yet
+    fixed_spend = sum(amount for category, amount in budgets.items() if category not in categories)
+    caps = None
+    if respect_budgets and categories:
+        caps = np.array([budgets.get(category, np.inf) for category in categories])
+
+    started = time.perf_counter()
+    balances = simulate_savings(
+        history, monthly_income, months, current_savings, income_growth, income_volatility,
+        annual_return, return_volatility, caps, fixed_spend, paths, seed
+    )
+    start = today.replace(day=1)
+    result = summarize_paths(balances, goal_amount, [month_key(add_months(start, i + 1)) for i in range(months)])
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    average_spend = float(history.sum(axis=1).mean()) if history.size else 0.0
+    return {
+        "user_id": user_id,
+        "goal_amount": goal_amount,
+        "monthly_income": monthly_income,
+        "current_savings": current_savings,
+        "paths": paths,
+        "history": {
+            "months": history_labels,
+            "categories": categories,
+            "average_monthly_spend": round(average_spend + fixed_spend, 2),
+            "monthly_budgets": {category: round(amount, 2) for category, amount in budgets.items()},
+            "budgets_respected": bool(caps is not None),
+        },
+        **result,
+        "elapsed_ms": round(elapsed_ms, 2),
+    }
@@ -1,13 +1,287 @@
-import yfinance as yf
+import os
+import re
+import time
+from concurrent.futures import wait
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from backend.utils.cache import CacheEntry, TTLCache, SingleFlight
+from backend.utils.executors import get_executor
+from backend.utils.lazy import LazyModule
+from backend.utils.metrics import instrument, register_cache
+from backend.utils.upstream import get_upstream
+
+# yfinance pulls in pandas and friends; import it on the first fetch, not at startup
+yf = LazyModule("yfinance")
+
+MARKET_TZ = ZoneInfo("America/New_York")
+
+# Quotes move every second while the market is open but not at all after close
+QUOTE_TTL_MARKET_HOURS = float(os.getenv("QUOTE_TTL_MARKET_HOURS", "15"))
+QUOTE_TTL_AFTER_HOURS = float(os.getenv("QUOTE_TTL_AFTER_HOURS", "900"))
+
+# Plain symbols plus share-class suffixes such as BRK.B or BF-B
+TICKER_PATTERN = re.compile(r"^[A-Z]{1,5}([.-][A-Z]{1,2})?$")
+MAX_BATCH_TICKERS = int(os.getenv("MAX_BATCH_TICKERS", "50"))
+
+_quote_cache = TTLCache(max_entries=int(os.getenv("QUOTE_CACHE_SIZE", "512")))
+_quote_flight = SingleFlight()
+register_cache("quotes", _quote_cache.stats)
+
+# A listing's trading currency practically never changes; a failed lookup is
+# answered with USD and only retried after CURRENCY_RETRY_TTL
+CURRENCY_TTL = float(os.getenv("QUOTE_CURRENCY_TTL", "86400"))
+CURRENCY_RETRY_TTL = float(os.getenv("QUOTE_CURRENCY_RETRY_TTL", "300"))
+_currency_cache = TTLCache(max_entries=int(os.getenv("QUOTE_CACHE_SIZE", "512")))
+
+
+def quote_ttl(now=None):
+    """Cache lifetime for a quote fetched at ``now`` (NYSE regular hours aware)"""
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    minutes = now.hour * 60 + now.minute
+    if now.weekday() < 5 and 9 * 60 + 30 <= minutes < 16 * 60:
+        return QUOTE_TTL_MARKET_HOURS
+    return QUOTE_TTL_AFTER_HOURS
+
+
+def normalize_ticker(symbol: str) -> str:
+    """Clean up a user-supplied symbol, raising ValueError if it is not one"""
+    ticker = symbol.strip().upper()
+    if not TICKER_PATTERN.match(ticker):
+        raise ValueError(
+            f"Invalid stock symbol format: {ticker}. Should be 1-5 letters, "
+            "optionally followed by a class suffix like BRK.B."
+        )
+    return ticker
+
+
+def yahoo_symbol(ticker: str) -> str:
+    """Yahoo writes share classes with a dash (BRK-B) rather than a dot"""
+    return ticker.replace(".", "-")
+
+
+def fetch_currency(ticker: str, stock=None) -> str:
+    """Trading currency of a ticker from yfinance ``fast_info``"""
+    try:
+        currency = (stock or yf.Ticker(yahoo_symbol(ticker))).fast_info["currency"]
+    except KeyError:
+        currency = None
+    if not currency:
+        # Yahoo answered without one; not worth retrying
+        raise ValueError(f"No currency found for symbol {ticker}")
+    return currency
+
+
+def ticker_currency(ticker: str, stock=None) -> str:
+    """Trading currency of a ticker, cached per ticker.
+
+    Both the single and the batch quote paths take the currency from here,
+    so a cached quote's currency does not depend on which path fetched it.
+    Without ``stock`` the lookup goes through the yahoo upstream policy.
+    With it the caller is already inside one (``fetch_quote``). A failed
+    lookup answers USD and is cached for ``CURRENCY_RETRY_TTL`` only.
+    """
+    entry = _currency_cache.get(ticker)
+    if entry is not None:
+        return entry.value
+    try:
+        if stock is not None:
+            currency = fetch_currency(ticker, stock)
+        else:
+            currency = get_upstream("yahoo").call(fetch_currency, ticker, stale_key=f"currency:{ticker}").value
+        ttl = CURRENCY_TTL
+    except Exception:
+        currency, ttl = "USD", CURRENCY_RETRY_TTL
+    _currency_cache.set(ticker, currency, ttl)
+    return currency
+
+
+def ticker_currencies(tickers):
+    """``{ticker: currency}``, looking up the uncached ones side by side.
+
+    The lookups run on the shared "market_info" pool rather than "market":
+    a batch quote waiting on them from a "market" thread cannot then starve
+    its own pool.
+    """
+    unknown = [ticker for ticker in tickers if _currency_cache.get(ticker) is None]
+    if len(unknown) > 1:
+        executor = get_executor("market_info")
+        wait([executor.submit(ticker_currency, ticker) for ticker in unknown])
+    return {ticker: ticker_currency(ticker) for ticker in tickers}
+
+
+@instrument("yfinance.fetch_quote")
+def fetch_quote(ticker: str):
+    """Fetch the latest close for one ticker with a single history call"""
+    stock = yf.Ticker(yahoo_symbol(ticker))
+    history = stock.history(period="1d")
+    if history.empty:
+        raise ValueError(f"No price data found for symbol {ticker}")
+
+    return {
+        "price": float(history["Close"].iloc[-1]),
+        "currency": ticker_currency(ticker, stock)
+    }
+
+
+def get_quote(ticker: str):
+    """Return a cached quote, fetching it at most once per TTL per ticker.
+
+    Concurrent misses for the same ticker share one upstream fetch. The
+    result carries ``cache`` metadata: whether it was a hit and its age.
+    """
+    ticker = normalize_ticker(ticker)
+    entry = _quote_cache.get(ticker)
+    hit = entry is not None
+    if not hit:
+        def load():
+            # A leader that finished just before this miss became one has
+            # already cached the quote
+            cached = _quote_cache.get(ticker)
+            if cached is not None:
+                return cached
+            result = get_upstream("yahoo").call(fetch_quote, ticker, stale_key=ticker)
+            if result.stale:
+                return _stale_entry(result)
+            return _quote_cache.set(ticker, result.value, quote_ttl())
+        entry, _ = _quote_flight.do(ticker, load)
+
+    return _quote_result(ticker, entry, hit)
+
+
+def _stale_entry(result):
+    """Wrap a last-known quote served while Yahoo is unavailable (not cached as fresh)"""
+    stored_at = time.time() - result.age_seconds
+    return CacheEntry(result.value, stored_at, stored_at)
+
+
+def _quote_result(ticker, entry, hit):
+    return {
+        "ticker": ticker,
+        **entry.value,
+        "cache": {
+            "hit": hit,
+            "stale": entry.expires_at <= entry.stored_at,
+            "age_seconds": round(time.time() - entry.stored_at, 3)
+        }
+    }
+
+
+@instrument("yfinance.fetch_quotes")
+def fetch_quotes(tickers):
+    """Fetch the latest close for many tickers with one bulk download.
+
+    Returns ``(quotes, errors)`` dicts keyed by ticker. The quotes carry no
+    currency yet; ``get_quotes`` adds it from ``ticker_currencies``.
+    """
+    symbols = {yahoo_symbol(t): t for t in tickers}
+    data = yf.download(
+        list(symbols),
+        period="1d",
+        group_by="ticker",
+        progress=False,
+        threads=False
+    )
+    quotes, errors = {}, {}
+    for symbol, ticker in symbols.items():
+        try:
+            # Multi-ticker downloads are keyed (ticker, field); older releases
+            # return flat columns when only one ticker was requested
+            if hasattr(data.columns, "levels"):
+                closes = data[symbol]["Close"].dropna()
+            else:
+                closes = data["Close"].dropna()
+            if closes.empty:
+                raise ValueError(f"No price data found for symbol {ticker}")
+            quotes[ticker] = {"price": float(closes.iloc[-1])}
+        except KeyError:
+            errors[ticker] = f"No price data found for symbol {ticker}"
+        except ValueError as e:
+            errors[ticker] = str(e)
+    return quotes, errors
+
+
+def get_quotes(tickers):
+    """Return quotes for many tickers, fetching all cache misses in one bulk download.
+
+    Invalid symbols and tickers without data are reported per ticker in
+    ``errors`` instead of failing the whole batch.
+    """
+    if len(tickers) > MAX_BATCH_TICKERS:
+        raise ValueError(f"Too many tickers: {len(tickers)}. Maximum is {MAX_BATCH_TICKERS}.")
+
+    quotes, errors, misses = {}, {}, []
+    for symbol in tickers:
+        try:
+            ticker = normalize_ticker(symbol)
+        except ValueError as e:
+            errors[symbol] = str(e)
+            continue
+        if ticker in quotes or ticker in misses:
+            continue
+        entry = _quote_cache.get(ticker)
+        if entry is not None:
+            quotes[ticker] = _quote_result(ticker, entry, True)
+        else:
+            misses.append(ticker)
+
+    if misses:
+        yahoo = get_upstream("yahoo")
+        try:
+            fetched, fetch_errors = yahoo.call(fetch_quotes, misses).value
+        except Exception as e:
+            # Fall back to the last good quote per ticker while Yahoo is down
+            fetched, fetch_errors = {}, {}
+            for ticker in misses:
+                last_good = yahoo.last_good(ticker)
+                if last_good is not None:
+                    quotes[ticker] = _quote_result(ticker, _stale_entry(last_good), False)
+                else:
+                    fetch_errors[ticker] = str(e)
+        ttl = quote_ttl()
+        currencies = ticker_currencies(list(fetched))
+        for ticker, quote in fetched.items():
+            quote["currency"] = currencies[ticker]
+            yahoo.remember(ticker, quote)
+            quotes[ticker] = _quote_result(ticker, _quote_cache.set(ticker, quote, ttl), False)
+        errors.update(fetch_errors)
+
+    return {"quotes": quotes, "errors": errors}
+
+
+def quote_cache_stats():
+    return {**_quote_cache.stats(), "coalesced": _quote_flight.coalesced}
+
 
 def get_stock_price(ticker: str):
     try:
-        stock = yf.Ticker(ticker)
-        price = stock.history(period="1d")["Close"].iloc[-1]
+        quote = get_quote(ticker)
         return {
-            "ticker": ticker.upper(),
-            "price": round(price, 2),
-            "currency": "USD"
+            "ticker": quote["ticker"],
+            "price": round(quote["price"], 2),
+            "currency": quote["currency"],
+            "cache": quote["cache"]
         }
     except Exception as e:
         return {"error": str(e)}
+
+
+def get_stock_prices(tickers):
+    try:
+        result = get_quotes(tickers)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    quotes = [
+        {
+            "ticker": quote["ticker"],
+            "price": round(quote["price"], 2),
+            "currency": quote["currency"],
+            "cache": quote["cache"]
+        }
+        for quote in result["quotes"].values()
+    ]
+    return {
+        "quotes": quotes,
+        "errors": result["errors"],
+        "count": len(quotes)
+    }
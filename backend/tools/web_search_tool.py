@@ -1,15 +1,12 @@
-from openai import OpenAI
-import os
 from dotenv import load_dotenv
+from backend.utils.llm_gateway import get_gateway, extract_output_text
 
 # Load environment variables
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def search_financial_news(query: str):
+async def search_financial_news(query: str):
     try:
-        response = client.responses.create(
+        response = await get_gateway().create_response(
             model="gpt-4.1",
             tools=[{
                 "type": "web_search_preview",
@@ -26,23 +23,13 @@ def search_financial_news(query: str):
         )
         
         # Extract text response and citations
-        if hasattr(response, 'output_text'):
+        text = extract_output_text(response)
+        if text:
             return {
                 "query": query,
-                "results": response.output_text,
+                "results": text,
                 "source": "Web search"
             }
-            
-        # If output_text is not available, try to extract from message content
-        for output in response.output:
-            if output.type == "message" and hasattr(output, "content"):
-                for content in output.content:
-                    if content.type == "output_text":
-                        return {
-                            "query": query,
-                            "results": content.text,
-                            "source": "Web search"
-                        }
         
         return {
             "query": query,
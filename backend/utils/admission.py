@@ -0,0 +1,338 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from backend.utils.metrics import Counter, Gauge, Histogram
+
+# Load environment variables
+load_dotenv()
+
+# Lower priority values are served first. ``cost`` is what one request takes
+# from the caller's bucket and the global bucket, roughly in proportion to
+# the upstream quota it spends; ``queue_timeout`` is the longest it waits
+# for a slot before giving up.
+Lane = namedtuple("Lane", ["priority", "cost", "queue_timeout"])
+
+DEFAULT_LANES = {
+    "quote": Lane(0, 1, 5.0),
+    "search": Lane(1, 3, 15.0),
+    "agent": Lane(2, 5, 30.0),
+}
+
+QUEUE_DEPTH = Gauge("finbot_admission_queue_depth", "Requests waiting for an admission slot", ("lane",))
+QUEUE_WAIT = Histogram(
+    "finbot_admission_wait_seconds", "Time from arrival to admission, zero when a slot was free", ("lane",)
+)
+ADMITTED_IN_FLIGHT = Gauge("finbot_admission_in_flight", "Admitted requests holding a slot", ("lane",))
+REJECTED = Counter(
+    "finbot_admission_rejected_total", "Requests turned away by admission control", ("lane", "reason")
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of admitting a request; carries the status and Retry-After to send"""
+
+    def __init__(self, message, reason, retry_after, status_code=429):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+    @property
+    def headers(self):
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class TokenBucket:
+    """``rate`` tokens a second, holding at most ``burst``"""
+
+    __slots__ = ("rate", "burst", "_tokens", "_updated", "_clock")
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, cost=1):
+        """Take ``cost`` tokens; returns 0.0, or the seconds until they would be there"""
+        self._refill()
+        cost = min(cost, self.burst)
+        if self._tokens >= cost:
+            self._tokens -= cost
+            return 0.0
+        return (cost - self._tokens) / self.rate
+
+    def refund(self, cost=1):
+        self._tokens = min(self.burst, self._tokens + cost)
+
+    @property
+    def tokens(self):
+        self._refill()
+        return self._tokens
+
+
+class Ticket:
+    """An admitted request's slot; ``release`` may be called more than once"""
+
+    __slots__ = ("_controller", "lane", "_started", "_released")
+
+    def __init__(self, controller, lane):
+        self._controller = controller
+        self.lane = lane
+        self._started = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._finish(self.lane, time.perf_counter() - self._started)
+
+
+class AdmissionController:
+    """Rate limits and a bounded priority queue in front of expensive endpoints.
+
+    A request first takes tokens from its caller's bucket and then from one
+    global bucket; either running dry is an immediate 429 with the time until
+    the tokens come back as ``Retry-After``. Admitted requests share
+    ``max_concurrency`` slots, of which ``reserved_slots`` are kept for the
+    highest-priority lane. When no slot is free they wait in one queue,
+    ordered by lane priority and then arrival, for at most their lane's
+    ``queue_timeout`` (503 after that). With ``max_queue`` waiters, a new
+    request is turned away with 429 unless it outranks the lowest-priority
+    waiter, which is shed in its place. Cheap quote lookups therefore still
+    get a slot while agent calls hold every other one; agent calls bound
+    their own wait with the deadline rather than starving silently.
+
+    The controller is used from the event loop only, so it needs no locks.
+    A ``rate`` of ``None`` turns that bucket off.
+    """
+
+    def __init__(self, max_concurrency=32, max_queue=128, user_rate=2.0, user_burst=30.0,
+                 global_rate=50.0, global_burst=200.0, max_users=10000, lanes=None, reserved_slots=4,
+                 clock=time.monotonic):
+        if not 0 <= reserved_slots < max_concurrency:
+            raise ValueError("reserved_slots must be below max_concurrency")
+        self.max_concurrency = max_concurrency
+        self.reserved_slots = reserved_slots
+        self.max_queue = max_queue
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self.lanes = dict(lanes or DEFAULT_LANES)
+        self._top_priority = min(lane.priority for lane in self.lanes.values())
+        self._clock = clock
+        self._global = TokenBucket(global_rate, global_burst, clock) if global_rate else None
+        self._users = OrderedDict()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._queued = {lane: 0 for lane in self.lanes}
+        self._in_flight = 0
+        # Smoothed time a request holds its slot, for Retry-After estimates
+        self._service_seconds = 1.0
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "shed": 0,
+            "rejected_user_rate": 0,
+            "rejected_global_rate": 0,
+            "rejected_queue_full": 0,
+            "rejected_deadline": 0,
+        }
+
+    def _user_bucket(self, key):
+        if not self.user_rate:
+            return None
+        bucket = self._users.get(key)
+        if bucket is None:
+            bucket = self._users[key] = TokenBucket(self.user_rate, self.user_burst, self._clock)
+            if len(self._users) > self.max_users:
+                # The least recently seen caller has long since refilled anyway
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(key)
+        return bucket
+
+    def _reject(self, lane, reason, retry_after, status_code=429):
+        self._stats[f"rejected_{reason}"] += 1
+        REJECTED.labels(lane, reason).inc()
+        message = {
+            "user_rate": "Too many requests from this client",
+            "global_rate": "The service is at its request limit",
+            "queue_full": "Too many requests are waiting",
+            "deadline": "Timed out waiting for capacity",
+        }[reason]
+        return AdmissionRejected(message, reason, retry_after, status_code)
+
+    def _slot_limit(self, settings):
+        """How many slots may be in use for a request of this lane to take one"""
+        if settings.priority == self._top_priority:
+            return self.max_concurrency
+        return self.max_concurrency - self.reserved_slots
+
+    def _queue_wait_estimate(self, position):
+        return self._service_seconds * position / self.max_concurrency
+
+    def _lowest_waiter(self):
+        """The live waiter that would be served last"""
+        live = [entry for entry in self._queue if not entry[2].done()]
+        return max(live, default=None)
+
+    async def acquire(self, key, lane="agent", timeout=None):
+        """Admit one request from caller ``key``; returns a ``Ticket`` to release"""
+        settings = self.lanes[lane]
+        arrived = time.perf_counter()
+        user_bucket = self._user_bucket(key)
+        if user_bucket is not None:
+            wait = user_bucket.take(settings.cost)
+            if wait:
+                raise self._reject(lane, "user_rate", wait)
+
+        queued = sum(self._queued.values())
+        slot_free = self._in_flight < self._slot_limit(settings)
+        shed = None
+        if not slot_free and queued >= self.max_queue:
+            shed = self._lowest_waiter()
+            if shed is None or shed[0] <= settings.priority:
+                if user_bucket is not None:
+                    user_bucket.refund(settings.cost)
+                raise self._reject(lane, "queue_full", self._queue_wait_estimate(queued + 1))
+
+        if self._global is not None:
+            wait = self._global.take(settings.cost)
+            if wait:
+                if user_bucket is not None:
+                    user_bucket.refund(settings.cost)
+                raise self._reject(lane, "global_rate", wait)
+
+        if shed is not None:
+            self._remove(shed)
+            self._stats["shed"] += 1
+            shed[2].set_exception(self._reject(shed[3], "queue_full", self._queue_wait_estimate(queued)))
+
+        if slot_free:
+            self._in_flight += 1
+        else:
+            await self._wait_for_slot(settings, lane, timeout)
+        self._stats["admitted"] += 1
+        QUEUE_WAIT.labels(lane).observe(time.perf_counter() - arrived)
+        ADMITTED_IN_FLIGHT.labels(lane).inc()
+        return Ticket(self, lane)
+
+    async def _wait_for_slot(self, settings, lane, timeout):
+        future = asyncio.get_running_loop().create_future()
+        entry = (settings.priority, next(self._sequence), future, lane)
+        heapq.heappush(self._queue, entry)
+        self._queued[lane] += 1
+        self._stats["queued"] += 1
+        QUEUE_DEPTH.labels(lane).inc()
+        try:
+            done, _ = await asyncio.wait((future,), timeout=timeout or settings.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+        if not done:
+            self._abandon(entry)
+            raise self._reject(lane, "deadline", self._queue_wait_estimate(sum(self._queued.values()) + 1), 503)
+        # Raises AdmissionRejected if a higher-priority request shed this one
+        future.result()
+
+    def _remove(self, entry):
+        self._queued[entry[3]] -= 1
+        QUEUE_DEPTH.labels(entry[3]).dec()
+
+    def _abandon(self, entry):
+        future = entry[2]
+        if not future.done():
+            self._remove(entry)
+            future.cancel()
+        elif not future.cancelled() and future.exception() is None:
+            # The slot was handed over just as the waiter gave up; pass it on
+            self._hand_over()
+
+    def _hand_over(self):
+        """Give a finished request's slot to the next live waiter it is open to"""
+        self._in_flight -= 1
+        while self._queue:
+            entry = self._queue[0]
+            future = entry[2]
+            if future.done() or future.get_loop().is_closed():
+                heapq.heappop(self._queue)
+                continue
+            if self._in_flight >= self._slot_limit(self.lanes[entry[3]]):
+                # Only a reserved slot is free; leave it for the top lane
+                return
+            heapq.heappop(self._queue)
+            self._remove(entry)
+            self._in_flight += 1
+            future.set_result(None)
+            return
+
+    def _finish(self, lane, held_seconds):
+        self._service_seconds = 0.8 * self._service_seconds + 0.2 * held_seconds
+        ADMITTED_IN_FLIGHT.labels(lane).dec()
+        self._hand_over()
+
+    @asynccontextmanager
+    async def slot(self, key, lane="agent", timeout=None):
+        """``async with`` form of ``acquire``"""
+        ticket = await self.acquire(key, lane, timeout)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "reserved_slots": self.reserved_slots,
+            "in_flight": self._in_flight,
+            "max_queue": self.max_queue,
+            "queue_depth": dict(self._queued),
+            "avg_service_ms": round(self._service_seconds * 1000, 2),
+            "tracked_clients": len(self._users),
+            "global_tokens": round(self._global.tokens, 2) if self._global is not None else None,
+            **self._stats,
+        }
+
+
+_admission = None
+
+
+def _env_rate(name, default):
+    value = float(os.getenv(name, default))
+    return value or None
+
+
+def get_admission():
+    """Return the process-wide admission controller, creating it on first use"""
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController(
+            max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "128")),
+            reserved_slots=int(os.getenv("ADMISSION_RESERVED_SLOTS", "4")),
+            user_rate=_env_rate("ADMISSION_USER_RATE", "2"),
+            user_burst=float(os.getenv("ADMISSION_USER_BURST", "30")),
+            global_rate=_env_rate("ADMISSION_GLOBAL_RATE", "50"),
+            global_burst=float(os.getenv("ADMISSION_GLOBAL_BURST", "200")),
+        )
+    return _admission
+
+
+def configure_admission(controller):
+    """Replace the process-wide controller (used by tests and load tests)"""
+    global _admission
+    _admission = controller
+    return controller
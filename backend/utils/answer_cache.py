@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from backend.utils.cache import AsyncSingleFlight, TTLCache
+from backend.utils.lazy import LazyModule
+from backend.utils.metrics import register_cache
+from backend.utils.retrieval import HashingEmbedding
+
+# Load environment variables
+load_dotenv()
+
+np = LazyModule("numpy")
+
+# How long an answer stays valid depends on what it is about: market news
+# and prices go stale in minutes, general money advice barely at all
+QUERY_CLASS_TTLS = {
+    "market": float(os.getenv("AGENT_CACHE_TTL_MARKET", "300")),
+    "documents": float(os.getenv("AGENT_CACHE_TTL_DOCUMENTS", "3600")),
+    "general": float(os.getenv("AGENT_CACHE_TTL_GENERAL", "86400")),
+}
+QUERY_CLASS_PATTERNS = [
+    ("market", re.compile(
+        r"\b(price|prices|quote|stock|stocks|shares?|market|markets|index|nasdaq|dow|s&p|"
+        r"news|today|latest|current|now|rate|rates|exchange|crypto|bitcoin|earnings|fed|inflation)\b"
+    )),
+    ("documents", re.compile(r"\b(my|our|budget|budgets|expense|expenses|report|spent|spending)\b")),
+]
+# Semantic matches are only trusted where answers do not hinge on the exact
+# ticker, amount or date in the question
+SEMANTIC_CLASSES = ("general", "documents")
+SEMANTIC_THRESHOLD = float(os.getenv("AGENT_CACHE_SIMILARITY", "0.85"))
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+# Question scaffolding that carries no topic; dropped before embedding so
+# "how can I save money" and "tips to save money" land close together
+STOPWORDS = frozenset("""
+    a about an and any are can could do does explain for give good have how i
+    i'm is it me please should some tell the there tips to use ways what whats
+    when which with would you your best way
+""".split())
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.sub(r"[^\w\s$%&.]", " ", query.lower()).replace(".", " ").split())
+
+
+def topic_text(normalized: str) -> str:
+    """The content words of a normalized query, used for similarity matching"""
+    return " ".join(word for word in normalized.split() if word not in STOPWORDS) or normalized
+
+
+def classify_query(query: str) -> str:
+    normalized = normalize_query(query)
+    for name, pattern in QUERY_CLASS_PATTERNS:
+        if pattern.search(normalized):
+            return name
+    return "general"
+
+
+def config_fingerprint(config) -> str:
+    """Stable hash of everything besides the query that shapes the answer (model, tools, instructions)"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class AnswerCache:
+    """Exact then semantic lookup of agent answers, with TTL per query class.
+
+    Exact keys are the normalized query plus the agent configuration
+    fingerprint. On an exact miss, the query embedding is compared against
+    cached queries of the same class and configuration, and an answer is
+    reused above ``threshold`` cosine similarity if the numbers in both
+    questions agree. Entries are evicted LRU beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries=1024, threshold=SEMANTIC_THRESHOLD, embedding_function=None, ttls=None):
+        self.threshold = threshold
+        self.ttls = dict(QUERY_CLASS_TTLS, **(ttls or {}))
+        self.embed = embedding_function or HashingEmbedding(256)
+        self._answers = TTLCache(max_entries=max_entries)
+        self._vectors = OrderedDict()  # key -> (vector, class, fingerprint, numbers)
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+        self._flight = AsyncSingleFlight()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+        self._by_class = {name: {"hits": 0, "misses": 0} for name in self.ttls}
+
+    def _key(self, normalized, fingerprint):
+        return f"{fingerprint}:{normalized}"
+
+    def lookup(self, query: str, config):
+        """Return ``(answer, how)`` with ``how`` in ``exact``/``semantic``, or ``(None, None)``"""
+        normalized = normalize_query(query)
+        query_class = classify_query(query)
+        fingerprint = config_fingerprint(config)
+
+        entry = self._answers.get(self._key(normalized, fingerprint))
+        if entry is not None:
+            self._record(query_class, "exact_hits")
+            return entry.value, "exact"
+
+        if query_class in SEMANTIC_CLASSES and self.threshold < 1:
+            answer = self._semantic_lookup(normalized, query_class, fingerprint)
+            if answer is not None:
+                self._record(query_class, "semantic_hits")
+                return answer, "semantic"
+
+        self._record(query_class, "misses")
+        return None, None
+
+    def _semantic_lookup(self, normalized, query_class, fingerprint):
+        vector = self.embed([topic_text(normalized)])[0]
+        numbers = set(_NUMBER.findall(normalized))
+        with self._lock:
+            if not self._vectors:
+                return None
+            if self._matrix is None:
+                self._matrix_keys = list(self._vectors)
+                self._matrix = np.stack([self._vectors[key][0] for key in self._matrix_keys])
+            similarities = self._matrix @ vector
+            keys = self._matrix_keys
+            candidates = [self._vectors.get(key) for key in keys]
+
+        for i in np.argsort(-similarities):
+            if similarities[i] < self.threshold:
+                break
+            candidate = candidates[i]
+            if candidate is None or candidate[1] != query_class or candidate[2] != fingerprint or candidate[3] != numbers:
+                continue
+            entry = self._answers.get(keys[i])
+            if entry is not None:
+                return entry.value
+        return None
+
+    def store(self, query: str, config, answer):
+        normalized = normalize_query(query)
+        query_class = classify_query(query)
+        fingerprint = config_fingerprint(config)
+        key = self._key(normalized, fingerprint)
+        self._answers.set(key, answer, self.ttls[query_class])
+        vector = self.embed([topic_text(normalized)])[0] if query_class in SEMANTIC_CLASSES else None
+        with self._lock:
+            self._stats["stores"] += 1
+            if vector is not None:
+                self._vectors[key] = (vector, query_class, fingerprint, set(_NUMBER.findall(normalized)))
+                self._vectors.move_to_end(key)
+                while len(self._vectors) > self._answers.max_entries:
+                    self._vectors.popitem(last=False)
+                self._matrix = None
+
+    async def get_or_compute(self, query: str, config, compute):
+        """Serve from cache, or await ``compute()`` once for all identical concurrent queries.
+
+        ``compute`` returns ``(answer, cacheable)``. Returns ``(answer, how)``
+        where ``how`` is ``exact``, ``semantic``, ``shared`` or ``miss``.
+        """
+        answer, how = self.lookup(query, config)
+        if answer is not None:
+            return answer, how
+
+        async def run():
+            answer, cacheable = await compute()
+            if cacheable:
+                self.store(query, config, answer)
+            return answer
+
+        answer, shared = await self._flight.do(self._key(normalize_query(query), config_fingerprint(config)), run)
+        return answer, "shared" if shared else "miss"
+
+    def _record(self, query_class, outcome):
+        with self._lock:
+            self._stats[outcome] += 1
+            self._by_class[query_class]["misses" if outcome == "misses" else "hits"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._answers.clear()
+            self._vectors.clear()
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            by_class = {name: dict(counts) for name, counts in self._by_class.items()}
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        return {
+            **stats,
+            "coalesced": self._flight.coalesced,
+            "entries": len(self._answers),
+            "evictions": self._answers.evictions,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "by_class": by_class,
+        }
+
+
+_answer_cache = None
+
+
+def get_answer_cache() -> AnswerCache:
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache(max_entries=int(os.getenv("AGENT_CACHE_SIZE", "1024")))
+    return _answer_cache
+
+
+def configure_answer_cache(cache: AnswerCache):
+    global _answer_cache
+    _answer_cache = cache
+
+
+def _answer_cache_counts():
+    if _answer_cache is None:
+        return None
+    stats = _answer_cache.stats()
+    return {"hits": stats["exact_hits"] + stats["semantic_hits"], "misses": stats["misses"]}
+
+
+register_cache("agent_answers", _answer_cache_counts)
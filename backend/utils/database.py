@@ -1,199 +1,367 @@
-import pyodbc
 import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
 from dotenv import load_dotenv
+from backend.utils.migrations import apply_migrations, schema_is_current
 
 # Load environment variables
 load_dotenv()
 
-def get_db_connection():
-    """Create a connection to SQL Server"""
-    try:
-        # Try different connection approaches
-        connection_attempts = [
-            # Attempt 1: Using TCP/IP
-            {
-                'server': 'tcp:LAPTOP-F28H3QUD\\SQLEXPRESS01,1433',
-                'driver': 'SQL Server'
-            },
-            # Attempt 2: Using local server name
-            {
-                'server': 'LAPTOP-F28H3QUD\\SQLEXPRESS01',
-                'driver': 'SQL Server'
-            },
-            # Attempt 3: Using localhost
-            {
-                'server': '(local)\\SQLEXPRESS01',
-                'driver': 'SQL Server'
-            }
-        ]
+# Default SQL Server targets, tried in order until one accepts a connection
+DEFAULT_CONNECTION_ATTEMPTS = [
+    # Attempt 1: Using TCP/IP
+    {
+        'server': 'tcp:LAPTOP-F28H3QUD\\SQLEXPRESS01,1433',
+        'driver': 'SQL Server'
+    },
+    # Attempt 2: Using local server name
+    {
+        'server': 'LAPTOP-F28H3QUD\\SQLEXPRESS01',
+        'driver': 'SQL Server'
+    },
+    # Attempt 3: Using localhost
+    {
+        'server': '(local)\\SQLEXPRESS01',
+        'driver': 'SQL Server'
+    }
+]
+
+
+def get_connection_targets():
+    """Build the list of connection strings to try, in order"""
+    backend = os.getenv("DB_BACKEND", "mssql").lower()
+    if backend == "sqlite":
+        return [os.getenv("DB_SQLITE_PATH", "finance.db")]
+
+    database = os.getenv("DB_NAME", "FinanceBot")
+    if os.getenv("DB_SERVER"):
+        attempts = [{
+            'server': os.getenv("DB_SERVER"),
+            'driver': os.getenv("DB_DRIVER", "ODBC Driver 17 for SQL Server")
+        }]
+    else:
+        attempts = DEFAULT_CONNECTION_ATTEMPTS
+
+    targets = []
+    for attempt in attempts:
+        conn_str = (
+            f"DRIVER={{{attempt['driver']}}};"
+            f"SERVER={attempt['server']};"
+            f"DATABASE={database};"
+        )
+        if os.getenv("DB_USER"):
+            conn_str += f"UID={os.getenv('DB_USER')};PWD={os.getenv('DB_PASSWORD', '')};"
+        else:
+            conn_str += "Trusted_Connection=yes;"
+        targets.append(conn_str)
+    return targets
+
+
+def connect_odbc(target: str):
+    """Open a raw pyodbc connection"""
+    import pyodbc
+    return pyodbc.connect(target, timeout=int(os.getenv("DB_CONNECT_TIMEOUT", "5")))
+
+
+def connect_sqlite(target: str):
+    """Open a SQLite connection that stands in for SQL Server.
+
+    The database file is attached under the ``dbo`` schema name so the
+    ``dbo.T_SNG_*`` queries used against SQL Server run unchanged.
+    """
+    conn = sqlite3.connect(
+        ":memory:",
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False
+    )
+    conn.execute("ATTACH DATABASE ? AS dbo", (target,))
+    return conn
+
+
+# SQLite returns DATE columns as text unless told otherwise
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()[:10]))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+
+
+def mask_connection_string(conn_str: str) -> str:
+    """Hide credentials before a connection string is logged or reported"""
+    parts = []
+    for part in conn_str.split(";"):
+        if part.upper().startswith("PWD="):
+            part = "PWD=***"
+        parts.append(part)
+    return ";".join(parts)
+
 
+class PooledConnection:
+    """A checked-out connection; close() hands it back to the pool"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool.release(self._raw)
+
+    def discard(self):
+        """Drop the underlying connection instead of returning it to the pool"""
+        if not self._closed:
+            self._closed = True
+            self._pool.release(self._raw, broken=True)
+
+
+class ConnectionPool:
+    """Process-wide pool of warm database connections.
+
+    The pool remembers which target last accepted a connection and tries it
+    first, keeps at most ``max_size`` connections open, evicts connections
+    that sat idle longer than ``max_idle_seconds`` and runs a cheap health
+    check on connections that were idle longer than ``health_check_interval``.
+    """
+
+    def __init__(self, targets, connect=None, max_size=10, max_idle_seconds=300,
+                 health_check_interval=30, acquire_timeout=10, dialect="mssql"):
+        if not targets:
+            raise ValueError("At least one connection target is required")
+        self.targets = list(targets)
+        self.dialect = dialect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self._connect = connect or (connect_sqlite if dialect == "sqlite" else connect_odbc)
+        self._lock = threading.Condition()
+        self._idle = deque()  # (raw connection, last used timestamp)
+        self._size = 0
+        self._active_target = 0
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "evicted_idle": 0,
+            "failed_health_checks": 0,
+            "discarded": 0,
+            "connect_failures": 0,
+            "waits": 0,
+        }
+
+    def _open(self):
+        """Open a new connection, starting with the target that worked last"""
+        order = [self._active_target] + [
+            i for i in range(len(self.targets)) if i != self._active_target
+        ]
         last_error = None
-        for attempt in connection_attempts:
+        for index in order:
             try:
-                print(f"\nTrying connection with SERVER={attempt['server']}")
-                conn_str = (
-                    f"DRIVER={{{attempt['driver']}}};"
-                    f"SERVER={attempt['server']};"
-                    "DATABASE=FinanceBot;"
-                    "Trusted_Connection=yes;"
-                )
-                print(f"Connection string: {conn_str}")
-                conn = pyodbc.connect(conn_str)
-                print(f"Successfully connected using {attempt['server']}")
-                return conn
+                raw = self._connect(self.targets[index])
+                self._active_target = index
+                return raw
             except Exception as e:
-                print(f"Failed attempt with {attempt['server']}: {str(e)}")
                 last_error = e
+                self._stats["connect_failures"] += 1
                 continue
+        raise Exception(f"Failed to connect to database: {str(last_error)}")
 
-        if last_error:
-            raise last_error
+    def _is_healthy(self, raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Check out a connection, opening one if the pool has room"""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._lock:
+                self._evict_idle()
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    idle_for = time.monotonic() - last_used
+                elif self._size < self.max_size:
+                    self._size += 1
+                    raw = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Exception("Timed out waiting for a database connection")
+                    self._stats["waits"] += 1
+                    self._lock.wait(remaining)
+                    continue
+
+            if raw is None:
+                try:
+                    raw = self._open()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._stats["created"] += 1
+                return PooledConnection(self, raw)
+
+            if idle_for > self.health_check_interval and not self._is_healthy(raw):
+                self._close_raw(raw)
+                with self._lock:
+                    self._size -= 1
+                    self._stats["failed_health_checks"] += 1
+                continue
+
+            with self._lock:
+                self._stats["reused"] += 1
+            return PooledConnection(self, raw)
+
+    def release(self, raw, broken=False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if not broken:
+            try:
+                raw.rollback()
+            except Exception:
+                broken = True
+        if broken:
+            self._close_raw(raw)
+        with self._lock:
+            if broken:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._lock.notify()
+
+    def _evict_idle(self):
+        """Close connections that have been idle too long (caller holds the lock)"""
+        now = time.monotonic()
+        # The deque is ordered oldest-first because connections are appended on release
+        while self._idle and now - self._idle[0][1] > self.max_idle_seconds:
+            raw, _ = self._idle.popleft()
+            self._close_raw(raw)
+            self._size -= 1
+            self._stats["evicted_idle"] += 1
+
+    def close_all(self):
+        """Close every idle connection; checked-out ones close on release"""
+        with self._lock:
+            while self._idle:
+                raw, _ = self._idle.popleft()
+                self._close_raw(raw)
+                self._size -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "dialect": self.dialect,
+                "active_target": mask_connection_string(self.targets[self._active_target]),
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_connection_targets(),
+                    dialect="sqlite" if os.getenv("DB_BACKEND", "mssql").lower() == "sqlite" else "mssql",
+                    max_size=int(os.getenv("DB_POOL_SIZE", "10")),
+                    max_idle_seconds=float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+                    health_check_interval=float(os.getenv("DB_POOL_HEALTH_CHECK", "30")),
+                    acquire_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                )
+    return _pool
 
-    except Exception as e:
-        print(f"All connection attempts failed. Last error: {str(e)}")
-        raise Exception(f"Failed to connect to database: {str(e)}")
 
-def init_db():
-    """Initialize the database with required tables"""
+def configure_pool(pool):
+    """Replace the process-wide pool (used by tests and benchmarks)"""
+    global _pool, _schema_ready
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = pool
+        _schema_ready = False
+    return pool
+
+
+def get_db_connection():
+    """Check out a pooled database connection; close() returns it to the pool"""
+    return get_pool().acquire()
+
+
+# Set once the schema is known to be at LATEST_VERSION for the current pool
+_schema_ready = False
+
+
+def init_db(force=False):
+    """Initialize the database with required tables.
+
+    Skipped when the schema version marker already matches, so warm starts
+    and worker respawns do a single SELECT instead of the full DDL.
+    """
+    global _schema_ready
+    if _schema_ready and not force:
+        return False
     try:
         conn = get_db_connection()
+        if not force and schema_is_current(conn):
+            _schema_ready = True
+            return False
+
         cursor = conn.cursor()
-        
-        # First, ensure the database exists
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.databases WHERE name = 'FinanceBot')
-            BEGIN
-                CREATE DATABASE FinanceBot;
-            END
-        """)
-        conn.commit()
-        
-        # Switch to the FinanceBot database
-        cursor.execute("USE FinanceBot;")
-        
-        # Create Users table
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_Users')
-            BEGIN
-                CREATE TABLE dbo.T_SNG_Users (
-                    user_id INT IDENTITY(1,1) PRIMARY KEY,
-                    username VARCHAR(100) UNIQUE,
-                    email VARCHAR(255),
-                    password_hash VARCHAR(255)
-                )
-            END
-        """)
-
-        # Create Expenses table
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_Expenses')
-            BEGIN
-                CREATE TABLE dbo.T_SNG_Expenses (
-                    expense_id INT IDENTITY(1,1) PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    amount DECIMAL(10,2) NOT NULL,
-                    category VARCHAR(100),
-                    description VARCHAR(255),
-                    expense_date DATE
-                )
-            END
-        """)
-
-        # Create Budgets table
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_Budgets')
-            BEGIN
-                CREATE TABLE dbo.T_SNG_Budgets (
-                    budget_id INT IDENTITY(1,1) PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    category VARCHAR(100),
-                    amount DECIMAL(10,2),
-                    start_date DATE,
-                    end_date DATE
-                )
-            END
-        """)
-
-        # Add foreign key constraints if they don't exist
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.foreign_keys WHERE name = 'FK_Expenses_Users')
-            BEGIN
-                ALTER TABLE dbo.T_SNG_Expenses
-                ADD CONSTRAINT FK_Expenses_Users FOREIGN KEY (user_id)
-                REFERENCES dbo.T_SNG_Users(user_id)
-            END
-        """)
-
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.foreign_keys WHERE name = 'FK_Budgets_Users')
-            BEGIN
-                ALTER TABLE dbo.T_SNG_Budgets
-                ADD CONSTRAINT FK_Budgets_Users FOREIGN KEY (user_id)
-                REFERENCES dbo.T_SNG_Users(user_id)
-            END
-        """)
-
-        # Create views
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.views WHERE name = 'V_SNG_UserExpenses_L1')
-            BEGIN
-                EXEC('CREATE VIEW dbo.V_SNG_UserExpenses_L1 AS
-                SELECT
-                    e.expense_id,
-                    e.user_id,
-                    e.amount,
-                    e.category,
-                    e.description,
-                    e.expense_date,
-                    FORMAT(e.expense_date, ''yyyy-MM'') AS expense_month
-                FROM
-                    dbo.T_SNG_Expenses AS e')
-            END
-        """)
-
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.views WHERE name = 'V_SNG_ExpenseSummaryByCategory_L1')
-            BEGIN
-                EXEC('CREATE VIEW dbo.V_SNG_ExpenseSummaryByCategory_L1 AS
-                SELECT
-                    user_id,
-                    category,
-                    SUM(amount) AS total_amount,
-                    COUNT(*) AS entry_count
-                FROM
-                    dbo.T_SNG_Expenses
-                GROUP BY
-                    user_id, category')
-            END
-        """)
-
-        cursor.execute("""
-            IF NOT EXISTS (SELECT * FROM sys.views WHERE name = 'V_SNG_BudgetStatus_L1')
-            BEGIN
-                EXEC('CREATE VIEW dbo.V_SNG_BudgetStatus_L1 AS
-                SELECT
-                    b.user_id,
-                    b.category,
-                    b.amount AS budgeted_amount,
-                    SUM(e.amount) AS actual_spent,
-                    (b.amount - ISNULL(SUM(e.amount), 0)) AS remaining_amount,
-                    b.start_date,
-                    b.end_date
-                FROM
-                    dbo.T_SNG_Budgets AS b
-                LEFT JOIN
-                    dbo.T_SNG_Expenses AS e
-                    ON b.user_id = e.user_id
-                    AND b.category = e.category
-                    AND e.expense_date BETWEEN b.start_date AND b.end_date
-                GROUP BY
-                    b.user_id, b.category, b.amount, b.start_date, b.end_date')
-            END
-        """)
-
-        conn.commit()
-        print("Database and tables created successfully")
-        
+        dialect = get_pool().dialect
+
+        if dialect == "mssql":
+            # First, ensure the database exists
+            cursor.execute("""
+                IF NOT EXISTS (SELECT * FROM sys.databases WHERE name = 'FinanceBot')
+                BEGIN
+                    CREATE DATABASE FinanceBot;
+                END
+            """)
+            conn.commit()
+            
+            # Switch to the FinanceBot database
+            cursor.execute("USE FinanceBot;")
+
+        # Tables, views, triggers and indexes are versioned migrations
+        applied = apply_migrations(conn, dialect)
+        _schema_ready = True
+        print(f"Database and tables created successfully (applied migrations: {applied or 'none'})")
+        return True
+
     except Exception as e:
         print(f"Database initialization error: {str(e)}")
         raise e
@@ -201,4 +369,94 @@ def init_db():
         if 'cursor' in locals():
             cursor.close()
         if 'conn' in locals():
-            conn.close() 
\ No newline at end of file
+            conn.close()
+
+
+def reconcile_budget_totals(user_id=None, repair=True, sample_size=50, conn=None):
+    """Compare maintained budget totals with a full re-aggregation and fix drift.
+
+    The expected value uses the same matching rule as V_SNG_BudgetStatus_L1
+    (same user and category, expense date within the budget range) but is
+    computed per budget_id, so duplicate budgets are not merged. The repair
+    is one UPDATE that recomputes each drifted total as it writes it, so an
+    expense applied by the triggers after the drift was sampled is not
+    overwritten. Returns the number of budgets checked and drifted plus a
+    sample of the drift found.
+    """
+    owns_connection = conn is None
+    conn = conn or get_db_connection()
+    try:
+        cursor = conn.cursor()
+        user_filter = "WHERE b.user_id = ?" if user_id is not None else ""
+        params = (user_id,) if user_id is not None else ()
+
+        cursor.execute(f"SELECT COUNT(*) FROM dbo.T_SNG_Budgets AS b {user_filter}", params)
+        checked = cursor.fetchone()[0]
+
+        cursor.execute(f"""
+            SELECT
+                b.budget_id,
+                b.user_id,
+                b.category,
+                b.actual_spent,
+                COALESCE(SUM(e.amount), 0) AS expected_spent
+            FROM
+                dbo.T_SNG_Budgets AS b
+            LEFT JOIN
+                dbo.T_SNG_Expenses AS e
+                ON b.user_id = e.user_id
+                AND b.category = e.category
+                AND e.expense_date BETWEEN b.start_date AND b.end_date
+            {user_filter}
+            GROUP BY
+                b.budget_id, b.user_id, b.category, b.actual_spent
+            HAVING
+                b.actual_spent <> COALESCE(SUM(e.amount), 0)
+        """, params)
+        drift = [
+            {
+                "budget_id": row[0],
+                "user_id": row[1],
+                "category": row[2],
+                "actual_spent": float(row[3]),
+                "expected_spent": float(row[4])
+            }
+            for row in cursor.fetchall()
+        ]
+
+        drifted = len(drift)
+        if repair and drift:
+            expected = """(
+                SELECT COALESCE(SUM(e.amount), 0)
+                FROM dbo.T_SNG_Expenses AS e
+                WHERE e.user_id = T_SNG_Budgets.user_id
+                AND e.category = T_SNG_Budgets.category
+                AND e.expense_date BETWEEN T_SNG_Budgets.start_date AND T_SNG_Budgets.end_date
+            )"""
+            cursor.execute(f"""
+                UPDATE dbo.T_SNG_Budgets
+                SET actual_spent = {expected}
+                WHERE actual_spent <> {expected}{" AND user_id = ?" if user_id is not None else ""}
+            """, params)
+            drifted = cursor.rowcount
+            conn.commit()
+
+        return {
+            "checked": checked,
+            "drifted": drifted,
+            "repaired": drifted if repair else 0,
+            "drift": drift[:sample_size]
+        }
+    finally:
+        if owns_connection:
+            conn.close()
+
+
+if __name__ == "__main__":
+    # Nightly job: python -m backend.utils.database reconcile [--check-only]
+    import json
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "reconcile":
+        report = reconcile_budget_totals(repair="--check-only" not in sys.argv)
+        print(json.dumps(report, indent=2))
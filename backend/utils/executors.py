@@ -0,0 +1,120 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Thread budget per class of blocking tool, so a slow upstream in one class
+# cannot take the threads another class needs
+DEFAULT_POOL_SIZES = {
+    "db": 10,
+    "market": 8,
+    # Per-ticker listing lookups (currencies) fanned out by a batch quote
+    "market_info": 8,
+    "fx": 4,
+    "search": 4,
+    # Vectorized simulations and forecasts; numpy releases the GIL, so one
+    # thread per core keeps them off the db threads without oversubscribing
+    "cpu": os.cpu_count() or 2,
+}
+
+
+class InstrumentedExecutor:
+    """Thread pool for one tool class that records queue and run times"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"tool-{name}")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    def _run(self, submitted_at, fn, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            wait = started - submitted_at
+            self._queued -= 1
+            self._active += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                self._failed += failed
+                self._total_run += time.perf_counter() - started
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._queued += 1
+        return self._executor.submit(self._run, time.perf_counter(), fn, args, kwargs)
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._total_wait / completed * 1000, 3),
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+                "avg_run_ms": round(self._total_run / completed * 1000, 3),
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(tool_class: str) -> InstrumentedExecutor:
+    """Return the executor for a tool class, creating it on first use"""
+    executor = _executors.get(tool_class)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(tool_class)
+            if executor is None:
+                size = int(os.getenv(
+                    f"{tool_class.upper()}_POOL_SIZE",
+                    DEFAULT_POOL_SIZES.get(tool_class, 4)
+                ))
+                executor = InstrumentedExecutor(tool_class, size)
+                _executors[tool_class] = executor
+    return executor
+
+
+async def run_blocking(tool_class: str, fn, *args, **kwargs):
+    """Run a blocking tool call on its class's thread pool without stalling the event loop"""
+    future = get_executor(tool_class).submit(fn, *args, **kwargs)
+    return await asyncio.wrap_future(future)
+
+
+def executor_stats():
+    return {name: executor.stats() for name, executor in list(_executors.items())}
+
+
+def shutdown_executors(wait=True):
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=wait)
+        _executors.clear()
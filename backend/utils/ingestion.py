@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from backend.utils.retrieval import DOCS_DIR, HybridIndex, chunk_file, list_documents
+
+# Load environment variables
+load_dotenv()
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+OPENAI_MANIFEST_PATH = os.getenv("OPENAI_MANIFEST_PATH", "vector_store/openai_manifest.json")
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path: str):
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def plan_ingestion(documents, manifest):
+    """Split ``documents`` (source -> path) into work against the manifest.
+
+    A file whose size and mtime match its manifest entry is not even read.
+    One whose stat changed is hashed, and only re-processed if the content
+    hash changed too. Returns ``(to_process, removed, touched, unchanged)``;
+    ``touched`` maps sources whose stat changed but content did not to
+    their refreshed entries.
+    """
+    files = manifest["files"]
+    to_process, touched, unchanged = {}, {}, []
+    for source, path in documents.items():
+        stat = os.stat(path)
+        entry = files.get(source)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            unchanged.append(source)
+            continue
+        sha256 = file_digest(path)
+        if entry and entry["sha256"] == sha256:
+            touched[source] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            continue
+        to_process[source] = {
+            "path": path,
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "change": "changed" if entry else "added"
+        }
+    removed = sorted(set(files) - set(documents))
+    return to_process, removed, touched, unchanged
+
+
+class LocalIndexTarget:
+    """Ingest into the in-process HybridIndex; the manifest lives next to the index"""
+
+    name = "local"
+
+    def __init__(self, index: HybridIndex = None, manifest_path: str = None):
+        self.index = index or HybridIndex.load()
+        self.manifest_path = manifest_path or os.path.join(self.index.path, "manifest.json")
+
+    def process(self, source, path):
+        """Chunk and embed one file (runs on a worker thread)"""
+        chunks = chunk_file(path, source)
+        vectors = self.index.embed([chunk["text"] for chunk in chunks]) if chunks else None
+        return {"chunks": chunks, "vectors": vectors}
+
+    def commit(self, processed, removed, manifest):
+        if not processed and not removed:
+            return {}
+        self.index.update(
+            {source: result["chunks"] for source, result in processed.items()},
+            removed=removed,
+            embeddings={source: result["vectors"] for source, result in processed.items()}
+        )
+        self.index.save()
+        return {}
+
+    def entry(self, result):
+        return {"chunks": len(result["chunks"])}
+
+
+class OpenAIVectorStoreTarget:
+    """Ingest into a hosted OpenAI vector store (VECTOR_STORE_ID, or a new one)"""
+
+    name = "openai"
+
+    def __init__(self, client=None, vector_store_id: str = None, manifest_path: str = OPENAI_MANIFEST_PATH):
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = client
+        self.vector_store_id = vector_store_id or os.getenv("VECTOR_STORE_ID")
+        self.manifest_path = manifest_path
+
+    def process(self, source, path):
+        """Upload one file (runs on a worker thread)"""
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="assistants")
+        return {"file_id": uploaded.id}
+
+    def commit(self, processed, removed, manifest):
+        """Attach the new uploads, then delete the copies they replace.
+
+        Returns ``{source: error}`` for old copies that could not be deleted;
+        the new copy is attached either way.
+        """
+        store_id = manifest.get("vector_store_id") or self.vector_store_id
+        if not store_id or not store_id.startswith("vs_"):
+            store_id = self.client.vector_stores.create(name="FinanceDocsStore").id
+        manifest["vector_store_id"] = store_id
+
+        if processed:
+            self.client.vector_stores.file_batches.create_and_poll(
+                vector_store_id=store_id,
+                file_ids=[result["file_id"] for result in processed.values()]
+            )
+        # Old copies of changed files go once their replacements are attached
+        stale = list(removed) + [source for source in processed if source in manifest["files"]]
+        errors = {}
+        for source in stale:
+            file_id = manifest["files"][source].get("file_id")
+            if not file_id:
+                continue
+            try:
+                self.client.vector_stores.files.delete(vector_store_id=store_id, file_id=file_id)
+                self.client.files.delete(file_id)
+            except Exception as e:
+                errors[source] = f"Could not delete {file_id}: {str(e)}"
+        return errors
+
+    def entry(self, result):
+        return {"file_id": result["file_id"]}
+
+
+def ingest(docs_dir: str = DOCS_DIR, target=None, workers: int = INGEST_WORKERS):
+    """Bring ``target`` in line with the files under ``docs_dir``.
+
+    Only added and changed files are processed, on a pool of ``workers``
+    threads; deleted files are removed from the target. A file that fails
+    keeps its previous manifest entry so the next run retries it; an old
+    copy the target could not delete is reported under ``failed`` too. Running
+    twice on an unchanged corpus reads no file contents and writes nothing.
+    """
+    started = time.perf_counter()
+    target = target or LocalIndexTarget()
+    manifest = load_manifest(target.manifest_path)
+    to_process, removed, touched, unchanged = plan_ingestion(list_documents(docs_dir), manifest)
+
+    processed, errors = {}, {}
+    if to_process:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(to_process))), thread_name_prefix="ingest") as pool:
+            futures = {pool.submit(target.process, source, job["path"]): source for source, job in to_process.items()}
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    processed[source] = future.result()
+                except Exception as e:
+                    errors[source] = str(e)
+
+    if processed or removed:
+        errors.update(target.commit(processed, removed, manifest))
+    for source in removed:
+        del manifest["files"][source]
+    for source, result in processed.items():
+        job = to_process[source]
+        manifest["files"][source] = {
+            "sha256": job["sha256"],
+            "size": job["size"],
+            "mtime_ns": job["mtime_ns"],
+            "indexed_at": time.time(),
+            **target.entry(result)
+        }
+    manifest["files"].update(touched)
+    if processed or removed or touched or not os.path.exists(target.manifest_path):
+        save_manifest(target.manifest_path, manifest)
+
+    return {
+        "target": target.name,
+        "added": sorted(s for s in processed if to_process[s]["change"] == "added"),
+        "changed": sorted(s for s in processed if to_process[s]["change"] == "changed"),
+        "removed": removed,
+        "unchanged": len(unchanged) + len(touched),
+        "failed": errors,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
@@ -0,0 +1,257 @@
+import asyncio
+import os
+import time
+import httpx
+from dotenv import load_dotenv
+from backend.utils.metrics import ToolTimer
+from backend.utils.upstream import UpstreamUnavailable, get_upstream
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1")
+
+# Latency of the Responses API calls themselves, after the concurrency wait
+_llm_timer = ToolTimer("openai.responses")
+
+
+def is_upstream_failure(error):
+    """Whether an error counts against the OpenAI breaker.
+
+    Timeouts, connection errors, 429s and 5xx do; a 4xx means OpenAI answered
+    and the request itself was wrong.
+    """
+    if isinstance(error, (TimeoutError, httpx.TransportError)):
+        return True
+    from openai import APIConnectionError, APIStatusError
+
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class LLMGateway:
+    """Shared async entry point for every OpenAI Responses API call.
+
+    One keep-alive HTTP client is reused for all calls, a semaphore caps the
+    number of in-flight requests and each call gets a timeout. ``transport``
+    accepts any ``httpx.AsyncBaseTransport`` so the gateway can be pointed at
+    a local fake server or an in-process mock.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=8, timeout=60.0,
+                 max_connections=None, keepalive_expiry=30.0, transport=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_connections = max_connections or max_concurrency
+        self.keepalive_expiry = keepalive_expiry
+        self.transport = transport
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+        self._waiting = 0
+        self._in_flight = 0
+        self._stats = {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "rejected": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "total_call_ms": 0.0,
+        }
+
+    def _ensure_loop_state(self):
+        """Build the client and semaphore for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            from openai import AsyncOpenAI
+
+            http_client = httpx.AsyncClient(
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                timeout=self.timeout
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key or os.getenv("OPENAI_API_KEY"),
+                base_url=self.base_url or os.getenv("OPENAI_BASE_URL") or None,
+                http_client=http_client,
+                max_retries=0
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def _acquire_slot(self):
+        """Wait for a concurrency slot, recording how long the call queued.
+
+        Fails fast without queueing while the OpenAI circuit breaker is open.
+        The half-open trial is only claimed once the slot is held, so a caller
+        cancelled while queued cannot keep it.
+        """
+        breaker = get_upstream("openai").breaker
+        if breaker.state == breaker.OPEN:
+            self._stats["rejected"] += 1
+            raise UpstreamUnavailable("openai circuit breaker is open")
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        if not breaker.allow():
+            self._semaphore.release()
+            self._stats["rejected"] += 1
+            raise UpstreamUnavailable("openai circuit breaker is open")
+        wait_ms = (time.perf_counter() - queued_at) * 1000
+        self._stats["total_wait_ms"] += wait_ms
+        self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+        self._in_flight += 1
+        return _llm_timer.start()
+
+    def _release_slot(self, started, error=None):
+        breaker = get_upstream("openai").breaker
+        cancelled = isinstance(error, (asyncio.CancelledError, GeneratorExit))
+        if cancelled:
+            breaker.record_cancelled()
+        elif error is not None and is_upstream_failure(error):
+            breaker.record_failure()
+        else:
+            # Includes 4xx answers: a bad prompt says nothing about OpenAI's health
+            breaker.record_success()
+        self._in_flight -= 1
+        _llm_timer.finish(started, error is not None and not cancelled)
+        self._stats["calls"] += 1
+        self._stats["total_call_ms"] += (time.perf_counter() - started) * 1000
+        self._semaphore.release()
+
+    async def create_response(self, timeout=None, **kwargs):
+        """Call ``responses.create`` once a concurrency slot is free"""
+        client = self._ensure_loop_state()
+        kwargs.setdefault("model", DEFAULT_MODEL)
+        started = await self._acquire_slot()
+        error = None
+        try:
+            return await asyncio.wait_for(
+                client.responses.create(**kwargs),
+                timeout or self.timeout
+            )
+        except asyncio.TimeoutError as e:
+            error = e
+            self._stats["timeouts"] += 1
+            raise TimeoutError(f"LLM call timed out after {timeout or self.timeout}s")
+        except asyncio.CancelledError as e:
+            error = e
+            self._stats["cancelled"] += 1
+            raise
+        except Exception as e:
+            error = e
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._release_slot(started, error)
+
+    async def stream_response(self, timeout=None, **kwargs):
+        """Stream ``responses.create`` events as they arrive.
+
+        The concurrency slot is held until the stream ends. ``timeout`` bounds
+        the wait for each event rather than the whole stream, and closing the
+        generator early (e.g. on client disconnect) closes the upstream stream.
+        """
+        client = self._ensure_loop_state()
+        kwargs.setdefault("model", DEFAULT_MODEL)
+        timeout = timeout or self.timeout
+        started = await self._acquire_slot()
+        stream = None
+        error = None
+        try:
+            stream = await asyncio.wait_for(client.responses.create(stream=True, **kwargs), timeout)
+            events = stream.__aiter__()
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                yield event
+        except asyncio.TimeoutError as e:
+            error = e
+            self._stats["timeouts"] += 1
+            raise TimeoutError(f"LLM stream stalled for more than {timeout}s")
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            error = e
+            self._stats["cancelled"] += 1
+            raise
+        except Exception as e:
+            error = e
+            self._stats["errors"] += 1
+            raise
+        finally:
+            if stream is not None:
+                await stream.close()
+            self._release_slot(started, error)
+
+    def stats(self):
+        calls = self._stats["calls"] or 1
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "calls": self._stats["calls"],
+            "errors": self._stats["errors"],
+            "timeouts": self._stats["timeouts"],
+            "cancelled": self._stats["cancelled"],
+            "rejected": self._stats["rejected"],
+            "avg_wait_ms": round(self._stats["total_wait_ms"] / calls, 3),
+            "max_wait_ms": round(self._stats["max_wait_ms"], 3),
+            "avg_call_ms": round(self._stats["total_call_ms"] / calls, 3),
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+        self._client = None
+        self._loop = None
+
+
+def extract_output_text(response):
+    """Pull the assistant text out of a Responses API result"""
+    if getattr(response, "output_text", None):
+        return response.output_text
+
+    for output in getattr(response, "output", None) or []:
+        if output.type == "message" and hasattr(output, "content"):
+            for content in output.content:
+                if content.type == "output_text":
+                    return content.text
+    return None
+
+
+_gateway = None
+
+
+def get_gateway():
+    """Return the process-wide LLM gateway, creating it on first use"""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "0")) or None,
+        )
+    return _gateway
+
+
+def configure_gateway(gateway):
+    """Replace the process-wide gateway (used by tests and load tests)"""
+    global _gateway
+    _gateway = gateway
+    return gateway
@@ -0,0 +1,393 @@
+"""In-process metrics exposed in the Prometheus text format on ``/metrics``.
+
+Counters, gauges and histograms keep one value list per thread, so the hot
+path never takes a lock: each thread only ever adds to its own list and a
+scrape sums the lists. A lock is only taken the first time a thread touches
+a metric, and when a new label combination is created.
+"""
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _ThreadShards:
+    """Fixed-width value lists, one per thread, summed on read"""
+
+    def __init__(self, width):
+        self.width = width
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def mine(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0] * self.width
+            with self._lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def totals(self):
+        with self._lock:
+            shards = list(self._shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self.width
+
+
+class CounterChild:
+    def __init__(self):
+        self._shards = _ThreadShards(1)
+
+    def inc(self, amount=1):
+        self._shards.mine()[0] += amount
+
+    def value(self):
+        return self._shards.totals()[0]
+
+
+class GaugeChild(CounterChild):
+    """A counter that can go down; used for in-flight gauges"""
+
+    def dec(self, amount=1):
+        self._shards.mine()[0] -= amount
+
+
+class HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket, one for +Inf, then the running sum
+        self._shards = _ThreadShards(len(buckets) + 2)
+
+    def observe(self, value):
+        values = self._shards.mine()
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def snapshot(self):
+        """Return ``(cumulative bucket counts including +Inf, sum)``"""
+        totals = self._shards.totals()
+        cumulative, running = [], 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1]
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Return the child for one combination of label values"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def children(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self.children():
+            yield self.name, values, child.value()
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def _new_child(self):
+        return GaugeChild()
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in self.children():
+            cumulative, total = child.snapshot()
+            for bound, count in zip(self.buckets + (math.inf,), cumulative):
+                yield self.name + "_bucket", values + (bound,), count
+            yield self.name + "_sum", values, total
+            yield self.name + "_count", values, cumulative[-1]
+
+    def label_names_for(self, sample_name):
+        return self.labelnames + ("le",) if sample_name.endswith("_bucket") else self.labelnames
+
+
+class CallbackMetric(_Metric):
+    """A counter or gauge read from existing stats when scraped.
+
+    ``collect`` returns ``(label_values, value)`` pairs.
+    """
+
+    def __init__(self, name, documentation, kind, labelnames, collect, registry=None):
+        self.kind = kind
+        self.collect = collect
+        super().__init__(name, documentation, labelnames, registry)
+
+    def samples(self):
+        for values, value in self.collect():
+            yield self.name, tuple(values), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """The whole registry in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation, help_text=True)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            label_names = getattr(metric, "label_names_for", lambda _: metric.labelnames)
+            try:
+                for sample_name, values, value in metric.samples():
+                    lines.append(f"{sample_name}{_format_labels(label_names(sample_name), values)} {_format_value(value)}")
+            except Exception as e:
+                # One broken stats source must not take the whole scrape down
+                lines.append(f"# {metric.name} unavailable: {_escape(str(e), help_text=True)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(text, help_text=False):
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text if help_text else text.replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+        return repr(value)
+    return str(int(value))
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(_format_value(value) if name == "le" else value)}"'
+                     for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = Counter(
+    "finbot_http_requests_total", "HTTP requests by route template and status code",
+    ("method", "route", "status")
+)
+HTTP_DURATION = Histogram(
+    "finbot_http_request_duration_seconds", "HTTP request latency, until the response body is sent",
+    ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge("finbot_http_requests_in_flight", "HTTP requests currently being served")
+
+TOOL_DURATION = Histogram(
+    "finbot_tool_duration_seconds", "Latency of instrumented tool calls (DB, market data, FX, LLM)", ("tool",)
+)
+TOOL_ERRORS = Counter("finbot_tool_errors_total", "Instrumented tool calls that raised", ("tool",))
+TOOL_IN_FLIGHT = Gauge("finbot_tool_in_flight", "Instrumented tool calls currently running", ("tool",))
+
+
+class ToolTimer:
+    """Latency, error and in-flight metrics for one tool label"""
+
+    __slots__ = ("duration", "errors", "in_flight")
+
+    def __init__(self, tool):
+        self.duration = TOOL_DURATION.labels(tool)
+        self.errors = TOOL_ERRORS.labels(tool)
+        self.in_flight = TOOL_IN_FLIGHT.labels(tool)
+
+    def start(self):
+        self.in_flight.inc()
+        return time.perf_counter()
+
+    def finish(self, started, failed=False):
+        self.duration.observe(time.perf_counter() - started)
+        if failed:
+            self.errors.inc()
+        self.in_flight.dec()
+
+
+def instrument(tool=None):
+    """Decorate a sync or async function to record its latency under ``tool``.
+
+    The label defaults to ``<module>.<function>``, e.g. ``budgets.get_budgets``.
+    """
+    def decorate(fn):
+        timer = ToolTimer(tool or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}")
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = timer.start()
+                failed = True
+                try:
+                    result = await fn(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    timer.finish(started, failed)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = timer.start()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                timer.finish(started, failed)
+        return wrapper
+
+    return decorate
+
+
+_cache_sources = {}
+
+
+def register_cache(name, stats):
+    """Expose a cache's hit/miss counts; ``stats()`` returns a dict with ``hits`` and ``misses``"""
+    _cache_sources[name] = stats
+
+
+def _cache_samples(field):
+    for name, stats in list(_cache_sources.items()):
+        values = stats()
+        if values is None:
+            continue
+        if field == "hit_ratio":
+            lookups = values["hits"] + values["misses"]
+            yield (name,), values["hits"] / lookups if lookups else 0.0
+        else:
+            yield (name,), values[field]
+
+
+CallbackMetric("finbot_cache_hits_total", "Cache lookups served from the cache", "counter", ("cache",),
+               lambda: _cache_samples("hits"))
+CallbackMetric("finbot_cache_misses_total", "Cache lookups that missed", "counter", ("cache",),
+               lambda: _cache_samples("misses"))
+CallbackMetric("finbot_cache_hit_ratio", "Cache hits over lookups since start", "gauge", ("cache",),
+               lambda: _cache_samples("hit_ratio"))
+
+
+def route_template(scope):
+    """The matched route's path template, or ``unmatched``"""
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "unmatched"
+    # Newer FastAPI keeps included routers nested, and their routes report
+    # the template without the router prefix; take the prefix from the path
+    path, root_path = scope["path"], scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    extra = path.rstrip("/").count("/") - template.rstrip("/").count("/")
+    if extra > 0:
+        template = "/".join(path.split("/")[:extra + 1]) + template
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count, latency and in-flight requests.
+
+    Requests are labelled with the matched route template
+    (``/api/stock-price/{ticker}``) rather than the raw path, so the number
+    of series stays bounded; unmatched paths share the ``unmatched`` label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = route_template(scope)
+            HTTP_DURATION.labels(scope["method"], route).observe(elapsed)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status)).inc()
+
+
+def render_metrics():
+    return REGISTRY.render()
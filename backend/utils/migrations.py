@@ -0,0 +1,658 @@
+"""Versioned schema migrations for SQL Server and the SQLite stand-in.
+
+Each migration is a version number, a name and a list of steps per dialect.
+A step is either one SQL statement or a callable taking the connection.
+Applied versions are recorded in dbo.T_SNG_SchemaVersion, so each migration
+runs once. The SQL Server statements are also individually idempotent
+(IF NOT EXISTS guards), which lets databases created before the version
+table existed be brought up to date safely.
+"""
+from datetime import datetime
+
+
+def _reconcile_totals(conn):
+    # Imported lazily: backend.utils.database imports this module
+    from backend.utils.database import reconcile_budget_totals
+    reconcile_budget_totals(repair=True, conn=conn)
+
+
+MSSQL_BASE_SCHEMA = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_Users')
+    BEGIN
+        CREATE TABLE dbo.T_SNG_Users (
+            user_id INT IDENTITY(1,1) PRIMARY KEY,
+            username VARCHAR(100) UNIQUE,
+            email VARCHAR(255),
+            password_hash VARCHAR(255)
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_Expenses')
+    BEGIN
+        CREATE TABLE dbo.T_SNG_Expenses (
+            expense_id INT IDENTITY(1,1) PRIMARY KEY,
+            user_id INT NOT NULL,
+            amount DECIMAL(10,2) NOT NULL,
+            category VARCHAR(100),
+            description VARCHAR(255),
+            expense_date DATE
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_Budgets')
+    BEGIN
+        CREATE TABLE dbo.T_SNG_Budgets (
+            budget_id INT IDENTITY(1,1) PRIMARY KEY,
+            user_id INT NOT NULL,
+            category VARCHAR(100),
+            amount DECIMAL(10,2),
+            start_date DATE,
+            end_date DATE
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.foreign_keys WHERE name = 'FK_Expenses_Users')
+    BEGIN
+        ALTER TABLE dbo.T_SNG_Expenses
+        ADD CONSTRAINT FK_Expenses_Users FOREIGN KEY (user_id)
+        REFERENCES dbo.T_SNG_Users(user_id)
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.foreign_keys WHERE name = 'FK_Budgets_Users')
+    BEGIN
+        ALTER TABLE dbo.T_SNG_Budgets
+        ADD CONSTRAINT FK_Budgets_Users FOREIGN KEY (user_id)
+        REFERENCES dbo.T_SNG_Users(user_id)
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.views WHERE name = 'V_SNG_UserExpenses_L1')
+    BEGIN
+        EXEC('CREATE VIEW dbo.V_SNG_UserExpenses_L1 AS
+        SELECT
+            e.expense_id,
+            e.user_id,
+            e.amount,
+            e.category,
+            e.description,
+            e.expense_date,
+            FORMAT(e.expense_date, ''yyyy-MM'') AS expense_month
+        FROM
+            dbo.T_SNG_Expenses AS e')
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.views WHERE name = 'V_SNG_ExpenseSummaryByCategory_L1')
+    BEGIN
+        EXEC('CREATE VIEW dbo.V_SNG_ExpenseSummaryByCategory_L1 AS
+        SELECT
+            user_id,
+            category,
+            SUM(amount) AS total_amount,
+            COUNT(*) AS entry_count
+        FROM
+            dbo.T_SNG_Expenses
+        GROUP BY
+            user_id, category')
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.views WHERE name = 'V_SNG_BudgetStatus_L1')
+    BEGIN
+        EXEC('CREATE VIEW dbo.V_SNG_BudgetStatus_L1 AS
+        SELECT
+            b.user_id,
+            b.category,
+            b.amount AS budgeted_amount,
+            SUM(e.amount) AS actual_spent,
+            (b.amount - ISNULL(SUM(e.amount), 0)) AS remaining_amount,
+            b.start_date,
+            b.end_date
+        FROM
+            dbo.T_SNG_Budgets AS b
+        LEFT JOIN
+            dbo.T_SNG_Expenses AS e
+            ON b.user_id = e.user_id
+            AND b.category = e.category
+            AND e.expense_date BETWEEN b.start_date AND b.end_date
+        GROUP BY
+            b.user_id, b.category, b.amount, b.start_date, b.end_date')
+    END
+    """,
+]
+
+SQLITE_BASE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS dbo.T_SNG_Users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username VARCHAR(100) UNIQUE,
+        email VARCHAR(255),
+        password_hash VARCHAR(255)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dbo.T_SNG_Expenses (
+        expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INT NOT NULL REFERENCES T_SNG_Users(user_id),
+        amount DECIMAL(10,2) NOT NULL,
+        category VARCHAR(100),
+        description VARCHAR(255),
+        expense_date DATE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dbo.T_SNG_Budgets (
+        budget_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INT NOT NULL REFERENCES T_SNG_Users(user_id),
+        category VARCHAR(100),
+        amount DECIMAL(10,2),
+        start_date DATE,
+        end_date DATE
+    )
+    """,
+    """
+    CREATE VIEW IF NOT EXISTS dbo.V_SNG_UserExpenses_L1 AS
+    SELECT
+        e.expense_id,
+        e.user_id,
+        e.amount,
+        e.category,
+        e.description,
+        e.expense_date,
+        strftime('%Y-%m', e.expense_date) AS expense_month
+    FROM
+        T_SNG_Expenses AS e
+    """,
+    """
+    CREATE VIEW IF NOT EXISTS dbo.V_SNG_ExpenseSummaryByCategory_L1 AS
+    SELECT
+        user_id,
+        category,
+        SUM(amount) AS total_amount,
+        COUNT(*) AS entry_count
+    FROM
+        T_SNG_Expenses
+    GROUP BY
+        user_id, category
+    """,
+    """
+    CREATE VIEW IF NOT EXISTS dbo.V_SNG_BudgetStatus_L1 AS
+    SELECT
+        b.user_id,
+        b.category,
+        b.amount AS budgeted_amount,
+        SUM(e.amount) AS actual_spent,
+        (b.amount - COALESCE(SUM(e.amount), 0)) AS remaining_amount,
+        b.start_date,
+        b.end_date
+    FROM
+        T_SNG_Budgets AS b
+    LEFT JOIN
+        T_SNG_Expenses AS e
+        ON b.user_id = e.user_id
+        AND b.category = e.category
+        AND e.expense_date BETWEEN b.start_date AND b.end_date
+    GROUP BY
+        b.user_id, b.category, b.amount, b.start_date, b.end_date
+    """,
+]
+
+MSSQL_BUDGET_TOTALS = [
+    # Maintained running total per budget, so reads don't re-aggregate expenses
+    """
+    IF COL_LENGTH('dbo.T_SNG_Budgets', 'actual_spent') IS NULL
+    BEGIN
+        ALTER TABLE dbo.T_SNG_Budgets
+        ADD actual_spent DECIMAL(12,2) NOT NULL
+        CONSTRAINT DF_SNG_Budgets_ActualSpent DEFAULT 0
+    END
+    """,
+    # Expense writes adjust every budget whose category and date range they
+    # fall in: rows leaving a range (deleted) subtract, rows entering add
+    """
+    IF NOT EXISTS (SELECT * FROM sys.triggers WHERE name = 'TR_SNG_Expenses_BudgetTotals')
+    BEGIN
+        EXEC('CREATE TRIGGER dbo.TR_SNG_Expenses_BudgetTotals
+        ON dbo.T_SNG_Expenses
+        AFTER INSERT, UPDATE, DELETE
+        AS
+        BEGIN
+            SET NOCOUNT ON;
+            UPDATE b
+            SET b.actual_spent = b.actual_spent + d.amount
+            FROM dbo.T_SNG_Budgets AS b
+            JOIN (
+                SELECT bb.budget_id, SUM(x.amount) AS amount
+                FROM (
+                    SELECT user_id, category, expense_date, amount FROM inserted
+                    UNION ALL
+                    SELECT user_id, category, expense_date, -amount FROM deleted
+                ) AS x
+                JOIN dbo.T_SNG_Budgets AS bb
+                    ON bb.user_id = x.user_id
+                    AND bb.category = x.category
+                    AND x.expense_date BETWEEN bb.start_date AND bb.end_date
+                GROUP BY bb.budget_id
+            ) AS d ON d.budget_id = b.budget_id
+        END')
+    END
+    """,
+    # New budgets, or budgets whose category or range changed, start from
+    # the expenses already recorded for them
+    """
+    IF NOT EXISTS (SELECT * FROM sys.triggers WHERE name = 'TR_SNG_Budgets_ActualSpent')
+    BEGIN
+        EXEC('CREATE TRIGGER dbo.TR_SNG_Budgets_ActualSpent
+        ON dbo.T_SNG_Budgets
+        AFTER INSERT, UPDATE
+        AS
+        BEGIN
+            SET NOCOUNT ON;
+            IF NOT (UPDATE(user_id) OR UPDATE(category) OR UPDATE(start_date) OR UPDATE(end_date))
+                RETURN;
+            UPDATE b
+            SET b.actual_spent = COALESCE((
+                SELECT SUM(e.amount)
+                FROM dbo.T_SNG_Expenses AS e
+                WHERE e.user_id = b.user_id
+                    AND e.category = b.category
+                    AND e.expense_date BETWEEN b.start_date AND b.end_date
+            ), 0)
+            FROM dbo.T_SNG_Budgets AS b
+            JOIN inserted AS i ON i.budget_id = b.budget_id
+        END')
+    END
+    """,
+    # Budgets created before the column existed are brought up to date once
+    _reconcile_totals,
+]
+
+SQLITE_BUDGET_TOTALS = [
+    "ALTER TABLE dbo.T_SNG_Budgets ADD COLUMN actual_spent DECIMAL(12,2) NOT NULL DEFAULT 0",
+    """
+    CREATE TRIGGER IF NOT EXISTS dbo.TR_SNG_Expenses_BudgetTotals_Insert
+    AFTER INSERT ON T_SNG_Expenses
+    BEGIN
+        UPDATE T_SNG_Budgets SET actual_spent = actual_spent + NEW.amount
+        WHERE user_id = NEW.user_id AND category = NEW.category
+            AND NEW.expense_date BETWEEN start_date AND end_date;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS dbo.TR_SNG_Expenses_BudgetTotals_Update
+    AFTER UPDATE OF user_id, amount, category, expense_date ON T_SNG_Expenses
+    BEGIN
+        UPDATE T_SNG_Budgets SET actual_spent = actual_spent - OLD.amount
+        WHERE user_id = OLD.user_id AND category = OLD.category
+            AND OLD.expense_date BETWEEN start_date AND end_date;
+        UPDATE T_SNG_Budgets SET actual_spent = actual_spent + NEW.amount
+        WHERE user_id = NEW.user_id AND category = NEW.category
+            AND NEW.expense_date BETWEEN start_date AND end_date;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS dbo.TR_SNG_Expenses_BudgetTotals_Delete
+    AFTER DELETE ON T_SNG_Expenses
+    BEGIN
+        UPDATE T_SNG_Budgets SET actual_spent = actual_spent - OLD.amount
+        WHERE user_id = OLD.user_id AND category = OLD.category
+            AND OLD.expense_date BETWEEN start_date AND end_date;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS dbo.TR_SNG_Budgets_ActualSpent_Insert
+    AFTER INSERT ON T_SNG_Budgets
+    BEGIN
+        UPDATE T_SNG_Budgets SET actual_spent = COALESCE((
+            SELECT SUM(e.amount) FROM T_SNG_Expenses AS e
+            WHERE e.user_id = NEW.user_id AND e.category = NEW.category
+                AND e.expense_date BETWEEN NEW.start_date AND NEW.end_date
+        ), 0)
+        WHERE budget_id = NEW.budget_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS dbo.TR_SNG_Budgets_ActualSpent_Update
+    AFTER UPDATE OF user_id, category, start_date, end_date ON T_SNG_Budgets
+    BEGIN
+        UPDATE T_SNG_Budgets SET actual_spent = COALESCE((
+            SELECT SUM(e.amount) FROM T_SNG_Expenses AS e
+            WHERE e.user_id = NEW.user_id AND e.category = NEW.category
+                AND e.expense_date BETWEEN NEW.start_date AND NEW.end_date
+        ), 0)
+        WHERE budget_id = NEW.budget_id;
+    END
+    """,
+    _reconcile_totals,
+]
+
+MSSQL_INDEXES = [
+    # Persisted, deterministic month key; FORMAT() is a CLR call per row and
+    # cannot be indexed
+    """
+    IF COL_LENGTH('dbo.T_SNG_Expenses', 'expense_month') IS NULL
+    BEGIN
+        ALTER TABLE dbo.T_SNG_Expenses
+        ADD expense_month AS CONVERT(CHAR(7), expense_date, 126) PERSISTED
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_SNG_Expenses_User_Category_Date')
+    BEGIN
+        CREATE INDEX IX_SNG_Expenses_User_Category_Date
+        ON dbo.T_SNG_Expenses (user_id, category, expense_date)
+        INCLUDE (amount, description)
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_SNG_Expenses_User_Month')
+    BEGIN
+        CREATE INDEX IX_SNG_Expenses_User_Month
+        ON dbo.T_SNG_Expenses (user_id, expense_month)
+        INCLUDE (amount, category, expense_date, description)
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_SNG_Budgets_User_StartDate')
+    BEGIN
+        CREATE INDEX IX_SNG_Budgets_User_StartDate
+        ON dbo.T_SNG_Budgets (user_id, start_date DESC)
+        INCLUDE (category, amount, actual_spent, end_date)
+    END
+    """,
+    """
+    EXEC('ALTER VIEW dbo.V_SNG_UserExpenses_L1 AS
+    SELECT
+        e.expense_id,
+        e.user_id,
+        e.amount,
+        e.category,
+        e.description,
+        e.expense_date,
+        e.expense_month
+    FROM
+        dbo.T_SNG_Expenses AS e')
+    """,
+]
+
+SQLITE_INDEXES = [
+    # SQLite can only add generated columns as VIRTUAL; they are still indexable
+    """
+    ALTER TABLE dbo.T_SNG_Expenses
+    ADD COLUMN expense_month CHAR(7) GENERATED ALWAYS AS (strftime('%Y-%m', expense_date)) VIRTUAL
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS dbo.IX_SNG_Expenses_User_Category_Date
+    ON T_SNG_Expenses (user_id, category, expense_date, amount)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS dbo.IX_SNG_Expenses_User_Month
+    ON T_SNG_Expenses (user_id, expense_month, amount)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS dbo.IX_SNG_Budgets_User_StartDate
+    ON T_SNG_Budgets (user_id, start_date DESC)
+    """,
+    "DROP VIEW IF EXISTS dbo.V_SNG_UserExpenses_L1",
+    """
+    CREATE VIEW dbo.V_SNG_UserExpenses_L1 AS
+    SELECT
+        e.expense_id,
+        e.user_id,
+        e.amount,
+        e.category,
+        e.description,
+        e.expense_date,
+        e.expense_month
+    FROM
+        T_SNG_Expenses AS e
+    """,
+]
+
+MSSQL_CHAT_SESSIONS = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_ChatSessions')
+    BEGIN
+        CREATE TABLE dbo.T_SNG_ChatSessions (
+            session_id VARCHAR(64) PRIMARY KEY,
+            user_id INT NULL,
+            summary NVARCHAR(MAX) NOT NULL DEFAULT '',
+            summarized_through INT NOT NULL DEFAULT 0,
+            created_at DATETIME NOT NULL DEFAULT GETDATE(),
+            updated_at DATETIME NOT NULL DEFAULT GETDATE()
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_ChatMessages')
+    BEGIN
+        CREATE TABLE dbo.T_SNG_ChatMessages (
+            message_id INT IDENTITY(1,1) PRIMARY KEY,
+            session_id VARCHAR(64) NOT NULL
+                REFERENCES dbo.T_SNG_ChatSessions(session_id) ON DELETE CASCADE,
+            role VARCHAR(16) NOT NULL,
+            content NVARCHAR(MAX) NOT NULL,
+            tokens INT NOT NULL,
+            created_at DATETIME NOT NULL DEFAULT GETDATE()
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_SNG_ChatMessages_Session')
+    BEGIN
+        CREATE INDEX IX_SNG_ChatMessages_Session
+        ON dbo.T_SNG_ChatMessages (session_id, message_id)
+        INCLUDE (role, tokens)
+    END
+    """,
+]
+
+SQLITE_CHAT_SESSIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS dbo.T_SNG_ChatSessions (
+        session_id VARCHAR(64) PRIMARY KEY,
+        user_id INT NULL,
+        summary TEXT NOT NULL DEFAULT '',
+        summarized_through INT NOT NULL DEFAULT 0,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dbo.T_SNG_ChatMessages (
+        message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id VARCHAR(64) NOT NULL
+            REFERENCES T_SNG_ChatSessions(session_id) ON DELETE CASCADE,
+        role VARCHAR(16) NOT NULL,
+        content TEXT NOT NULL,
+        tokens INT NOT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS dbo.IX_SNG_ChatMessages_Session
+    ON T_SNG_ChatMessages (session_id, message_id)
+    """,
+]
+
+MSSQL_BUDGET_FORECASTS = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_BudgetForecasts')
+    BEGIN
+        CREATE TABLE dbo.T_SNG_BudgetForecasts (
+            budget_id INT PRIMARY KEY
+                REFERENCES dbo.T_SNG_Budgets(budget_id) ON DELETE CASCADE,
+            user_id INT NOT NULL,
+            as_of DATE NOT NULL,
+            spent_to_date DECIMAL(12,2) NOT NULL,
+            expected_recurring DECIMAL(12,2) NOT NULL,
+            projected_spend DECIMAL(12,2) NOT NULL,
+            will_exceed BIT NOT NULL,
+            exhaustion_date DATE NULL,
+            computed_at DATETIME NOT NULL DEFAULT GETDATE()
+        )
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_SNG_BudgetForecasts_User')
+    BEGIN
+        CREATE INDEX IX_SNG_BudgetForecasts_User
+        ON dbo.T_SNG_BudgetForecasts (user_id)
+        INCLUDE (projected_spend, will_exceed, exhaustion_date)
+    END
+    """,
+]
+
+SQLITE_BUDGET_FORECASTS = [
+    """
+    CREATE TABLE IF NOT EXISTS dbo.T_SNG_BudgetForecasts (
+        budget_id INTEGER PRIMARY KEY
+            REFERENCES T_SNG_Budgets(budget_id) ON DELETE CASCADE,
+        user_id INT NOT NULL,
+        as_of DATE NOT NULL,
+        spent_to_date DECIMAL(12,2) NOT NULL,
+        expected_recurring DECIMAL(12,2) NOT NULL,
+        projected_spend DECIMAL(12,2) NOT NULL,
+        will_exceed INT NOT NULL,
+        exhaustion_date DATE NULL,
+        computed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS dbo.IX_SNG_BudgetForecasts_User
+    ON T_SNG_BudgetForecasts (user_id)
+    """,
+]
+
+# Keyset listing: newest first by (date, id), optionally within a category
+MSSQL_LISTING_INDEXES = [
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_SNG_Expenses_User_Date_Id')
+    BEGIN
+        CREATE INDEX IX_SNG_Expenses_User_Date_Id
+        ON dbo.T_SNG_Expenses (user_id, expense_date DESC, expense_id DESC)
+        INCLUDE (amount, category, description)
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_SNG_Expenses_User_Category_Date_Id')
+    BEGIN
+        CREATE INDEX IX_SNG_Expenses_User_Category_Date_Id
+        ON dbo.T_SNG_Expenses (user_id, category, expense_date DESC, expense_id DESC)
+        INCLUDE (amount, description)
+    END
+    """,
+    """
+    IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_SNG_Budgets_User_Start_Id')
+    BEGIN
+        CREATE INDEX IX_SNG_Budgets_User_Start_Id
+        ON dbo.T_SNG_Budgets (user_id, start_date DESC, budget_id DESC)
+        INCLUDE (category, amount, actual_spent, end_date)
+    END
+    """,
+]
+
+SQLITE_LISTING_INDEXES = [
+    """
+    CREATE INDEX IF NOT EXISTS dbo.IX_SNG_Expenses_User_Date_Id
+    ON T_SNG_Expenses (user_id, expense_date, expense_id)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS dbo.IX_SNG_Expenses_User_Category_Date_Id
+    ON T_SNG_Expenses (user_id, category, expense_date, expense_id)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS dbo.IX_SNG_Budgets_User_Start_Id
+    ON T_SNG_Budgets (user_id, start_date, budget_id)
+    """,
+]
+
+MIGRATIONS = [
+    (1, "base tables and views", {"mssql": MSSQL_BASE_SCHEMA, "sqlite": SQLITE_BASE_SCHEMA}),
+    (2, "maintained budget totals", {"mssql": MSSQL_BUDGET_TOTALS, "sqlite": SQLITE_BUDGET_TOTALS}),
+    (3, "covering indexes and persisted month key", {"mssql": MSSQL_INDEXES, "sqlite": SQLITE_INDEXES}),
+    (4, "chat sessions", {"mssql": MSSQL_CHAT_SESSIONS, "sqlite": SQLITE_CHAT_SESSIONS}),
+    (5, "budget forecasts", {"mssql": MSSQL_BUDGET_FORECASTS, "sqlite": SQLITE_BUDGET_FORECASTS}),
+    (6, "keyset listing indexes", {"mssql": MSSQL_LISTING_INDEXES, "sqlite": SQLITE_LISTING_INDEXES}),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+VERSION_TABLE = {
+    "mssql": """
+        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'T_SNG_SchemaVersion')
+        BEGIN
+            CREATE TABLE dbo.T_SNG_SchemaVersion (
+                version INT PRIMARY KEY,
+                name VARCHAR(200),
+                applied_at DATETIME
+            )
+        END
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS dbo.T_SNG_SchemaVersion (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200),
+            applied_at DATETIME
+        )
+    """,
+}
+
+
+def current_version(conn, dialect):
+    """Highest applied migration version (0 for an empty database)"""
+    cursor = conn.cursor()
+    cursor.execute(VERSION_TABLE[dialect])
+    conn.commit()
+    cursor.execute("SELECT MAX(version) FROM dbo.T_SNG_SchemaVersion")
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] or 0
+
+
+def schema_is_current(conn):
+    """Cheap startup check: True when the version marker already records LATEST_VERSION.
+
+    Unlike current_version() this runs no DDL, so a warm database costs one
+    SELECT; a missing marker table just means migrations are needed.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM dbo.T_SNG_SchemaVersion")
+        row = cursor.fetchone()
+        return bool(row) and (row[0] or 0) >= LATEST_VERSION
+    except Exception:
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+
+
+def apply_migrations(conn, dialect, target_version=None):
+    """Apply every pending migration up to ``target_version``; returns the versions applied"""
+    target_version = target_version or LATEST_VERSION
+    version = current_version(conn, dialect)
+    applied = []
+    cursor = conn.cursor()
+    for number, name, steps in MIGRATIONS:
+        if number <= version or number > target_version:
+            continue
+        for step in steps[dialect]:
+            if callable(step):
+                conn.commit()
+                step(conn)
+            else:
+                cursor.execute(step)
+        cursor.execute(
+            "INSERT INTO dbo.T_SNG_SchemaVersion (version, name, applied_at) VALUES (?, ?, ?)",
+            (number, name, datetime.now().isoformat(sep=" ", timespec="seconds"))
+        )
+        conn.commit()
+        applied.append(number)
+    cursor.close()
+    return applied
@@ -0,0 +1,366 @@
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+from dotenv import load_dotenv
+from backend.utils.lazy import LazyModule
+from backend.utils.tokens import split_tokens
+
+# Load environment variables
+load_dotenv()
+
+# Imported on first search or build rather than at application startup
+np = LazyModule("numpy")
+
+DOCS_DIR = os.getenv("RETRIEVAL_DOCS_DIR", "vector_store/docs")
+INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", "vector_store/index")
+CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "300"))
+CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "50"))
+SUPPORTED_EXTENSIONS = (".pdf", ".csv", ".txt", ".md")
+INDEX_FORMAT_VERSION = 1
+
+_TERM = re.compile(r"[a-z0-9]+")
+
+
+def tokenize_terms(text: str):
+    """Lower-cased word terms used for BM25 and the hashing embedding"""
+    return _TERM.findall(text.lower())
+
+
+class HashingEmbedding:
+    """Offline default embedding: signed feature hashing of words and character trigrams.
+
+    Needs no model or network. Trigrams give it some tolerance for plurals
+    and typos ("budgets" vs "budget", "Transpotation") that exact-term BM25
+    lacks. Hashes use crc32 so vectors are stable across processes.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    @lru_cache(maxsize=65536)
+    def _word_features(self, word):
+        """(buckets, signs) for a word and its character trigrams"""
+        padded = f"#{word}#"
+        features = [word] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+        hashes = np.array([zlib.crc32(feature.encode()) for feature in features], dtype=np.uint64)
+        return hashes % self.dim, np.where(hashes & 0x80000000, 1.0, -1.0)
+
+    def __call__(self, texts) -> "np.ndarray":
+        rows, buckets, values = [], [], []
+        for row, text in enumerate(texts):
+            for word, count in Counter(tokenize_terms(text)).items():
+                word_buckets, signs = self._word_features(word)
+                rows.append(np.full(len(word_buckets), row))
+                buckets.append(word_buckets)
+                values.append(signs * count)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if rows:
+            np.add.at(vectors, (np.concatenate(rows), np.concatenate(buckets).astype(np.intp)), np.concatenate(values))
+        return _normalize(vectors)
+
+
+class OpenAIEmbedding:
+    """Embeddings from the OpenAI API, called through the ``openai`` upstream policy"""
+
+    def __init__(self, model: str = "text-embedding-3-small", batch_size: int = 256):
+        self.model = model
+        self.batch_size = batch_size
+        self.name = f"openai-{model}"
+        self._client = None
+
+    def _embed_batch(self, texts):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        response = self._client.embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in response.data]
+
+    def __call__(self, texts) -> "np.ndarray":
+        from backend.utils.upstream import get_upstream
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start:start + self.batch_size])
+            vectors.extend(get_upstream("openai").call(self._embed_batch, batch).value)
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def _normalize(vectors: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def get_embedding_function():
+    """Embedding function selected by RETRIEVAL_EMBEDDINGS (``hashing`` or ``openai``)"""
+    kind = os.getenv("RETRIEVAL_EMBEDDINGS", "hashing").lower()
+    if kind == "openai":
+        return OpenAIEmbedding(os.getenv("RETRIEVAL_EMBEDDING_MODEL", "text-embedding-3-small"))
+    if kind == "hashing":
+        return HashingEmbedding(int(os.getenv("RETRIEVAL_EMBEDDING_DIM", "512")))
+    raise ValueError(f"Unknown RETRIEVAL_EMBEDDINGS: {kind}")
+
+
+def extract_pages(path: str):
+    """Return ``[(page_number, text)]`` for a document; CSV and text files are one page"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        try:
+            import pymupdf
+        except ImportError:
+            import fitz as pymupdf  # releases before 1.24
+        with pymupdf.open(path) as document:
+            return [(number + 1, page.get_text()) for number, page in enumerate(document)]
+    if extension == ".csv":
+        import pandas as pd
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+        # One self-describing line per row so any chunk can be read on its own
+        lines = [
+            " | ".join(f"{column}: {value}" for column, value in zip(frame.columns, row))
+            for row in frame.itertuples(index=False)
+        ]
+        return [(1, "\n".join(lines))]
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [(1, f.read())]
+
+
+def chunk_file(path: str, source: str = None, chunk_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP):
+    """Split a document into overlapping token windows, page by page"""
+    source = source or os.path.basename(path)
+    chunks = []
+    for page, text in extract_pages(path):
+        text = re.sub(r"[ \t]+", " ", text).strip()
+        if not text:
+            continue
+        for window in split_tokens(text, chunk_tokens, overlap):
+            chunks.append({"source": source, "page": page, "text": window.strip()})
+    return chunks
+
+
+class HybridIndex:
+    """In-process chunk index scored with BM25 and dense cosine similarity.
+
+    Chunks and their embeddings are persisted under ``path``; the BM25
+    postings are derived from the chunk text, which takes milliseconds, so
+    they are rebuilt on load rather than stored. Rankings from the two
+    scorers are merged with reciprocal rank fusion.
+    """
+
+    def __init__(self, path: str = INDEX_DIR, embedding_function=None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.embed = embedding_function or get_embedding_function()
+        self.k1 = k1
+        self.b = b
+        self.chunks = []
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._lock = threading.RLock()
+        self._build_lexical()
+
+    @classmethod
+    def load(cls, path: str = INDEX_DIR, embedding_function=None):
+        index = cls(path, embedding_function)
+        chunks_path = os.path.join(path, "chunks.json")
+        if not os.path.exists(chunks_path):
+            return index
+        with open(chunks_path, encoding="utf-8") as f:
+            stored = json.load(f)
+        index.chunks = stored["chunks"]
+        if stored.get("embedding") == index.embed.name and stored.get("version") == INDEX_FORMAT_VERSION:
+            index.embeddings = np.load(os.path.join(path, "embeddings.npy"))
+        elif index.chunks:
+            # Embedding function changed since the index was written
+            index.embeddings = index.embed([chunk["text"] for chunk in index.chunks])
+        index._build_lexical()
+        return index
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            chunks_tmp = os.path.join(self.path, "chunks.json.tmp")
+            embeddings_tmp = os.path.join(self.path, "embeddings.tmp.npy")
+            with open(chunks_tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": INDEX_FORMAT_VERSION,
+                    "embedding": self.embed.name,
+                    "chunks": self.chunks
+                }, f)
+            np.save(embeddings_tmp, self.embeddings)
+            os.replace(embeddings_tmp, os.path.join(self.path, "embeddings.npy"))
+            os.replace(chunks_tmp, os.path.join(self.path, "chunks.json"))
+
+    def sources(self):
+        return {chunk["source"] for chunk in self.chunks}
+
+    def update(self, documents=None, removed=(), embeddings=None):
+        """Replace the chunks of every source in ``documents`` and drop ``removed`` sources.
+
+        Embeddings are computed only for the new chunks, outside the lock,
+        unless ``embeddings`` already has them per source (the ingestion
+        workers embed in parallel). The BM25 postings are rebuilt once for
+        the whole batch.
+        """
+        documents = documents or {}
+        new_chunks = [dict(chunk, source=source) for source, chunks in documents.items() for chunk in chunks]
+        if embeddings is not None:
+            parts = [embeddings[source] for source, chunks in documents.items() if chunks]
+            vectors = np.vstack(parts) if parts else None
+        else:
+            vectors = self.embed([chunk["text"] for chunk in new_chunks]) if new_chunks else None
+        replaced = set(documents) | set(removed)
+        with self._lock:
+            keep = [i for i, chunk in enumerate(self.chunks) if chunk["source"] not in replaced]
+            self.chunks = [self.chunks[i] for i in keep] + new_chunks
+            parts = [self.embeddings[keep]] if keep else []
+            if vectors is not None:
+                parts.append(vectors)
+            self.embeddings = np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+            self._build_lexical()
+
+    def add_document(self, source: str, chunks):
+        """Index ``chunks`` for ``source``, replacing anything indexed for it before"""
+        self.update({source: chunks})
+
+    def remove_document(self, source: str):
+        self.update(removed=[source])
+
+    def _build_lexical(self):
+        """Term -> posting list arrays (doc ids and term frequencies) plus BM25 statistics"""
+        vocabulary, term_ids, doc_ids, frequencies = {}, [], [], []
+        doc_lengths = np.zeros(len(self.chunks), dtype=np.float32)
+        for doc, chunk in enumerate(self.chunks):
+            counts = Counter(tokenize_terms(chunk["text"]))
+            doc_lengths[doc] = sum(counts.values())
+            for term, count in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+                frequencies.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self._vocabulary = vocabulary
+        self._posting_docs = np.asarray(doc_ids, dtype=np.int64)[order]
+        self._posting_tf = np.asarray(frequencies, dtype=np.float32)[order]
+        self._posting_start = np.searchsorted(term_ids[order], np.arange(len(vocabulary) + 1))
+        document_frequency = np.diff(self._posting_start).astype(np.float32)
+        n = len(self.chunks)
+        self._idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5))
+        self._doc_lengths = doc_lengths
+        self._avg_length = float(doc_lengths.mean()) if n else 0.0
+
+    def bm25_scores(self, query: str) -> "np.ndarray":
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        if not self.chunks:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths / max(self._avg_length, 1e-9))
+        for term in set(tokenize_terms(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._posting_start[term_id], self._posting_start[term_id + 1]
+            docs, tf = self._posting_docs[start:end], self._posting_tf[start:end]
+            scores[docs] += self._idf[term_id] * tf * (self.k1 + 1) / (tf + norm[docs])
+        return scores
+
+    def dense_scores(self, query: str) -> "np.ndarray":
+        if not self.chunks:
+            return np.zeros(0, dtype=np.float32)
+        return self.embeddings @ self.embed([query])[0]
+
+    def search(self, query: str, k: int = 5, mode: str = "hybrid", rrf_k: int = 60):
+        """Top-``k`` chunks for ``query``; ``mode`` is ``hybrid``, ``bm25`` or ``dense``"""
+        with self._lock:
+            n = len(self.chunks)
+            if n == 0:
+                return []
+            bm25 = self.bm25_scores(query) if mode != "dense" else np.zeros(n, dtype=np.float32)
+            dense = self.dense_scores(query) if mode != "bm25" else np.zeros(n, dtype=np.float32)
+            if mode == "bm25":
+                fused = bm25
+            elif mode == "dense":
+                fused = dense
+            elif mode == "hybrid":
+                # Fuse only each scorer's leading candidates; ranks further
+                # down contribute almost nothing to 1 / (rrf_k + rank)
+                fused = np.zeros(n, dtype=np.float64)
+                depth = min(n, max(k * 10, 100))
+                for scores, eligible in ((bm25, bm25 > 0), (dense, np.ones(n, dtype=bool))):
+                    candidates = np.argpartition(-scores, depth - 1)[:depth]
+                    candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+                    candidates = candidates[eligible[candidates]]
+                    fused[candidates] += 1.0 / (rrf_k + np.arange(1, len(candidates) + 1))
+            else:
+                raise ValueError(f"Unknown search mode: {mode}")
+
+            k = min(k, n)
+            top = np.argpartition(-fused, k - 1)[:k]
+            top = top[np.argsort(-fused[top], kind="stable")]
+            return [
+                {
+                    **self.chunks[i],
+                    "score": round(float(fused[i]), 6),
+                    "bm25": round(float(bm25[i]), 4),
+                    "dense": round(float(dense[i]), 4)
+                }
+                for i in top
+            ]
+
+
+def list_documents(docs_dir: str = DOCS_DIR):
+    """Supported files under ``docs_dir`` keyed by their path relative to it"""
+    documents = {}
+    for root, _, files in os.walk(docs_dir):
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                path = os.path.join(root, name)
+                documents[os.path.relpath(path, docs_dir).replace(os.sep, "/")] = path
+    return documents
+
+
+def index_directory(index: HybridIndex, docs_dir: str = DOCS_DIR):
+    """(Re)index every supported document under ``docs_dir`` and drop missing ones"""
+    documents = list_documents(docs_dir)
+    index.update(
+        {source: chunk_file(path, source) for source, path in documents.items()},
+        removed=index.sources() - set(documents)
+    )
+    index.save()
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> HybridIndex:
+    """Process-wide index, loaded from INDEX_DIR or built from DOCS_DIR on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = HybridIndex.load(INDEX_DIR)
+                if not index.chunks and os.path.isdir(DOCS_DIR):
+                    from backend.utils.ingestion import LocalIndexTarget, ingest
+                    ingest(DOCS_DIR, LocalIndexTarget(index))
+                _index = index
+    return _index
+
+
+def configure_index(index: HybridIndex):
+    """Swap the process-wide index (used by tests and after re-ingestion)"""
+    global _index
+    _index = index
+
+
+def search_documents(query: str, k: int = 5, mode: str = "hybrid"):
+    started = time.perf_counter()
+    matches = get_index().search(query, k=k, mode=mode)
+    return {
+        "query": query,
+        "matches": matches,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
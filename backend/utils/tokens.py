@@ -0,0 +1,57 @@
+import os
+import re
+from functools import lru_cache
+
+DEFAULT_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+
+# Roughly one piece per BPE token for English prose: a word with its leading
+# space, or a single punctuation character
+_PIECE = re.compile(r"\s*\w+|\s*[^\w\s]|\s+")
+
+
+class RegexEncoding:
+    """Stand-in used when tiktoken or its BPE files are unavailable (e.g. offline).
+
+    Counts are an approximation but ``decode(encode(text)) == text`` holds, so
+    chunking by token windows still works.
+    """
+
+    name = "regex"
+
+    def encode(self, text: str):
+        return _PIECE.findall(text)
+
+    def decode(self, tokens) -> str:
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = DEFAULT_ENCODING):
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return RegexEncoding()
+
+
+def count_tokens(text: str, encoding=None) -> int:
+    return len((encoding or get_encoding()).encode(text or ""))
+
+
+def split_tokens(text: str, max_tokens: int, overlap: int = 0, encoding=None):
+    """Split text into windows of at most ``max_tokens`` tokens.
+
+    Consecutive windows share ``overlap`` tokens so a sentence cut at a
+    boundary still appears whole in one of them.
+    """
+    if overlap >= max_tokens:
+        raise ValueError("overlap must be smaller than max_tokens")
+    encoding = encoding or get_encoding()
+    tokens = encoding.encode(text or "")
+    windows = []
+    step = max_tokens - overlap
+    for start in range(0, len(tokens), step):
+        windows.append(encoding.decode(tokens[start:start + max_tokens]))
+        if start + max_tokens >= len(tokens):
+            break
+    return windows
@@ -0,0 +1,238 @@
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from backend.utils.cache import TTLCache
+
+# Load environment variables
+load_dotenv()
+
+UpstreamResult = namedtuple("UpstreamResult", ["value", "stale", "age_seconds"])
+
+# Per-upstream defaults; each can be overridden with <NAME>_TIMEOUT,
+# <NAME>_RETRIES, <NAME>_HEDGE_AFTER, <NAME>_BREAKER_THRESHOLD and
+# <NAME>_BREAKER_RESET environment variables
+DEFAULT_POLICIES = {
+    "yahoo": {"timeout": 8.0, "retries": 2, "hedge_after": 1.5, "breaker_threshold": 5, "breaker_reset": 30.0},
+    "fx": {"timeout": 5.0, "retries": 2, "hedge_after": None, "breaker_threshold": 5, "breaker_reset": 60.0},
+    "openai": {"timeout": 60.0, "retries": 0, "hedge_after": None, "breaker_threshold": 10, "breaker_reset": 30.0},
+}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open after a cool-down.
+
+    While open every call fails fast. After ``reset_timeout`` one trial call is
+    let through; its outcome closes the breaker again or re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_cancelled(self):
+        """A call ended without an answer either way; free the trial slot it may hold"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class Upstream:
+    """Timeouts, jittered retries, optional hedging and a breaker for one upstream.
+
+    ``call`` runs a blocking function under the policy. When the breaker is
+    open or every attempt failed, the last good value stored under
+    ``stale_key`` is returned marked as stale instead of raising. A
+    ``ValueError`` from ``fn`` means the upstream answered with something
+    unusable, so it is raised straight away and does not count as a failure.
+    """
+
+    def __init__(self, name, timeout=10.0, retries=2, backoff=0.2, hedge_after=None,
+                 breaker_threshold=5, breaker_reset=30.0, max_workers=16, stale_entries=1024):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.max_workers = max_workers
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"upstream-{name}")
+        self._last_good = TTLCache(max_entries=stale_entries)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "rejected": 0,
+            "stale_served": 0,
+        }
+
+    @property
+    def session(self):
+        """Shared keep-alive HTTP session so TLS handshakes are reused"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def _attempt(self, fn, args, kwargs):
+        """One attempt, hedged with a duplicate request if it runs long"""
+        futures = [self._executor.submit(fn, *args, **kwargs)]
+        deadline = time.monotonic() + self.timeout
+        if self.hedge_after is not None and self.hedge_after < self.timeout:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                self._stats["hedges"] += 1
+                futures.append(self._executor.submit(fn, *args, **kwargs))
+
+        pending = set(futures)
+        last_error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+        if last_error is not None and not pending:
+            raise last_error
+        self._stats["timeouts"] += 1
+        raise TimeoutError(f"{self.name} did not respond within {self.timeout}s")
+
+    def call(self, fn, *args, stale_key=None, **kwargs):
+        """Run ``fn`` under this upstream's policy and return an ``UpstreamResult``"""
+        self._stats["calls"] += 1
+        if not self.breaker.allow():
+            self._stats["rejected"] += 1
+            return self._serve_stale(stale_key, UpstreamUnavailable(f"{self.name} circuit breaker is open"))
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._stats["retries"] += 1
+                # Full jitter keeps retrying clients from synchronising
+                time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+            try:
+                value = self._attempt(fn, args, kwargs)
+            except ValueError:
+                # The upstream answered; the answer was just unusable
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                last_error = e
+                continue
+            self.breaker.record_success()
+            if stale_key is not None:
+                self.remember(stale_key, value)
+            return UpstreamResult(value, False, 0.0)
+
+        self._stats["failures"] += 1
+        self.breaker.record_failure()
+        return self._serve_stale(stale_key, last_error)
+
+    def _serve_stale(self, stale_key, error):
+        entry = self._last_good.get_stale(stale_key) if stale_key is not None else None
+        if entry is None:
+            raise error
+        self._stats["stale_served"] += 1
+        return UpstreamResult(entry.value, True, round(time.time() - entry.stored_at, 3))
+
+    def remember(self, key, value):
+        """Store a last good value to fall back on while the upstream is down"""
+        self._last_good.set(key, value, ttl=0)
+
+    def last_good(self, key):
+        entry = self._last_good.get_stale(key)
+        if entry is None:
+            return None
+        return UpstreamResult(entry.value, True, round(time.time() - entry.stored_at, 3))
+
+    def stats(self):
+        return {"breaker": self.breaker.state, "times_opened": self.breaker.times_opened, **self._stats}
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """Return the shared policy wrapper for an upstream, creating it on first use"""
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        with _upstreams_lock:
+            upstream = _upstreams.get(name)
+            if upstream is None:
+                policy = dict(DEFAULT_POLICIES.get(name, {}))
+                prefix = name.upper()
+                for key, cast in (("timeout", float), ("retries", int), ("hedge_after", float),
+                                  ("breaker_threshold", int), ("breaker_reset", float)):
+                    value = os.getenv(f"{prefix}_{key.upper()}")
+                    if value:
+                        policy[key] = cast(value)
+                upstream = Upstream(name, **policy)
+                _upstreams[name] = upstream
+    return upstream
+
+
+def upstream_stats():
+    return {name: upstream.stats() for name, upstream in list(_upstreams.items())}
@@ -1,11 +1,12 @@
 import React, { useState } from 'react';
-import { chatWithAgent } from '../services/api';
+import { chatWithAgent, streamChatWithAgent } from '../services/api';
 
 const Chat: React.FC = () => {
     const [query, setQuery] = useState('');
     const [response, setResponse] = useState('');
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState('');
+    const [toolStatus, setToolStatus] = useState('');
 
     const handleSubmit = async (e: React.FormEvent) => {
         e.preventDefault();
@@ -13,13 +14,34 @@ const Chat: React.FC = () => {
 
         setLoading(true);
         setError('');
+        setResponse('');
 
+        let streamed = false;
         try {
-            const result = await chatWithAgent(query);
-            setResponse(result.response);
+            const text = await streamChatWithAgent(query, (event) => {
+                streamed = true;
+                if (event.type === 'token') {
+                    setToolStatus('');
+                    setResponse((current) => current + event.delta);
+                } else if (event.type === 'tool') {
+                    setToolStatus(`${event.tool.replace(/_/g, ' ')}: ${event.status.replace(/_/g, ' ')}`);
+                }
+            });
+            setResponse(text);
         } catch (err) {
-            setError(err instanceof Error ? err.message : 'An error occurred');
+            if (streamed) {
+                setError(err instanceof Error ? err.message : 'An error occurred');
+            } else {
+                // Streaming not available; use the regular endpoint
+                try {
+                    const result = await chatWithAgent(query);
+                    setResponse(result.response);
+                } catch (fallbackErr) {
+                    setError(fallbackErr instanceof Error ? fallbackErr.message : 'An error occurred');
+                }
+            }
         } finally {
+            setToolStatus('');
             setLoading(false);
         }
     };
@@ -48,6 +70,12 @@ const Chat: React.FC = () => {
                 </div>
             </form>
 
+            {toolStatus && (
+                <div className="p-2 mb-4 text-sm text-gray-600">
+                    {toolStatus}...
+                </div>
+            )}
+
             {error && (
                 <div className="p-4 mb-4 bg-red-100 text-red-700 rounded">
                     {error}
@@ -38,6 +38,52 @@ export const chatWithAgent = async (query: string): Promise<ChatResponse> => {
     return response.data;
 };
 
+export type AgentStreamEvent =
+    | { type: 'token'; delta: string }
+    | { type: 'tool'; tool: string; status: string }
+    | { type: 'done'; response: string }
+    | { type: 'error'; detail: string };
+
+// Streams agent events over SSE. Rejects before the first event if streaming
+// is unavailable so callers can fall back to chatWithAgent.
+export const streamChatWithAgent = async (
+    query: string,
+    onEvent: (event: AgentStreamEvent) => void,
+    signal?: AbortSignal
+): Promise<string> => {
+    const response = await fetch(`${API_BASE_URL}/agent/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+        body: JSON.stringify({ query }),
+        signal,
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Streaming unavailable (status ${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop() ?? '';
+        for (const frame of frames) {
+            const data = frame.split('\n').find((line) => line.startsWith('data: '));
+            if (!data) continue;
+            const event = JSON.parse(data.slice('data: '.length)) as AgentStreamEvent;
+            onEvent(event);
+            if (event.type === 'token') text += event.delta;
+            if (event.type === 'done') return event.response;
+            if (event.type === 'error') throw new Error(event.detail);
+        }
+    }
+    return text;
+};
+
 export const getStockPrice = async (ticker: string): Promise<StockResponse> => {
     const response = await api.get<StockResponse>(`/stock-price/${ticker}`);
     return response.data;
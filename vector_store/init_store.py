@@ -1,102 +1,47 @@
+"""Sync vector_store/docs into the local index and/or the hosted OpenAI vector store.
+
+Only new and changed files are processed; a content-hash manifest per target
+records what is already indexed. Run from the repository root:
+
+    python vector_store/init_store.py --target local
+    python vector_store/init_store.py --target openai --workers 8
+"""
+import argparse
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import sys
 
-# Load environment variables
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Allow running as a script from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+from backend.utils.ingestion import INGEST_WORKERS, LocalIndexTarget, OpenAIVectorStoreTarget, ingest
+from backend.utils.retrieval import DOCS_DIR
 
-def create_vector_store():
-    """Create a vector store for file search"""
-    try:
-        vector_store = client.vector_stores.create(
-            name="FinanceDocsStore"
-        )
-        print(f"✅ Vector Store Created with ID: {vector_store.id}")
-        return vector_store
-    except Exception as e:
-        print(f"❌ Error creating vector store: {str(e)}")
-        return None
 
-def upload_and_process_files(vector_store_id, file_paths):
-    """Upload files and add them to the vector store"""
-    file_ids = []
-    
-    # Upload files
-    for path in file_paths:
-        try:
-            with open(path, "rb") as f:
-                file = client.files.create(
-                    file=f,
-                    purpose="assistants"
-                )
-                file_ids.append(file.id)
-                print(f"✅ Successfully uploaded: {path}")
-        except Exception as e:
-            print(f"❌ Error uploading {path}: {str(e)}")
-            continue
-    
-    if not file_ids:
-        print("❌ No files were successfully uploaded")
-        return None
-    
-    # Add files to vector store
-    try:
-        file_batch = client.vector_stores.file_batches.create(
-            vector_store_id=vector_store_id,
-            file_ids=file_ids
-        )
-        print(f"✅ Files added to vector store batch: {file_batch.id}")
-        print(f"Status: {file_batch.status}")
-        print(f"File counts: {file_batch.file_counts}")
-        return file_batch
-    except Exception as e:
-        print(f"❌ Error adding files to vector store: {str(e)}")
-        return None
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["local", "openai", "both"], default="local")
+    parser.add_argument("--docs", default=DOCS_DIR)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    args = parser.parse_args()
+
+    targets = []
+    if args.target in ("local", "both"):
+        targets.append(LocalIndexTarget())
+    if args.target in ("openai", "both"):
+        targets.append(OpenAIVectorStoreTarget())
 
-def test_file_search(vector_store_id):
-    """Test the file search functionality"""
-    try:
-        response = client.responses.create(
-            model="gpt-4-turbo-preview",
-            input="What are the main expenses in our budget?",
-            tools=[{
-                "type": "file_search",
-                "vector_store_ids": [vector_store_id],
-                "max_num_results": 5
-            }],
-            include=["file_search_call.results"]
+    for target in targets:
+        result = ingest(args.docs, target, workers=args.workers)
+        print(
+            f"[{result['target']}] added={len(result['added'])} changed={len(result['changed'])} "
+            f"removed={len(result['removed'])} unchanged={result['unchanged']} "
+            f"failed={len(result['failed'])} in {result['elapsed_ms']} ms"
         )
-        print("\n✅ Test search results:")
-        print(response)
-        return response
-    except Exception as e:
-        print(f"❌ Error testing file search: {str(e)}")
-        return None
+        for source, error in result["failed"].items():
+            print(f"  ❌ {source}: {error}")
+        if isinstance(target, OpenAIVectorStoreTarget):
+            print(f"  Vector store: {target.vector_store_id or 'see ' + target.manifest_path}")
 
-def main():
-    # File paths
-    file_paths = [
-        "vector_store/docs/sample_budget.pdf",
-        #"vector_store/docs/expenses_report.csv"
-    ]
-    
-    # Create vector store
-    vector_store = create_vector_store()
-    if not vector_store:
-        return
-    
-    # Upload and process files
-    file_batch = upload_and_process_files(vector_store.id, file_paths)
-    if not file_batch:
-        return
-    
-    # Test the file search functionality
-    print("\nTesting file search capability...")
-    test_file_search(vector_store.id)
 
 if __name__ == "__main__":
     main()